@@ -0,0 +1,97 @@
+import argparse
+import json
+import time
+import numpy as np
+from rank_bm25 import BM25Okapi
+from src.services.bm25_index import BM25Index
+
+
+def make_corpus(n_docs: int, vocab_size: int, doc_len: int, seed: int) -> list[str]:
+    """Synthetic chunks with a Zipf-like term distribution, like real text."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    lengths = rng.integers(doc_len // 2, doc_len * 3 // 2, size=n_docs)
+    terms = rng.choice(vocab_size, size=int(lengths.sum()), p=weights)
+    docs, start = [], 0
+    for length in lengths:
+        docs.append(" ".join(f"t{t}" for t in terms[start : start + length]))
+        start += length
+    return docs
+
+
+def make_queries(n_queries: int, vocab_size: int, seed: int) -> list[list[str]]:
+    """Queries of 2-6 terms drawn from the mid-frequency vocabulary."""
+    rng = np.random.default_rng(seed + 1)
+    return [
+        [f"t{t}" for t in rng.integers(10, vocab_size // 4, size=rng.integers(2, 7))]
+        for _ in range(n_queries)
+    ]
+
+
+def time_queries(search, queries: list) -> dict:
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        search(q)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+    }
+
+
+def bench(n_docs: int, args) -> dict:
+    docs = make_corpus(n_docs, args.vocab, args.doc_len, args.seed)
+    queries = make_queries(args.queries, args.vocab, args.seed)
+    ids = [f"c{i}" for i in range(n_docs)]
+    metas = [{"file_id": f"f{i // 100}"} for i in range(n_docs)]
+    result = {"n_docs": n_docs}
+
+    t0 = time.perf_counter()
+    index = BM25Index()
+    index.add(ids, docs, metas)
+    result["sparse_build_s"] = round(time.perf_counter() - t0, 3)
+    result["sparse_query"] = time_queries(
+        lambda q: index.search(q, args.top_k), queries
+    )
+
+    if n_docs <= args.max_rank_bm25:
+        t0 = time.perf_counter()
+        reference = BM25Okapi([d.split() for d in docs])
+        result["rank_bm25_build_s"] = round(time.perf_counter() - t0, 3)
+        result["rank_bm25_query"] = time_queries(
+            lambda q: np.argsort(reference.get_scores(q))[::-1][: args.top_k],
+            queries[: args.rank_bm25_queries],
+        )
+
+        # Same top-k scores as the dense reference ranking
+        for q in queries[:5]:
+            expected = np.sort(reference.get_scores(q))[::-1][: args.top_k]
+            got = [hit[0] for hit in index.search(q, args.top_k)]
+            assert np.allclose(got, expected), "sparse scores diverged from rank_bm25"
+
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Benchmark the sparse BM25 index against rank_bm25"
+    )
+    p.add_argument("--sizes", type=str, default="10000,100000,1000000", help="Comma separated corpus sizes (chunks)")
+    p.add_argument("--queries", type=int, default=200, help="Queries timed against the sparse index")
+    p.add_argument("--rank-bm25-queries", type=int, default=20, help="Queries timed against rank_bm25 (it is slow)")
+    p.add_argument("--max-rank-bm25", type=int, default=1000000, help="Skip rank_bm25 above this corpus size")
+    p.add_argument("--vocab", type=int, default=50000, help="Vocabulary size")
+    p.add_argument("--doc-len", type=int, default=60, help="Mean chunk length in tokens")
+    p.add_argument("--top-k", type=int, default=20, help="Candidates per query (CANDIDATES)")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    for size in [int(s) for s in args.sizes.split(",") if s.strip().isdigit()]:
+        print(json.dumps(bench(size, args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import time
+import numpy as np
+from src.services import fusion
+from src.utils.safety import coverage_ok
+
+
+def norm(xs):
+    if not xs:
+        return []
+    mn, mx = min(xs), max(xs)
+    if mx - mn < 1e-9:
+        return [0.5 for _ in xs]
+    return [(x - mn) / (mx - mn) for x in xs]
+
+
+def loop_coverage_ok(scores, topk, score_avg=0.28, score_min=0.38):
+    """Sort-based coverage check used before it took NumPy arrays."""
+    top = sorted(scores, reverse=True)[:topk]
+    return bool(top) and top[0] >= score_min and sum(top) / len(top) >= score_avg
+
+
+def loop_fuse(bm25_ids, bm25_scores, sem_ids, sem_scores, alpha, topk):
+    """Per-candidate dict merge retrieval used before fusion.py."""
+    merged = {}
+    for chunk_id, score in zip(bm25_ids, norm(bm25_scores)):
+        merged[chunk_id] = {"bm25": score, "sem_sim": 0.0}
+    for chunk_id, score in zip(sem_ids, norm(sem_scores)):
+        sem_item = {"bm25": 0.0, "sem_sim": score}
+        merged[chunk_id] = {**merged.get(chunk_id, {}), **sem_item}
+    items = list(merged.values())
+    for item in items:
+        item["hybrid"] = alpha * item["bm25"] + (1 - alpha) * item["sem_sim"]
+    loop_coverage_ok([item["hybrid"] for item in items], topk)
+    items.sort(key=lambda x: x["hybrid"], reverse=True)
+    return items
+
+
+def vector_fuse(bm25_ids, bm25_scores, sem_ids, sem_scores, alpha, topk, mode):
+    ids, _, _, fused = fusion.fuse(
+        bm25_ids, fusion.minmax(bm25_scores), sem_ids, fusion.minmax(sem_scores),
+        alpha=alpha, mode=mode,
+    )
+    coverage_ok(fused, topk=topk, score_avg=0.28, score_min=0.38)
+    return np.argsort(-fused, kind="stable")
+
+
+def timed(fn, repeats: int) -> float:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return round(float(np.percentile(times, 50)), 3)
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Compare loop-based and vectorized hybrid score fusion"
+    )
+    p.add_argument("--sizes", type=str, default="1000,10000,100000,1000000",
+                   help="Candidates per leg")
+    p.add_argument("--overlap", type=float, default=0.3, help="Share of ids found by both legs")
+    p.add_argument("--alpha", type=float, default=0.5)
+    p.add_argument("--topk", type=int, default=10)
+    p.add_argument("--repeats", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for n in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        shared = int(n * args.overlap)
+        bm25_ids = [f"c{i}" for i in range(n)]
+        sem_ids = [f"c{i}" for i in range(n - shared, 2 * n - shared)]
+        bm25_scores = rng.gamma(2.0, 3.0, size=n).tolist()
+        sem_scores = rng.random(n).tolist()
+        legs = (bm25_ids, bm25_scores, sem_ids, sem_scores, args.alpha, args.topk)
+        result = {
+            "candidates": n,
+            "loop_ms": timed(lambda: loop_fuse(*legs), args.repeats),
+            "weighted_ms": timed(lambda: vector_fuse(*legs, "weighted"), args.repeats),
+            "rrf_ms": timed(lambda: vector_fuse(*legs, "rrf"), args.repeats),
+        }
+        result["speedup"] = round(result["loop_ms"] / max(result["weighted_ms"], 1e-6), 1)
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
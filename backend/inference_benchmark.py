@@ -0,0 +1,76 @@
+import argparse
+import json
+import time
+import numpy as np
+from src.config.settings import Config
+from src.services.models import INFERENCE_BACKENDS, embedding_function, load_reranker
+
+
+def make_texts(n: int, n_words: int, seed: int) -> list[str]:
+    rng = np.random.default_rng(seed)
+    words = ["policy", "employee", "vacation", "travel", "expense", "report",
+             "manager", "approval", "benefit", "salary", "contract", "office"]
+    return [" ".join(rng.choice(words, size=n_words)) for _ in range(n)]
+
+
+def latency(fn, repeats: int) -> dict:
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {
+        "p50_ms": round(float(np.percentile(times, 50)), 2),
+        "p99_ms": round(float(np.percentile(times, 99)), 2),
+    }
+
+
+def bench(backend: str, args) -> dict:
+    chunks = make_texts(args.chunks, 80, args.seed)
+    queries = make_texts(args.repeats, 10, args.seed + 1)
+    result = {"backend": backend}
+
+    t0 = time.perf_counter()
+    embed = embedding_function(args.embed_model, backend)
+    reranker = load_reranker(args.reranker_model, backend)
+    result["load_s"] = round(time.perf_counter() - t0, 2)
+
+    embed(chunks[:8])  # warm up
+    t0 = time.perf_counter()
+    embed(chunks)
+    result["embed_chunks_per_s"] = round(len(chunks) / (time.perf_counter() - t0), 1)
+    it = iter(queries * 2)
+    result["embed_query"] = latency(lambda: embed([next(it)]), args.repeats)
+
+    pairs = [(queries[0], chunk) for chunk in chunks[: args.rerank_pairs]]
+    reranker.predict(pairs)  # warm up
+    result["rerank"] = latency(lambda: reranker.predict(pairs), args.repeats)
+
+    # Agreement with the full-precision reference
+    if backend != "torch":
+        reference = load_reranker(args.reranker_model, "torch").predict(pairs)
+        scores = reranker.predict(pairs)
+        result["rerank_max_abs_diff"] = round(float(np.abs(scores - reference).max()), 4)
+        result["rerank_top1_agrees"] = bool(np.argmax(scores) == np.argmax(reference))
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Compare embedder/reranker latency and throughput across inference backends"
+    )
+    p.add_argument("--backends", type=str, default=",".join(INFERENCE_BACKENDS))
+    p.add_argument("--embed-model", type=str, default=Config.EMBED_MODEL_NAME)
+    p.add_argument("--reranker-model", type=str, default=Config.RERANKER_MODEL_NAME)
+    p.add_argument("--chunks", type=int, default=512, help="Chunks embedded for throughput")
+    p.add_argument("--rerank-pairs", type=int, default=15, help="Pairs per rerank call")
+    p.add_argument("--repeats", type=int, default=50, help="Timed calls per latency measurement")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        print(json.dumps(bench(backend, args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
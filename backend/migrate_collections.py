@@ -0,0 +1,116 @@
+"""
+Split the shared "docs" collection into one collection per department.
+
+Chunks are copied with their stored embeddings (nothing is re-embedded)
+into the collections the CollectionRouter uses when COLLECTION_PER_DEPT is
+on. Run it before switching the flag on; the source collection is only
+removed with --drop-source, after every department's count checks out.
+
+Chunks stored before tag filtering lack the per-tag tag_<name> keys that
+tag filters match on; they are added while copying, and --backfill-tags
+adds them in place without splitting anything. The app adds them itself
+when it opens a collection (TAG_BACKFILL), so --backfill-tags is only
+needed with that turned off.
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from src.config.settings import Config
+from src.services.collection_router import CollectionRouter, backfill_tags
+from src.services.filters import with_tag_fields
+from src.services.models import embedding_function
+from src.services.vector_db import VECTOR_STORES, create_store_client
+
+
+def migrate(router: CollectionRouter, page_size: int = 1000, dry_run: bool = False) -> dict:
+    """Copy the shared collection's chunks into per-department collections."""
+    source = router.shared()
+    copied = defaultdict(int)
+    skipped = 0
+    offset = 0
+    while True:
+        res = source.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=page_size,
+            offset=offset,
+        )
+        ids = res.get("ids") or []
+        if not len(ids):
+            break
+
+        by_dept = defaultdict(lambda: ([], [], [], []))
+        for chunk_id, doc, meta, embedding in zip(
+            ids, res["documents"], res["metadatas"], res["embeddings"]
+        ):
+            dept_id = (meta or {}).get("dept_id", "")
+            if not dept_id:
+                # No department can see these chunks
+                skipped += 1
+                continue
+            meta = with_tag_fields(meta)
+            for column, value in zip(by_dept[dept_id], (chunk_id, doc, meta, embedding)):
+                column.append(value)
+
+        for dept_id, (dept_ids, docs, metas, embeddings) in by_dept.items():
+            if not dry_run:
+                router.for_dept(dept_id).upsert(
+                    ids=dept_ids, documents=docs, metadatas=metas, embeddings=embeddings
+                )
+            copied[dept_id] += len(dept_ids)
+
+        if len(ids) < page_size:
+            break
+        offset += page_size
+
+    report = {"source": source.name, "source_count": source.count(), "skipped": skipped, "departments": {}}
+    for dept_id, count in sorted(copied.items()):
+        entry = {"copied": count}
+        if not dry_run:
+            collection = router.for_dept(dept_id)
+            entry.update(collection=collection.name, count=collection.count())
+        report["departments"][dept_id] = entry
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Split the shared collection into per-department collections"
+    )
+    p.add_argument("--store", type=str, default=Config.VECTOR_STORE, choices=VECTOR_STORES)
+    p.add_argument("--path", type=str, default=None, help="Store directory (default: the configured one)")
+    p.add_argument("--page-size", type=int, default=1000, help="Chunks read per page")
+    p.add_argument("--dry-run", action="store_true", help="Only report what would be copied")
+    p.add_argument("--drop-source", action="store_true", help="Delete the shared collection once verified")
+    p.add_argument(
+        "--backfill-tags", action="store_true",
+        help="Only add missing per-tag filter keys, in place, to the shared collection and the --dept collections",
+    )
+    p.add_argument("--dept", action="append", default=[], help="Department collection to backfill (repeatable)")
+    args = p.parse_args()
+
+    client = create_store_client(args.store, args.path)
+    router = CollectionRouter(
+        client,
+        embedding_function(Config.EMBED_MODEL_NAME, Config.INFERENCE_BACKEND),
+        per_dept=True,
+    )
+    if args.backfill_tags:
+        collections = [router.shared()] + [router.for_dept(d) for d in args.dept]
+        report = {c.name: backfill_tags(c, args.page_size, args.dry_run) for c in collections}
+        print(json.dumps({"tags_backfilled": report}, indent=2))
+        return
+
+    report = migrate(router, args.page_size, args.dry_run)
+    print(json.dumps(report, indent=2))
+
+    if args.drop_source and not args.dry_run:
+        short = {d: e for d, e in report["departments"].items() if e["count"] < e["copied"]}
+        if short:
+            raise SystemExit(f"Not dropping {report['source']}: missing chunks in {sorted(short)}")
+        client.delete_collection(report["source"])
+        print(f"Dropped {report['source']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import json
+import time
+import threading
+import numpy as np
+from sentence_transformers import CrossEncoder
+from src.config.settings import Config
+from src.services.rerank_batcher import RerankBatcher
+
+
+def make_requests(n_requests: int, pairs_per_request: int, seed: int) -> list:
+    """(query, chunk) pairs of varied lengths, like /chat rerank inputs."""
+    rng = np.random.default_rng(seed)
+    words = [f"word{i}" for i in range(2000)]
+    requests = []
+    for _ in range(n_requests):
+        query = " ".join(rng.choice(words, size=rng.integers(4, 16)))
+        requests.append(
+            [
+                (query, " ".join(rng.choice(words, size=rng.integers(20, 120))))
+                for _ in range(pairs_per_request)
+            ]
+        )
+    return requests
+
+
+def run_load(score, requests: list, concurrency: int) -> dict:
+    """Issue the requests from concurrency threads; per-request latencies."""
+    latencies = []
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        while True:
+            with lock:
+                pairs = next(pending, None)
+            if pairs is None:
+                return
+            t0 = time.perf_counter()
+            score(pairs)
+            with lock:
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    return {
+        "requests_per_s": round(len(requests) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Benchmark micro-batched reranking against per-request predict"
+    )
+    p.add_argument("--model", type=str, default=Config.RERANKER_MODEL_NAME)
+    p.add_argument("--requests", type=int, default=200, help="Rerank requests per run")
+    p.add_argument("--pairs", type=int, default=15, help="Pairs per request")
+    p.add_argument("--concurrency", type=str, default="1,4,16", help="Comma separated thread counts")
+    p.add_argument("--max-batch", type=int, default=Config.RERANK_MAX_BATCH)
+    p.add_argument("--window-ms", type=float, default=Config.RERANK_BATCH_WINDOW_MS)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    model = CrossEncoder(args.model)
+    requests = make_requests(args.requests, args.pairs, args.seed)
+    model.predict(requests[0])  # warm up
+
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip().isdigit()]:
+        batcher = RerankBatcher(
+            lambda: model, max_batch=args.max_batch, window_ms=args.window_ms
+        )
+        result = {
+            "concurrency": concurrency,
+            "per_request": run_load(model.predict, requests, concurrency),
+            "batched": run_load(batcher.predict, requests, concurrency),
+            "batching": batcher.stats(),
+        }
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,7 @@ from src.app import create_app
 env = os.getenv('FLASK_ENV', 'development')
 
 # Create the application
-app, limiter, collection = create_app(env)
+app, limiter, collections = create_app(env)
 
 if __name__ == '__main__':
     # Get configuration for debug and port settings
@@ -25,6 +25,9 @@ if __name__ == '__main__':
     
     print(f"Starting Flask application in {env} mode...")
     print(f"Server running on http://{host}:{port}")
-    print(f"ChromaDB collection: {collection.name}")
+    print(
+        "ChromaDB collections: "
+        + ("one per department" if collections.per_dept else collections.prefix)
+    )
     
     app.run(host=host, port=port, debug=debug)
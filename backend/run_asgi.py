@@ -0,0 +1,27 @@
+"""
+ASGI entry point for the async chat serving mode.
+Serve with an ASGI server, e.g. `uvicorn run_asgi:app --workers 2`.
+"""
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from src.asgi import create_asgi_app
+
+env = os.getenv('FLASK_ENV', 'development')
+
+# /chat streams on the event loop; other routes run through Flask
+app = create_asgi_app(env)
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.getenv('PORT', 5001))
+    host = os.getenv('HOST', '0.0.0.0')
+
+    print(f"Starting ASGI application in {env} mode...")
+    print(f"Server running on http://{host}:{port}")
+
+    uvicorn.run(app, host=host, port=port)
@@ -8,11 +8,20 @@ from flask import Flask, jsonify, g
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.exceptions import RequestEntityTooLarge, TooManyRequests
-import chromadb
-from chromadb.utils.embedding_functions import sentence_transformer_embedding_function
 
 from src.config.settings import get_config
-from src.middleware.auth import load_identity
+from src.services.models import embedding_config, embedding_function
+from src.services.model_client import ModelClient, RemoteEmbeddingFunction
+from src.services.inference_budget import BudgetedEmbeddingFunction, inference_budget
+from src.services.query_embedding import query_embeddings
+from src.services.result_cache import retrieval_cache
+from src.services.answer_cache import answer_cache
+from src.services.bm25_index import bm25_indexes
+from src.services.collection_router import CollectionRouter
+from src.services.vector_db import create_store_client
+from src.services.warmup import Warmup, parse_tenants, warmup_steps
+from src.services import retrieval
+from src.middleware.auth import load_identity, require_identity
 from src.routes.chat import chat_bp
 from src.routes.upload import upload_bp
 from src.routes.ingest import ingest_bp
@@ -35,7 +44,8 @@ def create_app(config_name="development"):
         config_name: Environment name ('development', 'production', 'testing')
 
     Returns:
-        Tuple of (app, limiter, collection)
+        Tuple of (app, limiter, collections), collections being the
+        CollectionRouter that maps departments to their collections
     """
     app = Flask(__name__)
 
@@ -46,21 +56,53 @@ def create_app(config_name="development"):
     # Set maximum upload size
     app.config["MAX_CONTENT_LENGTH"] = int(config.MAX_UPLOAD_MB * 1024 * 1024)
 
-    # Initialize ChromaDB
+    # Initialize the vector store (VECTOR_STORE: chroma or mmap)
     embed_model_name = config.EMBED_MODEL_NAME
-    chroma_path = config.CHROMA_PATH
-    embedding_fun = (
-        sentence_transformer_embedding_function.SentenceTransformerEmbeddingFunction(
-            model_name=embed_model_name
+    if config.MODEL_SERVER_SOCKET:
+        # The shared model server hosts the embedder for all workers
+        embedding_fun = RemoteEmbeddingFunction(
+            ModelClient(config.MODEL_SERVER_SOCKET, config.MODEL_SERVER_TIMEOUT_S),
+            embedding_config(embed_model_name, config.INFERENCE_BACKEND),
         )
+    else:
+        # Split the cores between workers before torch sizes its pools
+        inference_budget.apply()
+        embedding_fun = BudgetedEmbeddingFunction(
+            embedding_function(embed_model_name, config.INFERENCE_BACKEND),
+            inference_budget,
+        )
+    store_client = create_store_client(config.VECTOR_STORE)
+    # One collection per department (COLLECTION_PER_DEPT) or the shared "docs"
+    collections = CollectionRouter(
+        store_client,
+        embedding_fun,
+        per_dept=config.COLLECTION_PER_DEPT,
+        backfill=config.TAG_BACKFILL,
     )
-    chroma_client = chromadb.PersistentClient(path=chroma_path)
-    collection = chroma_client.get_or_create_collection(
-        name="docs", metadata={"hnsw:space": "cosine"}, embedding_function=embedding_fun
+    # Queries are embedded once here and searched with query_embeddings
+    query_embeddings.bind(
+        embedding_fun, f"{embed_model_name}@{config.INFERENCE_BACKEND}"
     )
 
-    # Store collection in app context for dependency injection
-    app.collection = collection
+    # Store the router in app context for dependency injection
+    app.collections = collections
+
+    # Load and exercise the models before traffic; /ready reports progress
+    warmup = Warmup(ready_when_degraded=config.WARMUP_READY_WHEN_DEGRADED)
+    app.warmup = warmup
+    if config.WARMUP:
+        warmup.start(
+            warmup_steps(
+                embedding_fun,
+                retrieval.get_reranker if config.USE_RERANKER else None,
+                bm25_indexes,
+                collections,
+                parse_tenants(config.WARMUP_TENANTS),
+            ),
+            background=config.WARMUP_BACKGROUND,
+        )
+    else:
+        warmup.run([])
 
     # Initialize rate limiter
     limiter = Limiter(
@@ -97,11 +139,12 @@ def create_app(config_name="development"):
 
     # Dependency injection wrapper for routes that need collection
     def inject_collection(f):
-        """Decorator to inject collection into route handlers."""
+        """Decorator to inject the caller's department collection into route handlers."""
         from functools import wraps
 
         @wraps(f)
         def wrapper(*args, **kwargs):
+            collection = collections.for_identity(getattr(g, "identity", None))
             return f(collection, *args, **kwargs)
 
         return wrapper
@@ -146,4 +189,32 @@ def create_app(config_name="development"):
     def health():
         return jsonify({"status": "healthy"}), 200
 
-    return app, limiter, collection
+    @app.get("/ready")
+    @limiter.exempt
+    def ready():
+        status = warmup.status()
+        return jsonify(status), 200 if status["ready"] else 503
+
+    # Names the department collections, so callers must be signed in
+    @app.get("/metrics")
+    @limiter.exempt
+    @require_identity
+    def metrics():
+        return (
+            jsonify(
+                {
+                    "retrieval_cache": retrieval_cache.stats(),
+                    "answer_cache": answer_cache.stats(),
+                    "query_embeddings": query_embeddings.stats(),
+                    "rerank_cache": retrieval.rerank_cache.stats(),
+                    "rerank_batcher": retrieval.rerank_batcher.stats(),
+                    "retrieval_legs": retrieval.leg_timings.stats(),
+                    "inference": inference_budget.stats(),
+                    "bm25_indexes": bm25_indexes.stats(),
+                    "vector_store": collections.stats(),
+                }
+            ),
+            200,
+        )
+
+    return app, limiter, collections
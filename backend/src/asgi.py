@@ -0,0 +1,197 @@
+"""
+ASGI application for the async chat serving mode.
+
+POST /chat is prepared (auth, rate limit, retrieval, prompt) on a thread
+pool and its answer is streamed from the async OpenAI client on the event
+loop, so an open stream holds no thread. Every other route is served by
+the Flask app through asgiref's WSGI adapter.
+"""
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.wsgi import WsgiToAsgi
+from flask import Response, g
+from openai import AsyncOpenAI
+
+from src.app import create_app
+from src.config.settings import Config
+from src.middleware.auth import require_identity
+from src.routes.chat import ChatTurn, prepare_chat
+
+
+def wsgi_environ(scope: dict, body: bytes) -> dict:
+    """WSGI environ for an ASGI http scope and its request body."""
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("ascii"),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    server = scope.get("server") or ("localhost", 80)
+    environ["SERVER_NAME"] = server[0]
+    environ["SERVER_PORT"] = str(server[1] or 0)
+    client = scope.get("client")
+    if client:
+        environ["REMOTE_ADDR"] = client[0]
+        environ["REMOTE_PORT"] = str(client[1])
+
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1")
+        if name == "content-length":
+            key = "CONTENT_LENGTH"
+        elif name == "content-type":
+            key = "CONTENT_TYPE"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        value = value.decode("latin1")
+        if key in environ:
+            value = f"{environ[key]},{value}"
+        environ[key] = value
+    return environ
+
+
+class AsyncChatApp:
+    """ASGI app serving /chat on the event loop and the rest through Flask."""
+
+    def __init__(self, flask_app, collections, workers: int = None, client=None):
+        self.flask_app = flask_app
+        self.collections = collections
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or Config.CHAT_PREPARE_WORKERS,
+            thread_name_prefix="chat-prepare",
+        )
+        self.client = client or AsyncOpenAI(api_key=Config.OPENAI_KEY)
+        self._prepare_chat = require_identity(prepare_chat)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"] == "/chat"
+        ):
+            await self._chat(scope, receive, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.client.close()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _chat(self, scope, receive, send):
+        body = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        loop = asyncio.get_running_loop()
+        environ = wsgi_environ(scope, b"".join(body))
+        turn, response = await loop.run_in_executor(
+            self.executor, self._prepare, environ
+        )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [
+                    (k.lower().encode("latin1"), v.encode("latin1"))
+                    for k, v in response.headers.items()
+                ],
+            }
+        )
+        if turn is None:
+            await self._send_response(response, send)
+        else:
+            await self._stream(turn, receive, send)
+
+    def _prepare(self, environ):
+        """
+        Run the Flask side of /chat in a worker thread: before_request hooks
+        (identity, rate limits), prepare_chat and after_request hooks.
+        Returns (turn, response); turn is None when the response is final.
+        """
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    collection = self.collections.for_identity(
+                        getattr(g, "identity", None)
+                    )
+                    rv = self._prepare_chat(collection)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+
+            turn = None
+            if isinstance(rv, ChatTurn):
+                turn, rv = rv, Response(mimetype="text/plain")
+            return turn, app.process_response(app.make_response(rv))
+
+    async def _send_response(self, response, send):
+        # Bodies of final responses may be blocking generators (MCP search)
+        loop = asyncio.get_running_loop()
+        chunks = iter(response.iter_encoded())
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+                if chunk is None:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            response.close()
+        await send({"type": "http.response.body", "body": b""})
+
+    async def _stream(self, turn, receive, send):
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        stream = turn.agenerate(self.client)
+        try:
+            async for piece in stream:
+                if disconnected.done():
+                    break
+                await send(
+                    {
+                        "type": "http.response.body",
+                        "body": piece.encode("utf-8"),
+                        "more_body": True,
+                    }
+                )
+            else:
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            # Closing runs the turn's bookkeeping for abandoned streams
+            await stream.aclose()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def create_asgi_app(config_name="development"):
+    """Create the Flask app and wrap it for the async chat serving mode."""
+    flask_app, limiter, collections = create_app(config_name)
+    return AsyncChatApp(flask_app, collections)
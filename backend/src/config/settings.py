@@ -20,6 +20,32 @@ class Config:
     RERANKER_MODEL_NAME = os.getenv(
         "RERANKER_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2"
     )
+    # torch | onnx | onnx-int8 (ONNX Runtime, dynamically quantized export);
+    # the ONNX backends need requirements-onnx.txt
+    INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+    ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_models")
+    ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx512_vnni")
+    # Inference thread budget: INFERENCE_CORES (0 = all available) split
+    # over INFERENCE_WORKERS processes, each running at most
+    # INFERENCE_MAX_CONCURRENT embed/rerank forward passes at a time
+    INFERENCE_CORES = int(os.getenv("INFERENCE_CORES", "0"))
+    INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", os.getenv("WEB_CONCURRENCY", "1")))
+    INFERENCE_MAX_CONCURRENT = int(os.getenv("INFERENCE_MAX_CONCURRENT", "2"))
+    # Startup warm-up: load the reranker and run dummy inference before
+    # /ready turns 200; WARMUP_TENANTS ("dept" or "dept:user", comma
+    # separated) get their BM25 indexes built up front
+    WARMUP = os.getenv("WARMUP", "false").lower() in {"1", "true", "yes", "on"}
+    WARMUP_BACKGROUND = os.getenv("WARMUP_BACKGROUND", "true").lower() in {"1", "true", "yes", "on"}
+    WARMUP_TENANTS = os.getenv("WARMUP_TENANTS", "")
+    # /ready stays 503 when a warm-up step failed, unless this is set
+    WARMUP_READY_WHEN_DEGRADED = os.getenv("WARMUP_READY_WHEN_DEGRADED", "false").lower() in {"1", "true", "yes", "on"}
+    # Shared model server (python -m src.services.model_server): workers
+    # embed and rerank through its Unix socket when MODEL_SERVER_SOCKET is set
+    MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+    MODEL_SERVER_TIMEOUT_S = float(os.getenv("MODEL_SERVER_TIMEOUT_S", "30"))
+    MODEL_SERVER_THREADS = int(os.getenv("MODEL_SERVER_THREADS", "0"))
+    MODEL_SERVER_MAX_BATCH = int(os.getenv("MODEL_SERVER_MAX_BATCH", "64"))
+    MODEL_SERVER_BATCH_WINDOW_MS = float(os.getenv("MODEL_SERVER_BATCH_WINDOW_MS", "2"))
 
     # Search settings
     USE_HYBRID = os.getenv("USE_HYBRID", "false").lower() in {"1", "true", "yes", "on"}
@@ -32,12 +58,49 @@ class Config:
     TOP_K = int(os.getenv("TOP_K", "5"))
     CANDIDATES = int(os.getenv("CANDIDATES", "20"))
     FUSE_ALPHA = float(os.getenv("FUSE_ALPHA", "0.5"))
+    # Hybrid fusion: "weighted" (FUSE_ALPHA) or "rrf" (reciprocal rank)
+    FUSION_MODE = os.getenv("FUSION_MODE", "weighted").lower()
+    RRF_K = int(os.getenv("RRF_K", "60"))
+    # Per-leg score normalization before fusion: "minmax" or "zscore". The
+    # MIN_HYBRID/AVG_HYBRID gates are tuned for minmax's [0, 1] range.
+    FUSION_NORM = os.getenv("FUSION_NORM", "minmax").lower()
+    # Threads running the BM25 leg of hybrid searches beside the semantic leg
+    RETRIEVAL_LEG_WORKERS = int(os.getenv("RETRIEVAL_LEG_WORKERS", "8"))
     MIN_HYBRID = float(os.getenv("MIN_HYBRID", "0.1"))
     AVG_HYBRID = float(os.getenv("AVG_HYBRID", "0.1"))
     MIN_SEM_SIM = float(os.getenv("MIN_SEM_SIM", "0.35"))
     AVG_SEM_SIM = float(os.getenv("AVG_SEM_SIM", "0.2"))
     MIN_RERANK = float(os.getenv("MIN_RERANK", "0.5"))
     AVG_RERANK = float(os.getenv("AVG_RERANK", "0.3"))
+    # Rerank micro-batching across concurrent requests
+    RERANK_MAX_BATCH = int(os.getenv("RERANK_MAX_BATCH", "64"))
+    RERANK_BATCH_WINDOW_MS = float(os.getenv("RERANK_BATCH_WINDOW_MS", "5"))
+    # Rerank score cache (query, chunk, model) -> score
+    RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "50000"))
+    RERANK_CACHE_TTL_S = float(os.getenv("RERANK_CACHE_TTL_S", "3600"))
+    # Query embedding cache (normalized query, embed model) -> vector
+    QUERY_EMBED_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBED_CACHE_MAX_ENTRIES", "10000"))
+    QUERY_EMBED_CACHE_TTL_S = float(os.getenv("QUERY_EMBED_CACHE_TTL_S", "0"))
+    # Retrieval result cache, keyed by tenant scope and corpus version
+    # Versions are per process: with several workers, other workers see an
+    # ingest only after the TTLs below, so the cache is opt-in
+    USE_RESULT_CACHE = os.getenv("USE_RESULT_CACHE", "false").lower() in {"1", "true", "yes", "on"}
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+    RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "128"))
+    RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "300"))
+    # How long a user's "has private documents" lookup is trusted
+    RESULT_CACHE_SCOPE_TTL_S = float(os.getenv("RESULT_CACHE_SCOPE_TTL_S", "30"))
+    # Semantic answer cache for near-duplicate questions (opt-in)
+    USE_ANSWER_CACHE = os.getenv("USE_ANSWER_CACHE", "false").lower() in {"1", "true", "yes", "on"}
+    ANSWER_CACHE_MIN_SIM = float(os.getenv("ANSWER_CACHE_MIN_SIM", "0.92"))
+    ANSWER_CACHE_MIN_OVERLAP = float(os.getenv("ANSWER_CACHE_MIN_OVERLAP", "0.8"))
+    ANSWER_CACHE_MAX_PER_SCOPE = int(os.getenv("ANSWER_CACHE_MAX_PER_SCOPE", "500"))
+    ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "86400"))
+
+    # BM25 index cache (per dept/user tenant)
+    BM25_CACHE_MAX_ENTRIES = int(os.getenv("BM25_CACHE_MAX_ENTRIES", "64"))
+    BM25_CACHE_MAX_MB = float(os.getenv("BM25_CACHE_MAX_MB", "512"))
+    BM25_FETCH_PAGE_SIZE = int(os.getenv("BM25_FETCH_PAGE_SIZE", "1000"))
 
     # Document processing
     SENT_TARGET = int(os.getenv("SENT_TARGET", "400"))
@@ -47,12 +110,38 @@ class Config:
     # Chat settings
     CHAT_MAX_TOKENS = int(os.getenv("CHAT_MAX_TOKENS", "200"))
     MAX_HISTORY = int(os.getenv("MAX_HISTORY", "6"))
+    # Async serving mode (run_asgi.py): threads preparing /chat requests
+    # (auth, retrieval) before their answers stream on the event loop
+    CHAT_PREPARE_WORKERS = int(os.getenv("CHAT_PREPARE_WORKERS", "32"))
 
     # OpenAI
     OPENAI_KEY = os.getenv("OPENAI_API_KEY", "")
 
     # Database
     CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+    # Vector store backend: chroma, or mmap (float16 memory-mapped arrays
+    # with exact "flat" or "ivf" search, under MMAP_STORE_PATH)
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma").lower()
+    MMAP_STORE_PATH = os.getenv("MMAP_STORE_PATH", CHROMA_PATH.rstrip("/\\") + "_mmap")
+    MMAP_INDEX = os.getenv("MMAP_INDEX", "flat").lower()
+    MMAP_IVF_NPROBE = int(os.getenv("MMAP_IVF_NPROBE", "8"))
+    MMAP_IVF_MIN_ROWS = int(os.getenv("MMAP_IVF_MIN_ROWS", "20000"))
+    # First-stage search over quantized codes (none, int8 or binary); the
+    # best MMAP_RESCORE_CANDIDATES rows are rescored with the stored
+    # vectors, and MMAP_RECALL_SAMPLE of queries is checked against exact
+    # search for the recall@k in /metrics. Binary codes usually need a
+    # rescore depth several times CANDIDATES (see vector_store_benchmark.py)
+    MMAP_QUANTIZATION = os.getenv("MMAP_QUANTIZATION", "none").lower()
+    MMAP_RESCORE_CANDIDATES = int(os.getenv("MMAP_RESCORE_CANDIDATES", str(CANDIDATES)))
+    MMAP_RECALL_SAMPLE = float(os.getenv("MMAP_RECALL_SAMPLE", "0.01"))
+    # One vector collection per department instead of the shared "docs"
+    # (split existing data with migrate_collections.py)
+    COLLECTION_PER_DEPT = os.getenv("COLLECTION_PER_DEPT", "false").lower() in {"1", "true", "yes", "on"}
+    # Add the per-tag filter keys to chunks stored before tag filtering the
+    # first time a worker opens their collection (one metadata scan each)
+    TAG_BACKFILL = os.getenv("TAG_BACKFILL", "true").lower() in {"1", "true", "yes", "on"}
+    # Persisted BM25 indexes, next to the Chroma directory ("" disables)
+    BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", CHROMA_PATH.rstrip("/\\") + "_bm25")
 
     # File upload
     UPLOAD_BASE = os.getenv("UPLOAD_BASE", "uploads")
@@ -10,7 +10,10 @@ from src.services.retrieval import retrieve, build_where, build_prompt
 from src.config.settings import Config
 from src.services.mcp_client import search_external
 from src.utils.safety import looks_like_injection, scrub_context
-from src.utils.stream_utils import stream_text_smart
+from src.utils.stream_utils import stream_text, stream_text_smart
+from src.services.answer_cache import answer_cache
+from src.services.query_embedding import query_embeddings
+from src.services.result_cache import retrieval_cache
 
 chat_bp = Blueprint("chat", __name__)
 
@@ -37,10 +40,108 @@ def get_session_history(sid: str, n: int = 20):
     return sanitized_history
 
 
+class ChatTurn:
+    """
+    A /chat request ready for the LLM: prompt messages, retrieved context
+    and the session and answer-cache bookkeeping once the answer is done.
+    Streamed by generate() under WSGI and by agenerate() under ASGI.
+    """
+
+    def __init__(self, sid, user_msg, query, messages, ctx, answer_key=None):
+        self.sid = sid
+        self.user_msg = user_msg
+        self.query = query
+        self.messages = messages
+        self.ctx = ctx
+        self.answer_key = answer_key
+
+    def completion_args(self) -> dict:
+        return {
+            "model": "gpt-4o-mini",
+            "messages": self.messages,
+            "temperature": 0.1,
+            "max_tokens": Config.CHAT_MAX_TOKENS,
+            "stream": True,
+        }
+
+    def finish(self, answer: list, completed: bool) -> str:
+        """Record the turn in the session and return the context trailer."""
+        # Update session history with latest query and assistant answer
+        SESSIONS[self.sid].append(
+            {
+                "role": self.user_msg.get("role"),
+                "content": self.user_msg.get("content"),
+            }
+        )
+        raw_answer = "".join(answer)
+
+        if answer:
+            SESSIONS[self.sid].append({"role": "assistant", "content": raw_answer})
+            # Errored or disconnected streams leave partial answers
+            if self.answer_key and completed:
+                answer_cache.store(*self.answer_key, self.query, raw_answer)
+
+        return f"\n__CONTEXT__:{json.dumps(self.ctx)}"
+
+    def generate(self, client):
+        answer = []
+        completed = False
+        try:
+            resp = client.chat.completions.create(**self.completion_args())
+
+            for chunk in resp:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    answer.append(delta)
+                    yield delta
+            completed = True
+        except Exception as e:
+            print(f"Error: {e}")
+            yield f"\n[upstream_error] {type(e).__name__}: {e}"
+        finally:
+            trailer = self.finish(answer, completed)
+        yield trailer
+
+    async def agenerate(self, client):
+        """generate() for an AsyncOpenAI client, streamed on the event loop."""
+        answer = []
+        completed = False
+        try:
+            resp = await client.chat.completions.create(**self.completion_args())
+            try:
+                async for chunk in resp:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        answer.append(delta)
+                        yield delta
+                completed = True
+            finally:
+                await resp.close()
+        except Exception as e:
+            print(f"Error: {e}")
+            yield f"\n[upstream_error] {type(e).__name__}: {e}"
+        finally:
+            trailer = self.finish(answer, completed)
+        yield trailer
+
+
 @chat_bp.post("/chat")
 @require_identity
 def chat(collection):
     """Chat endpoint with RAG retrieval."""
+    turn = prepare_chat(collection)
+    if not isinstance(turn, ChatTurn):
+        return turn
+    return Response(turn.generate(openai_client), mimetype="text/plain")
+
+
+def prepare_chat(collection):
+    """
+    Validate the /chat request and retrieve its context.
+
+    Returns a ChatTurn to stream from the LLM, or a finished response
+    (errors, no-answer, MCP fallback and answer-cache replays).
+    """
     dept_id = g.identity.get("dept_id", "")
     user_id = g.identity.get("user_id", "")
 
@@ -122,31 +223,46 @@ def chat(collection):
             SESSIONS[sid].append({"role": "assistant", "content": no_answer})
             return Response((no_answer), mimetype="text/plain")
 
-        # Filter tags
-        filters = payload.get("filters", [])
-        tags_filter = next(
-            (
-                f.get("tags")
-                for f in filters
-                if "tags" in f and isinstance(f.get("tags"), list)
-            ),
-            None,
-        )
-        if tags_filter:
-            ctx = [
-                c
-                for c in ctx
-                if any(
-                    tag in c.get("tags", "").lower().split(",") for tag in tags_filter
-                )
-            ]
-
         # Scrub context chunks before sending to LLM
         for c in ctx:
             c["chunk"] = scrub_context(c.get("chunk", ""))
 
-        system, user = build_prompt(query, ctx, use_ctx=True)
         history = get_session_history(sid, Config.MAX_HISTORY)
+
+        # Near-duplicate stand-alone questions replay an earlier answer;
+        # with history the answer also depends on the conversation
+        answer_key = None
+        if Config.USE_ANSWER_CACHE and not history:
+            vector = query_embeddings.embed(query)
+            scope = retrieval_cache.scope(collection, dept_id, user_id, ctx)
+            if vector is not None and scope is not None:
+                answer_key = (
+                    scope,
+                    retrieval_cache.versions(scope),
+                    vector,
+                    [c["chunk_id"] for c in ctx],
+                )
+                cached_answer = answer_cache.lookup(*answer_key)
+                if cached_answer is not None:
+
+                    def replay():
+                        try:
+                            yield from stream_text(cached_answer, chunk_mode="word")
+                        finally:
+                            SESSIONS[sid].append(
+                                {
+                                    "role": latest_user_msg.get("role"),
+                                    "content": latest_user_msg.get("content"),
+                                }
+                            )
+                            SESSIONS[sid].append(
+                                {"role": "assistant", "content": cached_answer}
+                            )
+                            yield f"\n__CONTEXT__:{json.dumps(ctx)}"
+
+                    return Response(replay(), mimetype="text/plain")
+
+        system, user = build_prompt(query, ctx, use_ctx=True)
         messages = (
             [{"role": "system", "content": system}]
             + history
@@ -158,42 +274,7 @@ def chat(collection):
             if m.get("content") and m.get("role") in {"system", "user", "assistant"}
         ]
 
-        def generate():
-            answer = []
-            try:
-                resp = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=messages,
-                    temperature=0.1,
-                    max_tokens=Config.CHAT_MAX_TOKENS,
-                    stream=True,
-                )
-
-                for chunk in resp:
-                    delta = chunk.choices[0].delta.content
-                    if delta:
-                        yield delta
-                        answer.append(delta)
-            except Exception as e:
-                print(f"Error: {e}")
-                yield f"\n[upstream_error] {type(e).__name__}: {e}"
-            finally:
-                # Update session history with latest query and assistant answer
-                if latest_user_msg:
-                    SESSIONS[sid].append(
-                        {
-                            "role": latest_user_msg.get("role"),
-                            "content": latest_user_msg.get("content"),
-                        }
-                    )
-                raw_answer = "".join(answer)
-
-                if answer:
-                    SESSIONS[sid].append({"role": "assistant", "content": raw_answer})
-
-                yield f"\n__CONTEXT__:{json.dumps(ctx)}"
-
-        return Response(generate(), mimetype="text/plain")
+        return ChatTurn(sid, latest_user_msg, query, messages, ctx, answer_key)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -9,7 +9,6 @@ from flask import Blueprint, request, jsonify, g
 from src.middleware.auth import require_identity
 from src.utils.file_utils import get_upload_dir
 from src.services.ingestion import ingest_one
-from src.services.retrieval import build_bm25
 from src.config.settings import Config
 
 ingest_bp = Blueprint("ingest", __name__)
@@ -82,11 +81,7 @@ def ingest(collection):
         if fid:
             ingested_info = f"{fid}\n"
 
-    # Rebuild BM25 index
-    build_bm25(collection, dept_id, user_id)
-
-    docs = collection.get(include=["documents"])["documents"]
-    count = len(docs) if docs else 0
+    count = collection.count()
     ingested_info = f"{ingested_info}\n and the count of chunks is: {count}"
 
     msg = (
@@ -0,0 +1,163 @@
+"""
+Semantic answer cache.
+Questions that differ only in wording get the answer generated for an
+earlier one, found by embedding similarity over the recent questions of
+the same visibility scope, as long as retrieval returned nearly the same
+context. Entries of a scope are dropped when its corpus version changes.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from src.config.settings import Config
+
+
+class AnswerEntry:
+    """One cached answer and the context it was generated from."""
+
+    __slots__ = ("question", "answer", "chunk_ids", "created_at")
+
+    def __init__(self, question: str, answer: str, chunk_ids: frozenset):
+        self.question = question
+        self.answer = answer
+        self.chunk_ids = chunk_ids
+        self.created_at = time.monotonic()
+
+
+class ScopeIndex:
+    """Unit-normalized question vectors of one scope, oldest first."""
+
+    def __init__(self, versions: tuple):
+        self.versions = versions
+        self.vectors = None  # (n, dim) float32
+        self.entries = []
+
+    def add(self, vector: np.ndarray, entry: AnswerEntry, max_entries: int):
+        row = vector[None, :]
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+        self.entries.append(entry)
+        if len(self.entries) > max_entries:
+            drop = len(self.entries) - max_entries
+            self.vectors = self.vectors[drop:]
+            del self.entries[:drop]
+
+
+def _unit(vector) -> Optional[np.ndarray]:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+def context_overlap(a: frozenset, b: frozenset) -> float:
+    """Jaccard overlap of two sets of chunk ids."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by scope (see RetrievalResultCache.scope), searched by
+    cosine similarity of the question embedding.
+
+    lookup() returns an answer when a recent question of the same scope
+    and corpus versions is at least min_sim similar and its context chunk
+    ids overlap the current ones by at least min_overlap (Jaccard).
+    """
+
+    def __init__(
+        self,
+        min_sim: float,
+        min_overlap: float,
+        max_per_scope: int,
+        ttl: float = 0,
+        max_scopes: int = 1024,
+    ):
+        self.min_sim = min_sim
+        self.min_overlap = min_overlap
+        self.max_per_scope = max_per_scope
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self._scopes = OrderedDict()  # scope -> ScopeIndex
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def lookup(self, scope: tuple, versions: tuple, vector, chunk_ids) -> Optional[str]:
+        """Cached answer for a near-duplicate question, or None."""
+        query = _unit(vector)
+        chunk_ids = frozenset(chunk_ids)
+        with self._lock:
+            index = self._index(scope, versions, create=False)
+            if index is None or query is None:
+                self.misses += 1
+                return None
+            sims = index.vectors @ query
+            expired_before = time.monotonic() - self.ttl if self.ttl else None
+            for i in np.argsort(-sims, kind="stable"):
+                if sims[i] < self.min_sim:
+                    break
+                entry = index.entries[i]
+                if expired_before is not None and entry.created_at < expired_before:
+                    continue
+                if context_overlap(entry.chunk_ids, chunk_ids) >= self.min_overlap:
+                    self.hits += 1
+                    return entry.answer
+            self.misses += 1
+            return None
+
+    def store(self, scope: tuple, versions: tuple, vector, chunk_ids, question: str, answer: str):
+        """Remember the answer generated for question from the given context."""
+        unit = _unit(vector)
+        if unit is None or not answer:
+            return
+        with self._lock:
+            index = self._index(scope, versions, create=True)
+            index.add(unit, AnswerEntry(question, answer, frozenset(chunk_ids)), self.max_per_scope)
+            self.stores += 1
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the number of cached answers."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "scopes": len(self._scopes),
+                "entries": sum(len(index.entries) for index in self._scopes.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _index(self, scope: tuple, versions: tuple, create: bool) -> Optional[ScopeIndex]:
+        """The scope's index, emptied when its corpus versions moved on."""
+        index = self._scopes.get(scope)
+        if index is not None and index.versions != versions:
+            del self._scopes[scope]
+            self.invalidations += 1
+            index = None
+        if index is None:
+            if not create:
+                return None
+            index = self._scopes[scope] = ScopeIndex(versions)
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+        self._scopes.move_to_end(scope)
+        return index
+
+
+answer_cache = SemanticAnswerCache(
+    min_sim=Config.ANSWER_CACHE_MIN_SIM,
+    min_overlap=Config.ANSWER_CACHE_MIN_OVERLAP,
+    max_per_scope=Config.ANSWER_CACHE_MAX_PER_SCOPE,
+    ttl=Config.ANSWER_CACHE_TTL_S,
+)
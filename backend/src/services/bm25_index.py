@@ -0,0 +1,1367 @@
+"""
+BM25 index management for hybrid retrieval.
+Keeps one lexical index per department for its shared chunks plus a small
+overlay per user for their private chunks, merged at query time with
+global statistics, in an LRU bounded by entry count and memory budget.
+Indexes are updated in place on ingest instead of being rebuilt, scored
+through a sparse inverted index with pruned top-k selection, and persisted
+to memory-mapped files so restarts and sibling workers can reuse them.
+"""
+
+import os
+import sys
+import json
+import math
+import fcntl
+import bisect
+import shutil
+import hashlib
+import logging
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, Optional
+import numpy as np
+from src.config.settings import Config
+from src.services.filters import (
+    matches_where,
+    private_where,
+    shared_where,
+    tag_fields,
+)
+
+
+class BM25Index:
+    """
+    Updatable BM25 (Okapi) index over a tenant's chunks.
+
+    Scores match rank_bm25.BM25Okapi (same k1/b/epsilon and idf floor), but
+    chunks can be added or removed one file at a time while document
+    frequencies and the average document length stay exact.
+
+    Postings live in a compressed sparse row segment (term -> slots/tfs as
+    NumPy arrays) plus a small dict-based delta segment for chunks added
+    since the last compaction. Removed chunks are tombstoned until the delta
+    or the tombstones grow large enough to fold everything back into CSR.
+    Scoring only touches the postings of the query terms.
+
+    save() writes the CSR segment once; later saves of the same segment
+    (save_delta()) only rewrite the delta chunks and tombstones.
+
+    Filterable metadata fields (FILTER_FIELDS) keep a slot set per value,
+    so a where clause on them is resolved to a chunk mask without decoding
+    any metadata, and scoring and top-k selection skip filtered-out chunks.
+
+    An index loaded with BM25Index.load() is a read-only view over
+    memory-mapped files; the first update copies it into memory.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        # Per-slot columns; a chunk's position is its slot. Removed delta
+        # slots hold None until the next compaction; removed CSR slots keep
+        # their text and metadata so the segment can be saved as it is.
+        self._ids = []
+        self._docs = []
+        self._metas = []
+        self._doc_len = np.zeros(0, dtype=np.float64)
+        self._live = np.zeros(0, dtype=bool)
+        self._slots = {}  # chunk_id -> slot, live chunks only
+
+        # CSR segment over slots [0, _n_main): term id -> postings range
+        self._vocab = {}
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._post_slots = np.zeros(0, dtype=np.int32)
+        self._post_tfs = np.zeros(0, dtype=np.float32)
+        self._n_main = 0
+        self._segment = uuid.uuid4().hex  # identifies the CSR segment on disk
+
+        # Delta segment over slots >= _n_main: term -> {slot: tf}
+        self._delta = {}
+        self._delta_nnz = 0
+
+        self._df = {}  # term -> number of live chunks containing it
+        self._total_len = 0
+        self._n_dead = 0
+        self._file_chunks = {}  # file_id -> set of chunk_ids
+        self._field_slots = {}  # filter key (see _filter_keys) -> [slot]
+        self._field_nnz = 0
+        self._chunk_nbytes = 0
+        self._n_live = 0
+        self._average_idf = None
+        self._version = 0  # bumped whenever the corpus statistics change
+        self._mapped = False
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._n_live
+
+    @property
+    def ids(self) -> list:
+        """Live chunk ids, in slot order."""
+        with self._lock:
+            return [self._ids[i] for i in self._live_slots()]
+
+    @property
+    def n_docs(self) -> int:
+        return self._n_live
+
+    @property
+    def total_len(self) -> int:
+        return self._total_len
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def segment(self) -> str:
+        """Id of the CSR segment; changes on every compaction."""
+        return self._segment
+
+    def df(self, term: str) -> int:
+        """Number of live chunks containing term."""
+        if self._mapped:
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                return 0
+            return int(self._indptr[term_id + 1] - self._indptr[term_id])
+        return self._df.get(term, 0)
+
+    def idf(self, term: str) -> float:
+        return self._idf(self.df(term), self._n_live)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory footprint of the index."""
+        if self._mapped:
+            # Postings and columns live in the shared page cache, not the heap
+            return self._live.nbytes
+        return (
+            self._chunk_nbytes
+            + self._delta_nnz * _POSTING_NBYTES
+            + self._field_nnz * _FIELD_POSTING_NBYTES
+            + len(self._vocab) * _TERM_NBYTES
+            + self._indptr.nbytes
+            + self._post_slots.nbytes
+            + self._post_tfs.nbytes
+            + self._doc_len.nbytes
+            + self._live.nbytes
+        )
+
+    def add(self, ids: list, docs: list, metas: list):
+        """Add chunks, replacing any chunk whose id is already indexed."""
+        with self._lock:
+            self._thaw()
+            if not self._ids:
+                # Bulk build: write the CSR segment directly, skipping the delta
+                self._load(ids, docs, metas)
+                return
+            for chunk_id, doc, meta in zip(ids, docs, metas):
+                if chunk_id in self._slots:
+                    self._remove_one(chunk_id)
+                self._add_one(chunk_id, doc, meta or {})
+            self._average_idf = None
+            self._version += 1
+            self._maybe_compact()
+
+    def remove(self, ids: Iterable[str]):
+        """Remove chunks by id; unknown ids are ignored."""
+        with self._lock:
+            self._thaw()
+            for chunk_id in list(ids):
+                if chunk_id in self._slots:
+                    self._remove_one(chunk_id)
+            self._average_idf = None
+            self._version += 1
+            self._maybe_compact()
+
+    def remove_file(self, file_id: str):
+        """Remove every chunk that belongs to the given file."""
+        with self._lock:
+            self._thaw()
+            self.remove(self._file_chunks.get(file_id, ()))
+
+    def search(
+        self, query_tokens: list, n: int, stats=None, where: Optional[dict] = None
+    ) -> list:
+        """
+        Return the n best chunks as (score, chunk_id, doc, meta) tuples,
+        highest score first.
+
+        Only chunks sharing a term with the query are scored; the top n are
+        picked with argpartition instead of sorting every score. If fewer
+        than n chunks match, zero-score chunks fill the remaining places
+        so callers see the same candidate count as a dense ranking.
+
+        stats supplies the corpus statistics (n_docs, total_len, idf) when
+        this index is one layer of a larger corpus; defaults to the index.
+        where is a ChromaDB-style metadata filter; only matching chunks are
+        returned (corpus statistics still cover every chunk).
+        """
+        return self.search_many([query_tokens], n, stats=stats, where=where)[0]
+
+    def search_many(
+        self, queries_tokens: list, n: int, stats=None, where: Optional[dict] = None
+    ) -> list:
+        """
+        search() for several queries at once: the filter mask is built once
+        and each distinct term's postings are weighted once for all queries.
+        """
+        with self._lock:
+            if not self._n_live or n <= 0:
+                return [[] for _ in queries_tokens]
+            candidates = self._live[: len(self._ids)]
+            if where:
+                candidates = candidates & self._filter_mask(where)
+            term_scores = {}
+            return [
+                self._top_n(
+                    *self._score_matches(query_tokens, stats, term_scores), candidates, n
+                )
+                for query_tokens in queries_tokens
+            ]
+
+    def get_scores(self, query_tokens: list) -> np.ndarray:
+        """BM25 score of every live chunk, in the same order as ids."""
+        with self._lock:
+            live = self._live_slots()
+            dense = np.zeros(len(self._ids))
+            slots, scores = self._score_matches(query_tokens)
+            dense[slots] = scores
+            return dense[live]
+
+    def compact(self):
+        """Fold the delta segment and tombstones into a fresh CSR segment."""
+        with self._lock:
+            self._thaw()
+            live = self._live_slots()
+            self._ids = [self._ids[i] for i in live]
+            self._docs = [self._docs[i] for i in live]
+            self._metas = [self._metas[i] for i in live]
+            self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._ids)}
+            self._build_csr()
+
+    def _load(self, ids: list, docs: list, metas: list):
+        """Index chunks into an empty index in one pass."""
+        unique = {}
+        for chunk_id, doc, meta in zip(ids, docs, metas):
+            unique[chunk_id] = (doc, meta or {})  # last upsert wins
+        self._ids = list(unique)
+        self._docs = [doc for doc, _ in unique.values()]
+        self._metas = [meta for _, meta in unique.values()]
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._ids)}
+        for chunk_id, doc, meta in zip(self._ids, self._docs, self._metas):
+            self._file_chunks.setdefault(meta.get("file_id", ""), set()).add(chunk_id)
+            self._chunk_nbytes += _estimate_nbytes(chunk_id, doc, meta)
+        self._build_csr()
+
+    def _build_csr(self):
+        """Rebuild postings, df and lengths from the (all live) columns."""
+        vocab = {}
+        rows, cols, tfs = [], [], []
+        doc_len = np.zeros(len(self._docs), dtype=np.float64)
+        for slot, doc in enumerate(self._docs):
+            tokens = doc.split()
+            doc_len[slot] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                rows.append(vocab.setdefault(term, len(vocab)))
+                cols.append(slot)
+                tfs.append(tf)
+
+        # Number terms in sorted order so a saved vocabulary can be searched
+        terms = sorted(vocab)
+        remap = np.empty(len(vocab), dtype=np.int64)
+        remap[[vocab[t] for t in terms]] = np.arange(len(terms))
+        vocab = {t: i for i, t in enumerate(terms)}
+        rows = remap[np.asarray(rows, dtype=np.int64)]
+        order = np.argsort(rows, kind="stable")
+        df = np.bincount(rows, minlength=len(vocab))
+
+        self._doc_len = doc_len
+        self._live = np.ones(len(self._ids), dtype=bool)
+        self._vocab = vocab
+        self._indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df, out=self._indptr[1:])
+        self._post_slots = np.asarray(cols, dtype=np.int32)[order]
+        self._post_tfs = np.asarray(tfs, dtype=np.float32)[order]
+        self._df = dict(zip(vocab, df.tolist()))
+        self._index_fields()
+        self._total_len = int(doc_len.sum())
+        self._n_live = len(self._ids)
+        self._n_main = len(self._ids)
+        self._segment = uuid.uuid4().hex
+        self._delta = {}
+        self._delta_nnz = 0
+        self._n_dead = 0
+        self._average_idf = None
+
+    def _score_matches(self, query_tokens: list, stats=None, term_scores=None):
+        """
+        Return (slots, scores) for live chunks containing any query term.
+        term_scores memoizes each term's (slots, weights) across queries.
+        """
+        stats = stats or self
+        term_scores = {} if term_scores is None else term_scores
+        slot_parts, score_parts = [], []
+        for term, query_tf in Counter(query_tokens).items():
+            if term not in term_scores:
+                term_scores[term] = self._term_scores(term, stats)
+            slots, weights = term_scores[term]
+            if not len(slots):
+                continue
+            slot_parts.append(slots)
+            score_parts.append(query_tf * weights)
+
+        if not slot_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        # Sum per-term contributions per chunk without a corpus-sized array
+        slots, inverse = np.unique(np.concatenate(slot_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        return slots, scores
+
+    def _term_scores(self, term: str, stats):
+        """(slots, BM25 weight) of the live chunks containing term."""
+        slots, tf = self._postings(term)
+        if not len(slots):
+            return slots, tf
+        avgdl = stats.total_len / stats.n_docs
+        denom = tf + self.k1 * (1 - self.b + self.b * self._doc_len[slots] / avgdl)
+        return slots, stats.idf(term) * (tf * (self.k1 + 1) / denom)
+
+    def _top_n(self, slots: np.ndarray, scores: np.ndarray, candidates: np.ndarray, n: int):
+        """Best n of the scored slots among candidates, padded as search() describes."""
+        keep = candidates[slots]
+        slots, scores = slots[keep], scores[keep]
+
+        if len(slots) < n:
+            unmatched = np.setdiff1d(
+                np.flatnonzero(candidates), slots, assume_unique=True
+            )
+            pad = unmatched[::-1][: n - len(slots)]
+            slots = np.concatenate([slots, pad])
+            scores = np.concatenate([scores, np.zeros(len(pad))])
+
+        if len(slots) > n:
+            top = np.argpartition(-scores, n - 1)[:n]
+        else:
+            top = np.arange(len(slots))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (
+                float(scores[i]),
+                self._ids[slots[i]],
+                self._docs[slots[i]],
+                self._metas[slots[i]],
+            )
+            for i in top
+        ]
+
+    def _postings(self, term: str):
+        """Live (slots, tfs) for a term across the CSR and delta segments."""
+        slot_parts, tf_parts = [], []
+        term_id = self._vocab.get(term)
+        if term_id is not None:
+            start, end = self._indptr[term_id], self._indptr[term_id + 1]
+            slot_parts.append(self._post_slots[start:end].astype(np.int64))
+            tf_parts.append(self._post_tfs[start:end].astype(np.float64))
+        delta = self._delta.get(term)
+        if delta:
+            slot_parts.append(np.fromiter(delta.keys(), dtype=np.int64, count=len(delta)))
+            tf_parts.append(np.fromiter(delta.values(), dtype=np.float64, count=len(delta)))
+
+        if not slot_parts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        slots = np.concatenate(slot_parts)
+        tf = np.concatenate(tf_parts)
+        if self._n_dead:
+            keep = self._live[slots]
+            slots, tf = slots[keep], tf[keep]
+        return slots, tf
+
+    def _idf(self, df: int, n_docs: int) -> float:
+        idf = math.log(n_docs - df + 0.5) - math.log(df + 0.5)
+        if idf >= 0:
+            return idf
+        # Terms in more than half the corpus get a floor of eps * average idf
+        if self._average_idf is None:
+            dfs = self._df_array()
+            self._average_idf = float(
+                np.mean(np.log(n_docs - dfs + 0.5) - np.log(dfs + 0.5))
+            )
+        return self.epsilon * self._average_idf
+
+    def _df_array(self) -> np.ndarray:
+        """Document frequency of every term, in no particular order."""
+        if self._mapped:
+            return np.diff(self._indptr).astype(np.float64)
+        return np.fromiter(self._df.values(), dtype=np.float64, count=len(self._df))
+
+    def _df_items(self):
+        """(term, df) pairs for every term."""
+        if self._mapped:
+            return zip(self._vocab.terms, np.diff(self._indptr).tolist())
+        return self._df.items()
+
+    def _index_fields(self):
+        """Rebuild the filter field slot sets from the metadata column."""
+        self._field_slots = {}
+        self._field_nnz = 0
+        for slot, meta in enumerate(self._metas):
+            if meta is not None:
+                self._add_fields(slot, meta)
+
+    def _add_fields(self, slot: int, meta: dict):
+        for key in _filter_keys(meta):
+            self._field_slots.setdefault(key, []).append(slot)
+            self._field_nnz += 1
+
+    def _field_postings(self, key: str) -> np.ndarray:
+        """Slots (live or not) whose metadata has the given filter key."""
+        if self._mapped:
+            key_id = self._field_vocab.get(key)
+            if key_id is None:
+                return np.zeros(0, dtype=np.int64)
+            start, end = self._field_indptr[key_id], self._field_indptr[key_id + 1]
+            return self._field_post[start:end]
+        return np.asarray(self._field_slots.get(key, ()), dtype=np.int64)
+
+    def _filter_mask(self, where: dict) -> np.ndarray:
+        """Evaluate a where clause to a boolean mask over slots."""
+        n_slots = len(self._ids)
+        if "$and" in where:
+            mask = np.ones(n_slots, dtype=bool)
+            for clause in where["$and"]:
+                mask &= self._filter_mask(clause)
+            return mask
+        if "$or" in where:
+            mask = np.zeros(n_slots, dtype=bool)
+            for clause in where["$or"]:
+                mask |= self._filter_mask(clause)
+            return mask
+        if len(where) > 1:
+            return self._filter_mask({"$and": [{k: v} for k, v in where.items()]})
+
+        field, condition = next(iter(where.items()))
+        op, value = (
+            next(iter(condition.items()))
+            if isinstance(condition, dict)
+            else ("$eq", condition)
+        )
+        if _is_filter_field(field) and op in ("$eq", "$ne", "$in", "$nin"):
+            mask = np.zeros(n_slots, dtype=bool)
+            for v in value if op in ("$in", "$nin") else [value]:
+                mask[self._field_postings(_filter_key(field, v))] = True
+            if op in ("$ne", "$nin"):
+                # Chunks without the field match neither (see matches_where)
+                present = np.zeros(n_slots, dtype=bool)
+                present[self._field_postings(_presence_key(field))] = True
+                return present & ~mask
+            return mask
+
+        # Other fields: fall back to checking each chunk's metadata
+        return np.fromiter(
+            (meta is not None and matches_where(meta, where) for meta in self._metas),
+            dtype=bool,
+            count=n_slots,
+        )
+
+    def _live_slots(self) -> np.ndarray:
+        return np.flatnonzero(self._live[: len(self._ids)])
+
+    def _add_one(self, chunk_id: str, doc: str, meta: dict):
+        slot = len(self._ids)
+        if slot == len(self._live):
+            capacity = max(16, 2 * slot)
+            doc_len = np.zeros(capacity, dtype=np.float64)
+            doc_len[:slot] = self._doc_len[:slot]
+            live = np.zeros(capacity, dtype=bool)
+            live[:slot] = self._live[:slot]
+            self._doc_len, self._live = doc_len, live
+
+        tokens = doc.split()
+        term_freqs = Counter(tokens)
+        self._ids.append(chunk_id)
+        self._docs.append(doc)
+        self._metas.append(meta)
+        self._doc_len[slot] = len(tokens)
+        self._live[slot] = True
+        self._slots[chunk_id] = slot
+        self._n_live += 1
+        self._total_len += len(tokens)
+        for term, tf in term_freqs.items():
+            self._delta.setdefault(term, {})[slot] = tf
+            self._df[term] = self._df.get(term, 0) + 1
+        self._delta_nnz += len(term_freqs)
+        self._add_fields(slot, meta)
+        self._file_chunks.setdefault(meta.get("file_id", ""), set()).add(chunk_id)
+        self._chunk_nbytes += _estimate_nbytes(chunk_id, doc, meta)
+
+    def _remove_one(self, chunk_id: str):
+        slot = self._slots.pop(chunk_id)
+        doc = self._docs[slot]
+        meta = self._metas[slot]
+
+        for term in set(doc.split()):
+            df = self._df[term] - 1
+            if df:
+                self._df[term] = df
+            else:
+                del self._df[term]
+            # CSR postings stay in place and are masked by _live
+            if slot >= self._n_main:
+                postings = self._delta[term]
+                del postings[slot]
+                self._delta_nnz -= 1
+                if not postings:
+                    del self._delta[term]
+        self._total_len -= int(self._doc_len[slot])
+        self._live[slot] = False
+        if slot >= self._n_main:
+            self._docs[slot] = None
+            self._metas[slot] = None
+        self._n_dead += 1
+        self._n_live -= 1
+        self._chunk_nbytes -= _estimate_nbytes(chunk_id, doc, meta)
+
+        file_chunks = self._file_chunks.get(meta.get("file_id", ""))
+        if file_chunks is not None:
+            file_chunks.discard(chunk_id)
+            if not file_chunks:
+                del self._file_chunks[meta.get("file_id", "")]
+
+    def save(self, path: str):
+        """
+        Write the index as a directory of .npy files that load() can map.
+
+        Layout (format version BM25_FORMAT_VERSION): manifest.json with the
+        segment id and its corpus statistics, CSR postings
+        (indptr/post_slots/post_tfs), doc_len, and UTF-8 string tables
+        (offsets + bytes) for the sorted vocabulary, chunk ids, chunk texts
+        and JSON-encoded metadata, plus the filter field slot sets as a
+        sorted key table with CSR slot arrays. The delta segment and the
+        tombstones go to delta.json (see save_delta()), so saving does not
+        compact the index.
+        """
+        with self._lock:
+            self._thaw()
+            n = self._n_main
+            segment = self._segment
+            arrays = {
+                "indptr": self._indptr,
+                "post_slots": self._post_slots,
+                "post_tfs": self._post_tfs,
+                "doc_len": self._doc_len[:n],
+            }
+            field_post = {}
+            for key, slots in self._field_slots.items():
+                # Slots are appended in order, so the segment's are a prefix
+                end = bisect.bisect_left(slots, n)
+                if end:
+                    field_post[key] = slots[:end]
+            tables = {
+                "terms": _term_order(self._vocab),
+                "ids": self._ids[:n],
+                "docs": self._docs[:n],
+                "metas": self._metas[:n],
+            }
+            total_len = int(self._doc_len[:n].sum())
+            delta = self._delta_state()
+
+        # A CSR segment is never modified in place (compaction builds a new
+        # one), so it is written without holding the lock
+        os.makedirs(path, exist_ok=True)
+        field_keys = sorted(field_post)
+        arrays["field_indptr"] = np.zeros(len(field_keys) + 1, dtype=np.int64)
+        np.cumsum([len(field_post[k]) for k in field_keys], out=arrays["field_indptr"][1:])
+        arrays["field_post"] = np.asarray(
+            [slot for k in field_keys for slot in field_post[k]], dtype=np.int64
+        )
+        tables["field_keys"] = field_keys
+        tables["metas"] = [json.dumps(m, ensure_ascii=False) for m in tables["metas"]]
+        for name, values in tables.items():
+            arrays[f"{name}_offsets"], arrays[f"{name}_bytes"] = _pack_strings(values)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+        _write_delta(path, delta)
+
+        manifest = {
+            "format_version": BM25_FORMAT_VERSION,
+            "segment": segment,
+            "n_docs": n,
+            "n_terms": len(tables["terms"]),
+            "total_len": total_len,
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+        }
+        # Written last: a directory without a manifest is incomplete
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    def save_delta(self, path: str) -> bool:
+        """
+        Update an index saved at path by rewriting only its delta.json: the
+        chunks added since the CSR segment was written and the segment's
+        removed chunks. Returns False, writing nothing, when path holds a
+        different segment (the index was compacted since) or no index.
+        """
+        saved = _saved_segment(path)
+        with self._lock:
+            if saved != self._segment:
+                return False
+            delta = self._delta_state()
+        _write_delta(path, delta)
+        return True
+
+    def _delta_state(self) -> dict:
+        # Caller holds self._lock
+        n = self._n_main
+        return {
+            "segment": self._segment,
+            "removed": [self._ids[slot] for slot in np.flatnonzero(~self._live[:n])],
+            "added": [
+                [self._ids[slot], self._docs[slot], self._metas[slot]]
+                for slot in range(n, len(self._ids))
+                if self._live[slot]
+            ],
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Open a saved index read-only, memory-mapping its arrays."""
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != BM25_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported BM25 index format {manifest.get('format_version')}"
+            )
+
+        def mapped(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        def table(name):
+            return _StringTable(mapped(f"{name}_offsets"), mapped(f"{name}_bytes"))
+
+        index = cls(manifest["k1"], manifest["b"], manifest["epsilon"])
+        n_docs = manifest["n_docs"]
+        index._ids = table("ids")
+        index._docs = table("docs")
+        index._metas = _JsonTable(table("metas"))
+        index._vocab = _MappedVocab(table("terms"))
+        index._indptr = mapped("indptr")
+        index._post_slots = mapped("post_slots")
+        index._post_tfs = mapped("post_tfs")
+        index._field_vocab = _MappedVocab(table("field_keys"))
+        index._field_indptr = mapped("field_indptr")
+        index._field_post = mapped("field_post")
+        index._field_slots = None
+        index._doc_len = mapped("doc_len")
+        index._live = np.ones(n_docs, dtype=bool)
+        index._slots = None
+        index._file_chunks = None
+        index._df = None
+        index._total_len = manifest["total_len"]
+        index._n_live = n_docs
+        index._n_main = n_docs
+        index._segment = manifest["segment"]
+        index._mapped = True
+
+        delta = _read_delta(path)
+        if delta and delta["segment"] == index._segment:
+            # Replaying the updates copies the index into memory
+            if delta["removed"]:
+                index.remove(delta["removed"])
+            if delta["added"]:
+                ids, docs, metas = (list(column) for column in zip(*delta["added"]))
+                index.add(ids, docs, metas)
+        return index
+
+    def _thaw(self):
+        """Copy a memory-mapped index into mutable in-memory structures."""
+        if not self._mapped:
+            return
+        self._ids = list(self._ids)
+        self._docs = list(self._docs)
+        self._metas = list(self._metas)
+        terms = list(self._vocab.terms)
+        self._vocab = {t: i for i, t in enumerate(terms)}
+        self._indptr = np.array(self._indptr)
+        self._post_slots = np.array(self._post_slots)
+        self._post_tfs = np.array(self._post_tfs)
+        self._doc_len = np.array(self._doc_len)
+        self._df = dict(zip(terms, np.diff(self._indptr).tolist()))
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._ids)}
+        self._file_chunks = {}
+        self._chunk_nbytes = 0
+        for chunk_id, doc, meta in zip(self._ids, self._docs, self._metas):
+            self._file_chunks.setdefault(meta.get("file_id", ""), set()).add(chunk_id)
+            self._chunk_nbytes += _estimate_nbytes(chunk_id, doc, meta)
+        self._index_fields()
+        self._mapped = False
+
+    def _maybe_compact(self):
+        # Merge once the delta or the tombstones reach a fraction of the CSR
+        # segment, so compaction cost stays amortized over the updates
+        main_nnz = len(self._post_slots)
+        if (
+            self._delta_nnz > _COMPACT_RATIO * main_nnz
+            or self._n_dead > _COMPACT_RATIO * max(len(self._ids), 1)
+        ):
+            self.compact()
+
+
+# Delta postings or tombstones, as a fraction of the CSR segment, that
+# trigger a compaction
+_COMPACT_RATIO = 0.25
+
+# Bump whenever the on-disk layout written by BM25Index.save() changes
+BM25_FORMAT_VERSION = 4
+
+# Metadata fields with per-value slot sets, plus one set of the chunks that
+# have the field at all. Tags are indexed per tag under the tag_<name>: True
+# key that tags_where() clauses look up.
+FILTER_FIELDS = ("ext", "tags", "file_id", "page")
+
+
+def _is_filter_field(field: str) -> bool:
+    return (field in FILTER_FIELDS and field != "tags") or field.startswith("tag_")
+
+
+def _filter_key(field: str, value) -> str:
+    return f"{field}\x1f{value}"
+
+
+def _presence_key(field: str) -> str:
+    """Filter key of every chunk that has the field."""
+    # Tag keys are only ever True, so that value's set is their presence set
+    return _filter_key(field, True) if field.startswith("tag_") else f"{field}\x1e"
+
+
+def _filter_keys(meta: dict) -> list:
+    """Filter keys of one chunk's metadata."""
+    keys = []
+    for field in FILTER_FIELDS:
+        value = meta.get(field)
+        if value is None:
+            continue
+        if field == "tags":
+            keys.extend(_filter_key(key, True) for key in tag_fields(str(value)))
+            continue
+        keys.append(_presence_key(field))
+        if value != "":
+            keys.append(_filter_key(field, value))
+    return keys
+
+
+def _saved_segment(path: str) -> Optional[str]:
+    """Segment id of the index saved at path, or None when there is none."""
+    try:
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f).get("segment")
+    except (OSError, ValueError):
+        return None
+
+
+def _read_delta(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, "delta.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_delta(path: str, delta: dict):
+    """Atomically replace path/delta.json."""
+    tmp = os.path.join(path, f"delta.json.tmp-{os.getpid()}-{threading.get_ident()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(delta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(path, "delta.json"))
+
+
+def _pack_strings(values) -> tuple:
+    """Encode strings as (int64 offsets, uint8 UTF-8 bytes) arrays."""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    # np.load cannot map an empty file region
+    return offsets, data if len(data) else np.zeros(1, dtype=np.uint8)
+
+
+def _term_order(vocab: dict) -> list:
+    """Terms ordered by term id (sorted, see _build_csr)."""
+    terms = [None] * len(vocab)
+    for term, term_id in vocab.items():
+        terms[term_id] = term
+    return terms
+
+
+class _StringTable:
+    """Read-only sequence of strings over packed offsets/bytes arrays."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class _JsonTable:
+    """Sequence of metadata dicts decoded lazily from a string table."""
+
+    def __init__(self, table: _StringTable):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        return json.loads(self.table[i])
+
+    def __iter__(self):
+        return (json.loads(s) for s in self.table)
+
+
+class _MappedVocab:
+    """Term -> term id lookup by binary search over the sorted term table."""
+
+    def __init__(self, terms: _StringTable):
+        self.terms = terms
+
+    def __len__(self):
+        return len(self.terms)
+
+    def get(self, term: str):
+        i = bisect.bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+# Approximate cost of one delta postings entry ({slot: tf} dict slot plus
+# ints), of one vocabulary entry, of one filter field slot and of the
+# per-chunk bookkeeping (_slots, _file_chunks, list columns)
+_POSTING_NBYTES = 100
+_TERM_NBYTES = 100
+_FIELD_POSTING_NBYTES = 40
+_CHUNK_OVERHEAD_NBYTES = 200
+
+
+def _estimate_nbytes(chunk_id: str, doc: str, meta: dict) -> int:
+    """Rough memory footprint of one chunk's text, id and metadata."""
+    meta_nbytes = sys.getsizeof(meta) + sum(
+        sys.getsizeof(k) + sys.getsizeof(v) for k, v in meta.items()
+    )
+    return (
+        sys.getsizeof(doc)
+        + sys.getsizeof(chunk_id)
+        + meta_nbytes
+        + _CHUNK_OVERHEAD_NBYTES
+    )
+
+
+class LayeredBM25Index:
+    """
+    A user's view of the corpus: the department's shared index plus the
+    user's private overlay, scored as if they were one BM25 index.
+
+    Document count, total length and document frequencies are summed
+    across both layers, so every chunk gets the score it would have in a
+    single index over the union (including the idf floor, whose average
+    is cached until either layer changes).
+    """
+
+    def __init__(self, shared: BM25Index, private: BM25Index):
+        self.shared = shared
+        self.private = private
+        self.epsilon = shared.epsilon
+        self._average_idf = None
+        self._average_idf_versions = None
+
+    def __len__(self):
+        return self.n_docs
+
+    @property
+    def n_docs(self) -> int:
+        return self.shared.n_docs + self.private.n_docs
+
+    @property
+    def total_len(self) -> int:
+        return self.shared.total_len + self.private.total_len
+
+    def df(self, term: str) -> int:
+        return self.shared.df(term) + self.private.df(term)
+
+    def idf(self, term: str) -> float:
+        n_docs = self.n_docs
+        df = self.df(term)
+        idf = math.log(n_docs - df + 0.5) - math.log(df + 0.5)
+        if idf >= 0:
+            return idf
+        return self.epsilon * self._average()
+
+    def search(self, query_tokens: list, n: int, where: Optional[dict] = None) -> list:
+        """Best n chunks across both layers, as BM25Index.search()."""
+        return self.search_many([query_tokens], n, where=where)[0]
+
+    def search_many(self, queries_tokens: list, n: int, where: Optional[dict] = None) -> list:
+        """search() for several queries, one batched pass per layer."""
+        if not self.n_docs or n <= 0:
+            return [[] for _ in queries_tokens]
+        shared = self.shared.search_many(queries_tokens, n, stats=self, where=where)
+        private = self.private.search_many(queries_tokens, n, stats=self, where=where)
+        results = []
+        for hits, overlay in zip(shared, private):
+            hits += overlay
+            hits.sort(key=lambda hit: hit[0], reverse=True)
+            results.append(hits[:n])
+        return results
+
+    def _average(self) -> float:
+        versions = (self.shared.version, self.private.version)
+        if self._average_idf_versions != versions:
+            n_docs = self.n_docs
+
+            def idfs(dfs):
+                return np.log(n_docs - dfs + 0.5) - np.log(dfs + 0.5)
+
+            # Shared terms at their shared df, then correct the few terms
+            # the (small) overlay adds to or introduces
+            shared_dfs = self.shared._df_array()
+            total = float(idfs(shared_dfs).sum())
+            n_terms = len(shared_dfs)
+            for term, private_df in self.private._df_items():
+                shared_df = self.shared.df(term)
+                if shared_df:
+                    total -= float(idfs(np.float64(shared_df)))
+                else:
+                    n_terms += 1
+                total += float(idfs(np.float64(shared_df + private_df)))
+            self._average_idf = total / n_terms if n_terms else 0.0
+            self._average_idf_versions = versions
+        return self._average_idf
+
+
+def tier_key(meta: dict) -> tuple:
+    """Index layer a chunk belongs to: its department's or its owner's."""
+    if meta.get("file_for_user", False):
+        return ("user", meta.get("dept_id", ""), meta.get("user_id", ""))
+    return ("dept", meta.get("dept_id", ""))
+
+
+def tier_where(key: tuple) -> dict:
+    """Store-side where clause selecting the chunks of one index layer."""
+    if key[0] == "user":
+        return private_where(key[1], key[2])
+    return shared_where(key[1])
+
+
+def build_bm25(
+    collection, where: dict, page_size: Optional[int] = None
+) -> Optional[BM25Index]:
+    """
+    Build a BM25 index over the chunks matching a store-side where clause,
+    fetched page by page. Returns an empty index when nothing matches and
+    None when the store cannot be read.
+    """
+    page_size = page_size or Config.BM25_FETCH_PAGE_SIZE
+    try:
+        ids, docs, metas = [], [], []
+        offset = 0
+        while True:
+            res = collection.get(
+                where=where,
+                include=["documents", "metadatas"],
+                limit=page_size,
+                offset=offset,
+            )
+            page_ids = res.get("ids", []) or []
+            ids.extend(page_ids)
+            docs.extend(res.get("documents", []) or [])
+            metas.extend(res.get("metadatas", []) or [])
+            if len(page_ids) < page_size:
+                break
+            offset += page_size
+
+        index = BM25Index()
+        index.add(ids, docs, metas)
+        return index
+    except Exception as exc:
+        logging.warning("Failed to build BM25 index for %s: %s", where, exc)
+        return None
+
+
+# Builds retried when ingest updates the corpus while a snapshot is read
+_MAX_BUILD_ATTEMPTS = 3
+
+
+class BM25IndexManager:
+    """
+    LRU cache of BM25 index layers: one per department for its shared
+    chunks (key ("dept", dept_id)) and one per user for their private
+    chunks (key ("user", dept_id, user_id)). get() combines a user's two
+    layers, so N users of a department cost one shared index plus N small
+    overlays instead of N copies of the shared documents.
+
+    Bounded both by entry count and by an approximate memory budget; the
+    least recently used layer is evicted first. Hit/miss/eviction counters
+    are kept for monitoring.
+
+    With index_path set, every layer is also saved under
+    <index_path>/<dept hash>/shared/ or <index_path>/<dept hash>/<user hash>/
+    and a cache miss maps the saved files before falling back to a
+    collection scan, so restarted or sibling worker processes share one
+    copy through the page cache. A cached layer is dropped when its files
+    were replaced or removed by another process. Files are written outside
+    the manager lock, one writer per layer at a time across threads and
+    processes (an flock on <layer dir>.lock): an ingest only rewrites the
+    layer's small delta file, and the full segment once a compaction
+    replaced it. An update to a layer whose files another process changed
+    since they were cached here is applied to the reloaded files, so
+    neither process's update is lost.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, index_path: str = ""):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_path = index_path
+        self._indexes = OrderedDict()
+        self._stamps = {}  # key -> manifest stamp of the files it matches
+        self._views = {}  # (dept_id, user_id) -> LayeredBM25Index
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._save_locks = {}  # key -> lock serializing writes of its files
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every in-place update; a build that overlaps one may have
+        # read a snapshot from before the update and must not be cached
+        self._generation = 0
+
+    def get(self, collection, dept_id: str, user_id: str) -> LayeredBM25Index:
+        """Return the user's view over the shared index and their overlay."""
+        shared = self._get_layer(collection, ("dept", dept_id))
+        private = self._get_layer(collection, ("user", dept_id, user_id))
+        with self._lock:
+            view = self._views.get((dept_id, user_id))
+            if view is None or view.shared is not shared or view.private is not private:
+                # Reused across queries so the merged idf floor stays cached
+                view = LayeredBM25Index(shared, private)
+                if (
+                    self._indexes.get(("dept", dept_id)) is shared
+                    and self._indexes.get(("user", dept_id, user_id)) is private
+                ):
+                    self._views[(dept_id, user_id)] = view
+            return view
+
+    def add_chunks(self, ids: list, docs: list, metas: list):
+        """
+        Apply freshly upserted chunks to the cached layers they belong to.
+        Layers that are not cached pick the chunks up on their next build.
+        """
+        layers = {}
+        for i, meta in enumerate(metas):
+            layers.setdefault(tier_key(meta or {}), []).append(i)
+
+        for key, rows in layers.items():
+            self._update(
+                key,
+                lambda index, rows=rows: index.add(
+                    [ids[i] for i in rows],
+                    [docs[i] for i in rows],
+                    [metas[i] for i in rows],
+                ),
+            )
+
+    def remove_file(self, dept_id: str, file_id: str):
+        """Remove one file's chunks from every cached layer of the department."""
+        with self._lock:
+            self._generation += 1
+            keys = [key for key in self._indexes if key[1] == dept_id]
+        updated = [
+            key for key in keys if self._update(key, lambda index: index.remove_file(file_id))
+        ]
+
+        # The file may be in any saved layer that is not cached here
+        dept_dir = self._dept_path(dept_id)
+        if self.index_path and os.path.isdir(dept_dir):
+            fresh = {os.path.basename(self._path(k)) for k in updated}
+            for name in os.listdir(dept_dir):
+                if name not in fresh and "." not in name:
+                    shutil.rmtree(os.path.join(dept_dir, name), ignore_errors=True)
+
+    def invalidate(self, dept_id: str, user_id: Optional[str] = None):
+        """Drop one user's private overlay, or every layer of the department."""
+        with self._lock:
+            keys = [
+                k
+                for k in self._indexes
+                if k[1] == dept_id
+                and (user_id is None or k == ("user", dept_id, user_id))
+            ]
+            for key in keys:
+                self._drop(key)
+            if self.index_path:
+                path = (
+                    self._dept_path(dept_id)
+                    if user_id is None
+                    else self._path(("user", dept_id, user_id))
+                )
+                shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self):
+        """Drop all cached layers (saved files are kept)."""
+        with self._lock:
+            self._indexes.clear()
+            self._stamps.clear()
+            self._views.clear()
+            self._nbytes = 0
+
+    def stats(self) -> dict:
+        """Return cache counters and current size."""
+        with self._lock:
+            return {
+                "entries": len(self._indexes),
+                "bytes": self._nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _get_layer(self, collection, key: tuple) -> BM25Index:
+        """Return one cached layer, loading or building it on a miss."""
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and self._stamps.get(key) == self._stamp(key):
+                self._indexes.move_to_end(key)
+                self.hits += 1
+                return index
+            if index is not None:
+                # Another process rewrote or invalidated the saved layer
+                self._drop(key)
+            self.misses += 1
+
+        # Load or build outside the lock so other tenants are not blocked. If
+        # chunks were added or removed meanwhile, the snapshot may miss them.
+        index = None
+        for _ in range(_MAX_BUILD_ATTEMPTS):
+            with self._lock:
+                generation = self._generation
+            stamp = self._stamp(key)
+            index = self._load(key) if stamp else None
+            if index is None:
+                index = build_bm25(collection, tier_where(key))
+                if index is not None:
+                    with self._layer_lock(key):
+                        if self._stamp(key) != stamp:
+                            # Another process saved the layer meanwhile; the
+                            # next attempt loads its files
+                            continue
+                        stamp = self._save(key, index)
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                if index is not None:
+                    self._put(key, index, stamp)
+                return index if index is not None else BM25Index()
+
+        # Ingest kept racing the build; serve this request without caching
+        return index if index is not None else BM25Index()
+
+    def _put(self, key, index: BM25Index, stamp=None):
+        # Caller holds self._lock
+        if key in self._indexes:
+            self._drop(key)
+        self._indexes[key] = index
+        self._stamps[key] = stamp
+        self._nbytes += index.nbytes
+        self._evict()
+
+    def _drop(self, key):
+        # Caller holds self._lock; forgets the layer and views built on it
+        self._nbytes -= self._indexes.pop(key).nbytes
+        self._stamps.pop(key, None)
+        if key[0] == "user":
+            self._views.pop((key[1], key[2]), None)
+        else:
+            for view_key in [v for v in self._views if v[0] == key[1]]:
+                del self._views[view_key]
+
+    def _evict(self):
+        # Evict least recently used, but always keep the newest entry
+        while len(self._indexes) > 1 and (
+            len(self._indexes) > self.max_entries or self._nbytes > self.max_bytes
+        ):
+            self._drop(next(iter(self._indexes)))
+            self.evictions += 1
+
+    def _save_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._save_locks.setdefault(key, threading.Lock())
+
+    @contextmanager
+    def _layer_lock(self, key):
+        """Hold the layer's save lock and, with index_path, its file lock."""
+        with self._save_lock(key):
+            if not self.index_path:
+                yield
+                return
+            os.makedirs(self._dept_path(key[1]), exist_ok=True)
+            with open(f"{self._path(key)}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _update(self, key, apply) -> bool:
+        """
+        Apply an in-place update to a cached layer and save it; returns
+        whether the layer is still cached with the update. Disk reads and
+        writes happen outside the manager lock so queries of other tenants
+        are not stalled behind them.
+        """
+        with self._layer_lock(key):
+            with self._lock:
+                self._generation += 1
+                index = self._indexes.get(key)
+                current = self._stamps.get(key) == self._stamp(key)
+            if index is None:
+                # Saved files of a layer not cached here are now stale
+                self._remove_saved(key)
+                return False
+            if not current:
+                # Another process updated or removed the saved layer since it
+                # was cached here; apply the update to its files instead
+                index = self._reload(key, index)
+                if index is None:
+                    return False
+
+            with self._lock:
+                self._generation += 1
+                if self._indexes.get(key) is not index:
+                    # Evicted or rebuilt meanwhile; the saved files may
+                    # predate the update, so let the next miss rebuild it
+                    if key in self._indexes:
+                        self._drop(key)
+                    index = None
+                else:
+                    self._nbytes -= index.nbytes
+                    apply(index)
+                    self._nbytes += index.nbytes
+                    self._evict()
+            if index is None:
+                self._remove_saved(key)
+                return False
+            self._persist(key, index)
+            return True
+
+    def _reload(self, key, index: BM25Index) -> Optional[BM25Index]:
+        """Replace a stale cached layer by its saved files; caller holds its layer lock."""
+        stamp = self._stamp(key)
+        fresh = self._load(key) if stamp else None
+        with self._lock:
+            if self._indexes.get(key) is index:
+                if fresh is None:
+                    # Nothing to update; the next miss rebuilds the layer
+                    self._drop(key)
+                else:
+                    self._put(key, fresh, stamp)
+        return fresh
+
+    def _persist(self, key, index: BM25Index):
+        """Save a layer updated in place; caller holds its layer lock."""
+        if not self.index_path:
+            return
+        try:
+            saved = index.save_delta(self._path(key))
+        except OSError as exc:
+            logging.warning("Failed to save BM25 index %s: %s", key, exc)
+            saved = False
+        # Without a delta write the saved segment is missing or was compacted away
+        stamp = self._stamp(key) if saved else self._save(key, index)
+        if stamp is None:
+            # Files older than the update must not be loaded
+            self._remove_saved(key)
+        with self._lock:
+            if self._indexes.get(key) is index:
+                self._stamps[key] = stamp
+
+    def _dept_path(self, dept_id: str) -> str:
+        return os.path.join(self.index_path, _path_key(dept_id))
+
+    def _path(self, key: tuple) -> str:
+        name = _path_key(key[2]) if key[0] == "user" else "shared"
+        return os.path.join(self._dept_path(key[1]), name)
+
+    def _stamp(self, key):
+        """Identity of the saved layer files, or None when there are none."""
+        if not self.index_path:
+            return None
+        stamp = []
+        for name in ("manifest.json", "delta.json"):
+            try:
+                st = os.stat(os.path.join(self._path(key), name))
+            except OSError:
+                return None
+            stamp += [st.st_ino, st.st_mtime_ns]
+        return tuple(stamp)
+
+    def _load(self, key) -> Optional[BM25Index]:
+        try:
+            return BM25Index.load(self._path(key))
+        except (OSError, ValueError, KeyError) as exc:
+            logging.warning("Ignoring saved BM25 index %s: %s", key, exc)
+            return None
+
+    def _save(self, key, index: BM25Index):
+        """Atomically replace the layer's saved files; returns their stamp."""
+        if not self.index_path:
+            return None
+        path = self._path(key)
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        old = f"{path}.old-{os.getpid()}-{threading.get_ident()}"
+        try:
+            shutil.rmtree(tmp, ignore_errors=True)
+            index.save(tmp)
+            # Readers that mapped the previous files keep valid mappings
+            if os.path.exists(path):
+                os.rename(path, old)
+            os.rename(tmp, path)
+            shutil.rmtree(old, ignore_errors=True)
+        except OSError as exc:
+            logging.warning("Failed to save BM25 index %s: %s", key, exc)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return None
+        return self._stamp(key)
+
+    def _remove_saved(self, key):
+        if self.index_path:
+            shutil.rmtree(self._path(key), ignore_errors=True)
+
+
+def _path_key(value: str) -> str:
+    """Filesystem-safe directory name for a dept or user id."""
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+# Process-wide index cache shared by retrieval and ingestion
+bm25_indexes = BM25IndexManager(
+    max_entries=Config.BM25_CACHE_MAX_ENTRIES,
+    max_bytes=int(Config.BM25_CACHE_MAX_MB * 1024 * 1024),
+    index_path=Config.BM25_INDEX_PATH,
+)
@@ -0,0 +1,142 @@
+"""
+Per-department vector collections.
+With one shared collection every query filters on dept_id, and filtered
+HNSW search slows down and loses recall as other departments grow. The
+router gives each department its own collection, created on first use,
+so a query only ever searches its own department's chunks.
+
+Chunks stored before tag filtering lack the per-tag tag_<name> keys that
+tag filters match on; the router adds them the first time a process opens
+a collection, before any query can search it.
+"""
+
+import re
+import hashlib
+import threading
+from typing import Optional
+from src.services.filters import with_tag_fields
+
+SHARED_COLLECTION = "docs"
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+
+
+def collection_name(dept_id: str, prefix: str = SHARED_COLLECTION) -> str:
+    """
+    Collection name of a department: readable, within Chroma's naming
+    rules ([a-zA-Z0-9._-], 3-63 chars) and unique through a hash suffix.
+    """
+    slug = re.sub(r"[^a-zA-Z0-9_-]+", "-", dept_id).strip("-_")[:24]
+    digest = hashlib.sha1(dept_id.encode("utf-8")).hexdigest()[:12]
+    return f"{prefix}-{slug}-{digest}" if slug else f"{prefix}-{digest}"
+
+
+class CollectionRouter:
+    """
+    Maps departments to their collections.
+
+    With per_dept set, for_dept() lazily creates (and then caches) one
+    collection per department, tagged with its dept_id in the collection
+    metadata. Without it every department shares the single "docs"
+    collection, as before the split. client is a vector store client
+    (see vector_db.create_store_client). With backfill set, collections are
+    handed out only after backfill_tags() ran on them.
+    """
+
+    def __init__(
+        self,
+        client,
+        embedding_function,
+        per_dept: bool = True,
+        prefix: str = SHARED_COLLECTION,
+        backfill: bool = False,
+    ):
+        self.client = client
+        self.embedding_function = embedding_function
+        self.per_dept = per_dept
+        self.prefix = prefix
+        self.backfill = backfill
+        self._collections = {}  # collection name -> collection
+        self._lock = threading.Lock()
+
+    def for_dept(self, dept_id: str):
+        """The collection holding dept_id's chunks."""
+        name = collection_name(dept_id, self.prefix) if self.per_dept else self.prefix
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is not None:
+                return collection
+            metadata = dict(COLLECTION_METADATA)
+            if self.per_dept:
+                metadata["dept_id"] = dept_id
+            collection = self.client.get_or_create_collection(
+                name=name,
+                metadata=metadata,
+                embedding_function=self.embedding_function,
+            )
+        if self.backfill:
+            # Outside the lock so other departments' collections still open;
+            # concurrent first opens of this one backfill it twice, harmlessly
+            backfill_tags(collection)
+        with self._lock:
+            return self._collections.setdefault(name, collection)
+
+    def for_identity(self, identity: Optional[dict]):
+        """The collection of an authenticated identity, or None without one."""
+        dept_id = (identity or {}).get("dept_id", "")
+        return self.for_dept(dept_id) if dept_id else None
+
+    def stats(self) -> dict:
+        """Stats of the open collections whose store reports them, by name."""
+        with self._lock:
+            collections = dict(self._collections)
+        return {
+            name: collection.stats()
+            for name, collection in collections.items()
+            if hasattr(collection, "stats")
+        }
+
+    def shared(self):
+        """The single pre-split collection (the migration source)."""
+        return self.client.get_or_create_collection(
+            name=self.prefix,
+            metadata=dict(COLLECTION_METADATA),
+            embedding_function=self.embedding_function,
+        )
+
+def backfill_tags(collection, page_size: int = 1000, dry_run: bool = False) -> int:
+    """
+    Add missing per-tag keys to a collection's chunks; returns how many
+    changed. Only metadata is scanned; changed chunks are rewritten in
+    place with their stored documents and embeddings.
+    """
+    updated = 0
+    offset = 0
+    while True:
+        res = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = res.get("ids") or []
+        if not len(ids):
+            break
+
+        stale = {}
+        for chunk_id, meta in zip(ids, res["metadatas"]):
+            tagged = with_tag_fields(meta or {})
+            if tagged != (meta or {}):
+                stale[chunk_id] = tagged
+        if stale and not dry_run:
+            rows = collection.get(ids=list(stale), include=["documents", "embeddings"])
+            # Same ids and stored embeddings: rows are rewritten in place
+            collection.upsert(
+                ids=rows["ids"],
+                documents=rows["documents"],
+                metadatas=[stale[chunk_id] for chunk_id in rows["ids"]],
+                embeddings=rows["embeddings"],
+            )
+        updated += len(stale)
+
+        if len(ids) < page_size:
+            break
+        offset += page_size
+    return updated
@@ -0,0 +1,103 @@
+"""
+Metadata filter helpers shared by retrieval, BM25 index building and ingestion.
+Expressed as ChromaDB where clauses so the store can apply them.
+"""
+
+
+def tag_key(tag: str) -> str:
+    """
+    Metadata key marking a chunk with one tag. Tags are stored as separate
+    boolean keys because the store cannot match inside a comma separated
+    string.
+    """
+    return f"tag_{tag.strip().lower()}"
+
+
+def tag_fields(tags: str) -> dict:
+    """Per-tag metadata keys for a comma separated tags string."""
+    return {tag_key(tag): True for tag in tags.split(",") if tag.strip()}
+
+
+def with_tag_fields(meta: dict) -> dict:
+    """meta with the per-tag keys of its tags string added."""
+    return {**meta, **tag_fields(str(meta.get("tags") or ""))}
+
+
+def tags_where(tags: list) -> dict:
+    """Where clause for chunks carrying any of the given tags."""
+    clauses = [{tag_key(tag): True} for tag in tags if tag.strip()]
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def visibility_where(dept_id: str, user_id: str) -> dict:
+    """
+    Where clause for the chunks a user may see: their department's shared
+    chunks plus their own private ones.
+    """
+    return {
+        "$and": [
+            {"dept_id": dept_id},
+            {"$or": [{"file_for_user": False}, {"user_id": user_id}]},
+        ]
+    }
+
+
+def shared_where(dept_id: str) -> dict:
+    """Where clause for a department's shared chunks."""
+    return {"$and": [{"dept_id": dept_id}, {"file_for_user": False}]}
+
+
+def private_where(dept_id: str, user_id: str) -> dict:
+    """Where clause for one user's private chunks in a department."""
+    return {
+        "$and": [
+            {"dept_id": dept_id},
+            {"file_for_user": True},
+            {"user_id": user_id},
+        ]
+    }
+
+
+def without_clauses(where: dict | None, clauses: list) -> dict | None:
+    """
+    Drop the given top-level $and members from a where clause, e.g. the
+    visibility clauses when the caller already searches a visible subset.
+    """
+    if not where:
+        return None
+    members = where["$and"] if list(where) == ["$and"] else [where]
+    rest = [clause for clause in members if clause not in clauses]
+    if len(rest) > 1:
+        return {"$and": rest}
+    return rest[0] if rest else None
+
+
+def matches_where(meta: dict, where: dict) -> bool:
+    """In-process evaluation of a ChromaDB where clause against one chunk."""
+    if "$and" in where:
+        return all(matches_where(meta, clause) for clause in where["$and"])
+    if "$or" in where:
+        return any(matches_where(meta, clause) for clause in where["$or"])
+    for field, condition in where.items():
+        op, value = (
+            next(iter(condition.items()))
+            if isinstance(condition, dict)
+            else ("$eq", condition)
+        )
+        if not _COMPARATORS[op](meta.get(field), value):
+            return False
+    return True
+
+
+# As in ChromaDB, a chunk without the field matches no comparison but $eq
+# and $in against None, so $ne and $nin exclude it too
+_COMPARATORS = {
+    "$eq": lambda a, b: a == b,
+    "$ne": lambda a, b: a is not None and a != b,
+    "$in": lambda a, b: a in b,
+    "$nin": lambda a, b: a is not None and a not in b,
+    "$gt": lambda a, b: a is not None and a > b,
+    "$gte": lambda a, b: a is not None and a >= b,
+    "$lt": lambda a, b: a is not None and a < b,
+    "$lte": lambda a, b: a is not None and a <= b,
+}
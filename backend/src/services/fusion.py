@@ -0,0 +1,135 @@
+"""
+Score fusion for hybrid retrieval.
+Min-max or z-score normalization, union of the BM25 and semantic legs by chunk id and
+weighted or reciprocal-rank fusion, on NumPy arrays instead of
+per-candidate Python loops. The confidence/coverage gate is
+src.utils.safety.coverage_ok, which takes the same arrays.
+"""
+
+import numpy as np
+
+FUSION_MODES = ("weighted", "rrf")
+
+
+def minmax(scores) -> np.ndarray:
+    """Scale scores to [0, 1]; a constant list maps to 0.5."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(scores):
+        return scores
+    mn, mx = scores.min(), scores.max()
+    if mx - mn < 1e-9:
+        return np.full(len(scores), 0.5)
+    return (scores - mn) / (mx - mn)
+
+
+def zscore(scores) -> np.ndarray:
+    """Standardize scores to zero mean and unit variance; a constant list maps to 0."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(scores):
+        return scores
+    std = scores.std()
+    if std < 1e-9:
+        return np.zeros(len(scores))
+    return (scores - scores.mean()) / std
+
+
+NORMALIZERS = {"minmax": minmax, "zscore": zscore}
+
+
+def normalize(scores, method: str = "minmax") -> np.ndarray:
+    """Normalize one leg's scores with a method of NORMALIZERS."""
+    normalizer = NORMALIZERS.get(method)
+    if normalizer is None:
+        raise ValueError(
+            f"Unknown score normalization {method!r}, expected one of {tuple(NORMALIZERS)}"
+        )
+    return normalizer(scores)
+
+
+def align(primary_ids: list, secondary_ids: list) -> tuple:
+    """
+    Union two id lists: primary ids in order, then secondary-only ids.
+
+    Returns (ids, primary_pos, secondary_pos) where *_pos[i] is the index
+    of ids[i] in that list, or -1 when it is absent.
+    """
+    index = {}
+    primary_pos, secondary_pos = [], []
+    for j, chunk_id in enumerate(primary_ids):
+        i = index.get(chunk_id)
+        if i is None:
+            index[chunk_id] = len(primary_pos)
+            primary_pos.append(j)
+            secondary_pos.append(-1)
+        else:
+            primary_pos[i] = j  # a repeated id keeps its last score
+    for j, chunk_id in enumerate(secondary_ids):
+        i = index.get(chunk_id)
+        if i is None:
+            index[chunk_id] = len(primary_pos)
+            primary_pos.append(-1)
+            secondary_pos.append(j)
+        else:
+            secondary_pos[i] = j
+    return (
+        list(index),
+        np.asarray(primary_pos, dtype=np.int64),
+        np.asarray(secondary_pos, dtype=np.int64),
+    )
+
+
+def _column(scores, pos: np.ndarray) -> np.ndarray:
+    """Scores gathered into aligned order, 0 where the id is absent."""
+    scores = np.asarray(scores, dtype=np.float64)
+    column = np.zeros(len(pos))
+    present = pos >= 0
+    column[present] = scores[pos[present]]
+    return column
+
+
+def _rank(scores) -> np.ndarray:
+    """1-based rank of each score within its list, best first."""
+    scores = np.asarray(scores, dtype=np.float64)
+    ranks = np.empty(len(scores), dtype=np.float64)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+    return ranks
+
+
+def fuse(
+    bm25_ids: list,
+    bm25_scores,
+    sem_ids: list,
+    sem_scores,
+    alpha: float = 0.5,
+    mode: str = "weighted",
+    rrf_k: int = 60,
+) -> tuple:
+    """
+    Fuse the normalized scores of the two legs, aligned by chunk id.
+
+    weighted: alpha * bm25 + (1 - alpha) * sem, a missing leg counting 0.
+    A chunk both legs found counts only its semantic score, as in the
+    dict merge {**bm25_item, **sem_item} this replaced, where the semantic
+    item's bm25 of 0 won; its bm25 is returned as 0 too.
+    rrf: sum of 1 / (rrf_k + rank) over the legs that found the chunk,
+    scaled by (rrf_k + 1) / 2 so a chunk ranked first by both scores 1.
+
+    Returns (ids, bm25, sem, fused); ids are BM25 ids in order followed by
+    semantic-only ids, and the arrays follow the same order.
+    """
+    ids, bm25_pos, sem_pos = align(bm25_ids, sem_ids)
+    bm25 = _column(bm25_scores, bm25_pos)
+    sem = _column(sem_scores, sem_pos)
+    if mode == "weighted":
+        bm25[sem_pos >= 0] = 0.0
+        fused = alpha * bm25 + (1 - alpha) * sem
+    elif mode == "rrf":
+        fused = np.zeros(len(ids))
+        for pos, scores in ((bm25_pos, bm25_scores), (sem_pos, sem_scores)):
+            present = pos >= 0
+            fused[present] += 1.0 / (rrf_k + _rank(scores)[pos[present]])
+        fused *= (rrf_k + 1) / 2
+    else:
+        raise ValueError(f"Unknown fusion mode {mode!r}, expected one of {FUSION_MODES}")
+    return ids, bm25, sem, fused
+
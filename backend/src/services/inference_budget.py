@@ -0,0 +1,176 @@
+"""
+Per-process inference thread budgeting.
+Every worker process running torch (or ONNX Runtime) with default
+threading claims all cores, so N workers embedding and reranking at once
+oversubscribe the machine N times over. The budget splits the cores
+between the workers and between the forward passes a worker may run
+concurrently, and queues passes beyond that limit.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions.sentence_transformer_embedding_function import (
+    SentenceTransformerEmbeddingFunction,
+)
+from src.config.settings import Config
+from src.utils.timings import LatencyStats
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class InferenceBudget:
+    """
+    Core budget of one worker process.
+
+    total_cores (0 = the cores this process may run on) are shared by
+    workers processes; each process runs at most max_concurrent forward
+    passes at a time, each with intra_op_threads threads. apply() pushes
+    the thread counts into torch and the OpenMP/tokenizer environment;
+    slot() is held around every forward pass and records how long callers
+    queued for it.
+    """
+
+    def __init__(self, total_cores: int = 0, workers: int = 1, max_concurrent: int = 1):
+        self.total_cores = total_cores or available_cores()
+        self.workers = max(1, workers)
+        self.max_concurrent = max(1, max_concurrent)
+        self.process_cores = max(1, self.total_cores // self.workers)
+        self.intra_op_threads = max(1, self.process_cores // self.max_concurrent)
+        self.inter_op_threads = 1
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.timings = LatencyStats()
+
+    def apply(self):
+        """Set this process's thread counts; call before loading models."""
+        threads = str(self.intra_op_threads)
+        os.environ["OMP_NUM_THREADS"] = threads
+        os.environ["MKL_NUM_THREADS"] = threads
+        # Requests already run in parallel; tokenizer threads would only
+        # compete with the forward passes
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+        try:
+            import torch
+        except ImportError:
+            return
+        torch.set_num_threads(self.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(self.inter_op_threads)
+        except RuntimeError:
+            # Only settable before torch's first parallel work
+            logging.info("torch inter-op threads already fixed, keeping them")
+
+    def onnx_session_options(self):
+        """ONNX Runtime session options with the budget's thread counts."""
+        try:
+            import onnxruntime
+        except ImportError:
+            return None
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        return options
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the process's forward-pass slots."""
+        t0 = time.perf_counter()
+        self._slots.acquire()
+        t1 = time.perf_counter()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+            self.timings.record(
+                queue_wait=(t1 - t0) * 1000, forward=(time.perf_counter() - t1) * 1000
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = self.in_flight
+        return {
+            "total_cores": self.total_cores,
+            "workers": self.workers,
+            "max_concurrent": self.max_concurrent,
+            "intra_op_threads": self.intra_op_threads,
+            "inter_op_threads": self.inter_op_threads,
+            "in_flight": in_flight,
+            "timings": self.timings.stats(),
+        }
+
+
+class BudgetedEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function whose calls run inside a budget slot.
+
+    Chroma persists the function's name and config with each collection and
+    refuses to reopen it with a function reporting another name, so the
+    wrapper reports the wrapped sentence-transformer's name and config.
+    Chroma registers functions by name, so build_from_config() wraps the
+    function it rebuilds in the process budget.
+    """
+
+    def __init__(self, inner, budget: InferenceBudget):
+        self.inner = inner
+        self.budget = budget
+
+    def __call__(self, input: Documents) -> Embeddings:
+        with self.budget.slot():
+            return self.inner(input)
+
+    @staticmethod
+    def name() -> str:
+        return SentenceTransformerEmbeddingFunction.name()
+
+    @staticmethod
+    def build_from_config(config: dict) -> "BudgetedEmbeddingFunction":
+        return BudgetedEmbeddingFunction(
+            SentenceTransformerEmbeddingFunction.build_from_config(config), inference_budget
+        )
+
+    @staticmethod
+    def validate_config(config: dict):
+        SentenceTransformerEmbeddingFunction.validate_config(config)
+
+    def get_config(self) -> dict:
+        return self.inner.get_config()
+
+    def default_space(self):
+        return self.inner.default_space()
+
+    def supported_spaces(self) -> list:
+        return self.inner.supported_spaces()
+
+
+class BudgetedModel:
+    """Model whose predict() runs inside a budget slot (e.g. a CrossEncoder)."""
+
+    def __init__(self, inner, budget: InferenceBudget):
+        self.inner = inner
+        self.budget = budget
+
+    def predict(self, *args, **kwargs):
+        with self.budget.slot():
+            return self.inner.predict(*args, **kwargs)
+
+
+# Applied by the app factory before the models are loaded
+inference_budget = InferenceBudget(
+    total_cores=Config.INFERENCE_CORES,
+    workers=Config.INFERENCE_WORKERS,
+    max_concurrent=Config.INFERENCE_MAX_CONCURRENT,
+)
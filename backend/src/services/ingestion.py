@@ -7,6 +7,9 @@ import json
 import hashlib
 from typing import Optional
 from src.services.document_processor import read_text, make_chunks
+from src.services.bm25_index import bm25_indexes
+from src.services.result_cache import retrieval_cache
+from src.services.filters import tag_fields
 
 
 def make_id(text):
@@ -86,6 +89,8 @@ def ingest_one(
                 "upload_at": info.get("upload_at", ""),
                 "uploaded_at_ts": info.get("uploaded_at_ts", 0),
                 "page": page_num,
+                # Filterable form of the tags, e.g. tag_policy: True
+                **tag_fields(info.get("tags", "")),
             }
         )
 
@@ -99,6 +104,10 @@ def ingest_one(
 
     if docs:
         collection.upsert(ids=ids, documents=docs, metadatas=metas)
+        # Keep cached BM25 indexes in step without rescanning the collection
+        bm25_indexes.add_chunks(ids, docs, metas)
+        # Cached retrieval results of the touched scopes are now stale
+        retrieval_cache.bump(metas)
 
     # Set ingested flag
     with open(file_path + ".meta.json", "w", encoding="utf-8") as info_f:
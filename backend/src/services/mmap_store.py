@@ -0,0 +1,721 @@
+"""
+Memory-mapped vector store.
+Embeddings are kept as unit-normalized float16 rows of a memory-mapped
+NumPy file, so worker processes share one copy through the page cache at
+half the size of float32. Ids, documents and metadata live in an
+append-only JSON-lines sidecar that is replayed on open and tailed for
+writes made by other processes. Search is exact (a blocked matrix
+product over the rows matching the filter) or IVF (spherical k-means
+lists, scanning only the nprobe lists nearest to the query).
+
+Optionally a quantized copy of every row (int8 scalar or packed sign
+bits) is kept next to the vectors: the first-stage scan reads the codes,
+a half or a sixteenth of the float16 bytes, and only the best
+`rescore` rows are rescored against the float16 vectors, so the
+distances handed to retrieval are the unquantized ones.
+"""
+
+import os
+import json
+import fcntl
+import random
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+from src.services.filters import matches_where
+from src.services.vector_db import GET_INCLUDE, QUERY_INCLUDE, VectorStore
+
+# Rows scored per matrix product, bounding the float32 copy of a block
+_BLOCK_ROWS = 65536
+_MIN_CAPACITY = 1024
+_MAX_CACHED_FILTERS = 256
+_KMEANS_ITERATIONS = 8
+# int8 codes clip components beyond this quantile of their magnitude
+_INT8_CLIP_QUANTILE = 0.999
+
+QUANTIZATIONS = ("none", "int8", "binary")
+# Set bits of every byte value, for Hamming distances of packed sign bits
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _code_width(kind: str, dim: int) -> int:
+    """Bytes per row of the given quantization."""
+    return dim if kind == "int8" else (dim + 7) // 8
+
+
+def _calibrate_int8(vectors: np.ndarray) -> float:
+    limit = float(np.quantile(np.abs(vectors), _INT8_CLIP_QUANTILE)) if vectors.size else 0.0
+    return 127.0 / max(limit, 1e-6)
+
+
+def _quantize(kind: str, vectors: np.ndarray, scale: float = None) -> np.ndarray:
+    """int8 codes (vectors * scale, clipped) or packed sign bits of unit rows."""
+    if kind == "int8":
+        return np.clip(np.rint(vectors * scale), -127, 127).astype(np.int8)
+    return np.packbits(vectors > 0, axis=1)
+
+
+class MmapVectorStore(VectorStore):
+    """
+    One collection stored under <path>/<name>/:
+        vectors.f16      float16 rows (capacity x dim), grown by doubling
+        log.jsonl        {"op": "put", "row", "id", "doc", "meta"} and
+                         {"op": "del", "id"} entries, in write order
+        collection.json  collection metadata, the vector dimension and
+                         the quantizations kept up to date
+        codes.int8       int8 rows (capacity x dim), when quantized
+        codes.binary     packed sign bits (capacity x dim/8), likewise
+
+    Writers serialize on a lock file: vectors (and codes) are written and
+    flushed before their log entries, so a reader never sees an entry
+    without its vector. Re-upserting an id rewrites its row; deleted rows
+    keep their slot. where clauses are evaluated as NumPy masks over
+    per-field metadata columns, built for a field the first time a filter
+    uses it and kept current on every write; results are cached per where
+    clause until the next write. Queries filter and snapshot the arrays
+    under the instance lock and score them outside it.
+
+    index="ivf" scans the nprobe nearest k-means lists instead of every
+    row once a filter leaves more than ivf_min_rows candidates; lists are
+    trained in memory on first use and retrained when the collection has
+    doubled since.
+
+    quantization="int8" or "binary" runs that scan over the codes and
+    rescores the best max(n_results, rescore) rows with the float16
+    vectors. The first instance opening a collection with a quantization
+    encodes the existing rows; from then on every writer keeps those codes
+    current, whatever its own setting. A recall_sample fraction of queries
+    is also searched exactly, and stats() reports the recall@k measured.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        embedding_function=None,
+        metadata: dict = None,
+        index: str = "flat",
+        nprobe: int = 8,
+        ivf_min_rows: int = 20000,
+        quantization: str = "none",
+        rescore: int = 20,
+        recall_sample: float = 0.0,
+    ):
+        if index not in ("flat", "ivf"):
+            raise ValueError(f"Unknown MMAP_INDEX {index!r}, expected 'flat' or 'ivf'")
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f"Unknown MMAP_QUANTIZATION {quantization!r}, expected one of {QUANTIZATIONS}"
+            )
+        self.name = name
+        self.path = os.path.join(path, name)
+        self.embedding_function = embedding_function
+        self.index = index
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.quantization = quantization
+        self.rescore = rescore
+        self.recall_sample = recall_sample
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._ids = []  # row -> chunk id
+        self._docs = []
+        self._metas = []
+        self._rows = {}  # live chunk id -> row
+        self._live = np.zeros(0, dtype=bool)
+        self._dim = None
+        self._vectors = None
+        self._log_offset = 0
+        self._version = 0
+        self._filters = {}  # where json -> (version, rows)
+        self._fields = {}  # filtered metadata field -> object array of row values
+        self._ivf = None  # {"centroids", "trained_on"}
+        self._assign = np.zeros(0, dtype=np.int32)  # row -> IVF list, -1 unassigned
+        self._codes = {}  # quantization -> memmap of its codes
+        self._kinds = []  # quantizations writers keep current
+        self._recall_hits = 0
+        self._recall_total = 0
+        self._recall_queries = 0
+
+        info = self._read_info()
+        if "metadata" not in info:
+            info["metadata"] = metadata or {}
+            self._write_info(info)
+        self.metadata = info["metadata"]
+        with self._lock:
+            self._refresh()
+            if quantization != "none":
+                self._build_codes(quantization)
+
+    # -- VectorStore -------------------------------------------------------
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        if not ids:
+            return
+        if embeddings is None:
+            embeddings = self.embedding_function(list(documents))
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+
+        with self._lock, self._write_lock():
+            self._refresh()
+            info = self._read_info()
+            self._kinds = info.get("quantized", [])
+            if self._dim is None:
+                self._dim = vectors.shape[1]
+                info["dim"] = self._dim
+                self._write_info(info)
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match {self._dim}"
+                )
+
+            rows, batch = [], {}
+            n_rows = len(self._ids)
+            for chunk_id in ids:
+                row = batch.get(chunk_id, self._rows.get(chunk_id))
+                if row is None:
+                    row = n_rows
+                    n_rows += 1
+                batch[chunk_id] = row
+                rows.append(row)
+            self._ensure_capacity(n_rows)
+            self._vectors[rows] = vectors.astype(np.float16)
+            self._vectors.flush()
+            for kind in self._kinds:
+                codes = self._map_codes(kind)
+                scale = self._int8_scale(info, vectors) if kind == "int8" else None
+                codes[rows] = _quantize(kind, vectors, scale)
+                codes.flush()
+
+            self._append_log(
+                {"op": "put", "row": row, "id": chunk_id, "doc": doc, "meta": meta}
+                for row, chunk_id, doc, meta in zip(rows, ids, documents, metadatas)
+            )
+            self._refresh()
+
+    def query(
+        self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=QUERY_INCLUDE
+    ):
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts))
+        n_queries = len(query_embeddings)
+        with self._lock:
+            self._refresh()
+            if self._dim is None or not n_results:
+                return self._query_result([[] for _ in range(n_queries)], [[] for _ in range(n_queries)], include)
+            queries = _normalize(
+                np.asarray(query_embeddings, dtype=np.float32).reshape(n_queries, self._dim)
+            )
+            candidates = self._filter_rows(where)
+            use_ivf = self.index == "ivf" and len(candidates) > self.ivf_min_rows
+            view = self._snapshot(use_ivf)
+
+        # Scored outside the lock, so concurrent queries (and writers) overlap
+        approximate = use_ivf or self.quantization != "none"
+        if use_ivf:
+            hits = [self._ivf_search(view, candidates, q, n_results) for q in queries]
+        else:
+            hits = list(zip(*self._search(view, candidates, queries, n_results)))
+        if approximate and self.recall_sample and random.random() < self.recall_sample:
+            self._measure_recall(view, candidates, queries, [r for r, _ in hits], n_results)
+        rows = [list(r) for r, _ in hits]
+        distances = [(1.0 - s).tolist() for _, s in hits]
+        with self._lock:
+            return self._query_result(rows, distances, include)
+
+    def get(self, ids=None, where=None, include=GET_INCLUDE, limit=None, offset=None):
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                rows = [self._rows[i] for i in ids if i in self._rows]
+                if where:
+                    rows = [r for r in rows if matches_where(self._metas[r] or {}, where)]
+            else:
+                rows = self._filter_rows(where).tolist()
+            start = offset or 0
+            rows = rows[start : start + limit if limit else None]
+            return self._columns(rows, include)
+
+    def delete(self, ids=None, where=None):
+        with self._lock, self._write_lock():
+            if ids is None and where is None:
+                return
+            targets = self.get(ids=ids, where=where, include=())["ids"]
+            self._append_log({"op": "del", "id": chunk_id} for chunk_id in targets)
+            self._refresh()
+
+    def count(self):
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def nbytes(self) -> int:
+        """Bytes of the live float16 vectors."""
+        with self._lock:
+            return len(self._rows) * (self._dim or 0) * 2
+
+    def stats(self) -> dict:
+        """
+        Sizes of the live rows and the recall@k sampled against exact
+        search. stored_bytes is the vectors plus any codes and memory_saved
+        its saving over float32; scanned_bytes is what a full first-stage
+        scan reads (the codes when quantized) and scan_saved its saving.
+        """
+        with self._lock:
+            rows, dim = len(self._rows), self._dim or 0
+            float32_bytes = rows * dim * 4
+            vectors_bytes = rows * dim * 2
+            codes_bytes = (
+                rows * _code_width(self.quantization, dim) if self.quantization != "none" else 0
+            )
+            stored = vectors_bytes + codes_bytes
+            scanned = codes_bytes or vectors_bytes
+            return {
+                "rows": rows,
+                "index": self.index,
+                "quantization": self.quantization,
+                "float32_bytes": float32_bytes,
+                "vectors_bytes": vectors_bytes,
+                "codes_bytes": codes_bytes,
+                "stored_bytes": stored,
+                "scanned_bytes": scanned,
+                "memory_saved": round(1 - stored / float32_bytes, 4) if float32_bytes else 0.0,
+                "scan_saved": round(1 - scanned / float32_bytes, 4) if float32_bytes else 0.0,
+                "recall_queries": self._recall_queries,
+                "recall_at_k": (
+                    round(self._recall_hits / self._recall_total, 4) if self._recall_total else None
+                ),
+            }
+
+    # -- search -------------------------------------------------------------
+
+    def _snapshot(self, ivf: bool) -> dict:
+        """
+        The arrays a search reads, taken under the lock. Writers only append
+        rows or rewrite them in place, and grow by swapping in new arrays, so
+        the snapshot stays valid for the rows filtered before it was taken.
+        """
+        view = {"vectors": self._vectors, "codes": self._codes.get(self.quantization)}
+        if ivf:
+            view["centroids"] = self._ivf_index()["centroids"]
+            view["assign"] = self._assign
+        return view
+
+    def _search(self, view: dict, rows: np.ndarray, queries: np.ndarray, n: int):
+        """
+        Top n (rows, scores) per query over the given rows, best first.
+        Quantized stores pick max(n, rescore) rows by their codes and
+        rescore those with the float16 vectors.
+        """
+        if self.quantization == "none":
+            return self._exact_search(view, rows, queries, n)
+        codes = view["codes"]
+        if self.quantization == "int8":
+            # One global scale, so the unscaled product ranks the same
+            def score(block):
+                return queries @ codes[block].astype(np.float32).T
+        else:
+            bits = np.packbits(queries > 0, axis=1)
+
+            def score(block):
+                distance = _POPCOUNT[bits[:, None, :] ^ codes[block][None, :, :]]
+                return -distance.sum(axis=2, dtype=np.float32)
+
+        shortlist, scores = self._top_n(rows, len(queries), max(n, self.rescore), score)
+        if shortlist.shape[1] == 0:
+            # No row matched the filter
+            return shortlist, scores
+        vectors = view["vectors"][shortlist.ravel()].astype(np.float32)
+        scores = np.einsum("qmd,qd->qm", vectors.reshape(*shortlist.shape, -1), queries)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :n]
+        return np.take_along_axis(shortlist, order, axis=1), np.take_along_axis(
+            scores, order, axis=1
+        )
+
+    def _exact_search(self, view: dict, rows: np.ndarray, queries: np.ndarray, n: int):
+        """Top n (rows, scores) per query by the float16 vectors."""
+        vectors = view["vectors"]
+        return self._top_n(
+            rows, len(queries), n, lambda block: queries @ vectors[block].astype(np.float32).T
+        )
+
+    def _measure_recall(
+        self, view: dict, candidates: np.ndarray, queries: np.ndarray, found: list, n: int
+    ):
+        exact, _ = self._exact_search(view, candidates, queries, n)
+        hits = sum(len(np.intersect1d(expected, rows)) for expected, rows in zip(exact, found))
+        with self._lock:
+            self._recall_hits += hits
+            self._recall_total += sum(len(expected) for expected in exact)
+            self._recall_queries += len(queries)
+
+    def _top_n(self, rows: np.ndarray, n_queries: int, n: int, score):
+        """Top n (rows, scores) per query by score(block of rows), best first."""
+        best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+        best_scores = np.zeros((n_queries, 0), dtype=np.float32)
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            block = rows[start : start + _BLOCK_ROWS]
+            scores = score(block)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate(
+                [best_rows, np.broadcast_to(block, (n_queries, len(block)))], axis=1
+            )
+            if best_scores.shape[1] > n:
+                keep = np.argpartition(-best_scores, n - 1, axis=1)[:, :n]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(
+            best_scores, order, axis=1
+        )
+
+    def _ivf_search(self, view: dict, candidates: np.ndarray, query: np.ndarray, n: int):
+        centroids = view["centroids"]
+        nprobe = min(self.nprobe, len(centroids))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        rows = candidates[np.isin(view["assign"][candidates], probe)]
+        if len(rows) < n:
+            # The probed lists hold too few matching rows; scan them all
+            rows = candidates
+        found_rows, scores = self._search(view, rows, query[None, :], n)
+        return found_rows[0], scores[0]
+
+    def _ivf_index(self) -> dict:
+        n_live = len(self._rows)
+        if self._ivf is None or n_live >= 2 * self._ivf["trained_on"]:
+            self._train_ivf()
+        unassigned = np.flatnonzero(self._assign[: len(self._ids)] < 0)
+        if len(unassigned):
+            self._assign_rows(unassigned)
+        return self._ivf
+
+    def _train_ivf(self):
+        live = np.flatnonzero(self._live[: len(self._ids)])
+        n_lists = min(len(live), int(np.clip(np.sqrt(len(live)), 16, 4096)))
+        rng = np.random.default_rng(0)
+        sample = rng.choice(live, size=min(len(live), 64 * n_lists, 100000), replace=False)
+        vectors = self._vectors[np.sort(sample)].astype(np.float32)
+        centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)]
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self._ivf = {"centroids": centroids, "trained_on": len(live)}
+        self._assign = np.full(len(self._live), -1, dtype=np.int32)
+        logging.info("Trained %d IVF lists for %s on %d rows", n_lists, self.name, len(sample))
+
+    def _assign_rows(self, rows: np.ndarray):
+        centroids = self._ivf["centroids"]
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            block = rows[start : start + _BLOCK_ROWS]
+            vectors = self._vectors[block].astype(np.float32)
+            self._assign[block] = np.argmax(vectors @ centroids.T, axis=1)
+
+    def _filter_rows(self, where) -> np.ndarray:
+        """Live rows matching where, cached until the next write."""
+        key = json.dumps(where, sort_keys=True) if where else ""
+        cached = self._filters.get(key)
+        if cached is not None and cached[0] == self._version:
+            return cached[1]
+        live = self._live[: len(self._ids)]
+        if where:
+            live = live & self._where_mask(where, len(self._ids))
+        rows = np.flatnonzero(live)
+        if len(self._filters) >= _MAX_CACHED_FILTERS:
+            self._filters.clear()
+        self._filters[key] = (self._version, rows)
+        return rows
+
+    def _where_mask(self, where: dict, n_rows: int) -> np.ndarray:
+        """Evaluate a where clause to a boolean mask over the first n_rows rows."""
+        if "$and" in where:
+            mask = np.ones(n_rows, dtype=bool)
+            for clause in where["$and"]:
+                mask &= self._where_mask(clause, n_rows)
+            return mask
+        if "$or" in where:
+            mask = np.zeros(n_rows, dtype=bool)
+            for clause in where["$or"]:
+                mask |= self._where_mask(clause, n_rows)
+            return mask
+        if len(where) > 1:
+            return self._where_mask({"$and": [{k: v} for k, v in where.items()]}, n_rows)
+
+        field, condition = next(iter(where.items()))
+        op, value = (
+            next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+        )
+        column = self._field_column(field)[:n_rows]
+        if op in ("$eq", "$ne", "$in", "$nin"):
+            mask = np.zeros(n_rows, dtype=bool)
+            for v in value if op in ("$in", "$nin") else [value]:
+                mask |= np.asarray(column == v, dtype=bool)
+            if op in ("$ne", "$nin"):
+                # Rows without the field match neither (see matches_where)
+                return ~mask & np.asarray(np.not_equal(column, None), dtype=bool)
+            return mask
+        # Range comparisons: check each row's value
+        return np.fromiter(
+            (matches_where({field: v}, where) for v in column), dtype=bool, count=n_rows
+        )
+
+    def _field_column(self, field: str) -> np.ndarray:
+        """Per-row values of a metadata field (None where unset)."""
+        column = self._fields.get(field)
+        if column is None:
+            column = np.full(len(self._live), None, dtype=object)
+            for row, meta in enumerate(self._metas):
+                if meta:
+                    column[row] = meta.get(field)
+            self._fields[field] = column
+        return column
+
+    # -- results ------------------------------------------------------------
+
+    def _columns(self, rows: list, include) -> dict:
+        result = {"ids": [self._ids[r] for r in rows]}
+        if "documents" in include:
+            result["documents"] = [self._docs[r] for r in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metas[r] for r in rows]
+        if "embeddings" in include:
+            result["embeddings"] = [
+                self._vectors[r].astype(np.float32) for r in rows
+            ]
+        return result
+
+    def _query_result(self, rows: list, distances: list, include) -> dict:
+        columns = [self._columns(query_rows, include) for query_rows in rows]
+        result = {"ids": [c["ids"] for c in columns]}
+        for field in ("documents", "metadatas", "embeddings"):
+            if field in include:
+                result[field] = [c[field] for c in columns]
+        if "distances" in include:
+            result["distances"] = distances
+        return result
+
+    # -- files --------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _read_info(self) -> dict:
+        try:
+            with open(self._file("collection.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_info(self, info: dict):
+        tmp = self._file("collection.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        os.replace(tmp, self._file("collection.json"))
+
+    @contextmanager
+    def _write_lock(self):
+        with open(self._file("write.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _append_log(self, entries):
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        if not lines:
+            return
+        with open(self._file("log.jsonl"), "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _ensure_capacity(self, n_rows: int):
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if n_rows <= capacity:
+            return
+        capacity = max(_MIN_CAPACITY, 2 * capacity, n_rows)
+        path = self._file("vectors.f16")
+        with open(path, "ab"):
+            pass
+        os.truncate(path, capacity * self._dim * 2)
+        for kind in self._kinds:
+            self._size_codes(kind, capacity)
+        self._map_vectors()
+
+    def _map_vectors(self):
+        path = self._file("vectors.f16")
+        if self._dim is None or not os.path.exists(path):
+            return
+        capacity = os.path.getsize(path) // (self._dim * 2)
+        if capacity and (self._vectors is None or self._vectors.shape[0] != capacity):
+            self._vectors = np.memmap(path, dtype=np.float16, mode="r+", shape=(capacity, self._dim))
+        if self.quantization != "none":
+            self._map_codes(self.quantization)
+
+    def _size_codes(self, kind: str, capacity: int):
+        path = self._file(f"codes.{kind}")
+        with open(path, "ab"):
+            pass
+        os.truncate(path, capacity * _code_width(kind, self._dim))
+
+    def _map_codes(self, kind: str):
+        path = self._file(f"codes.{kind}")
+        width = _code_width(kind, self._dim)
+        capacity = os.path.getsize(path) // width if os.path.exists(path) else 0
+        codes = self._codes.get(kind)
+        if capacity and (codes is None or codes.shape[0] != capacity):
+            dtype = np.int8 if kind == "int8" else np.uint8
+            codes = np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width))
+            self._codes[kind] = codes
+        return codes
+
+    def _int8_scale(self, info: dict, vectors: np.ndarray) -> float:
+        """The collection's int8 scale, calibrated on vectors when first needed."""
+        if "int8_scale" not in info:
+            info["int8_scale"] = _calibrate_int8(vectors)
+            self._write_info(info)
+        return info["int8_scale"]
+
+    def _build_codes(self, kind: str):
+        """Encode the rows written so far and have every writer keep kind current."""
+        with self._write_lock():
+            self._refresh()
+            info = self._read_info()
+            kinds = info.get("quantized", [])
+            n_rows = len(self._ids)
+            if kind not in kinds:
+                if n_rows:
+                    self._size_codes(kind, self._vectors.shape[0])
+                    codes = self._map_codes(kind)
+                    scale = None
+                    if kind == "int8":
+                        sample = np.random.default_rng(0).choice(
+                            n_rows, size=min(n_rows, 100000), replace=False
+                        )
+                        scale = self._int8_scale(info, self._vectors[np.sort(sample)].astype(np.float32))
+                    for start in range(0, n_rows, _BLOCK_ROWS):
+                        end = min(start + _BLOCK_ROWS, n_rows)
+                        vectors = self._vectors[start:end].astype(np.float32)
+                        codes[start:end] = _quantize(kind, vectors, scale)
+                    codes.flush()
+                    logging.info("Encoded %d rows of %s as %s codes", n_rows, self.name, kind)
+                kinds.append(kind)
+                info["quantized"] = kinds
+                self._write_info(info)
+            self._kinds = kinds
+
+    def _refresh(self):
+        """Apply log entries written since the last refresh, by any process."""
+        path = self._file("log.jsonl")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size == self._log_offset:
+            return
+        with open(path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read(size - self._log_offset)
+        # A line still being appended is picked up next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        self._log_offset += end
+
+        if self._dim is None:
+            self._dim = self._read_info().get("dim")
+        self._map_vectors()
+        self._version += 1
+
+    def _apply(self, entry: dict):
+        if entry["op"] == "del":
+            row = self._rows.pop(entry["id"], None)
+            if row is not None:
+                self._live[row] = False
+            return
+
+        row = entry["row"]
+        if row >= len(self._ids):
+            grow = row + 1 - len(self._ids)
+            self._ids.extend([None] * grow)
+            self._docs.extend([None] * grow)
+            self._metas.extend([None] * grow)
+            if len(self._live) < row + 1:
+                size = max(_MIN_CAPACITY, 2 * len(self._live), row + 1)
+                self._live = np.concatenate([self._live, np.zeros(size - len(self._live), dtype=bool)])
+                self._assign = np.concatenate(
+                    [self._assign, np.full(size - len(self._assign), -1, dtype=np.int32)]
+                )
+                for field, column in self._fields.items():
+                    self._fields[field] = np.concatenate(
+                        [column, np.full(size - len(column), None, dtype=object)]
+                    )
+        previous = self._rows.get(entry["id"])
+        if previous is not None and previous != row:
+            self._live[previous] = False
+        self._ids[row] = entry["id"]
+        self._docs[row] = entry["doc"]
+        self._metas[row] = entry["meta"]
+        for field, column in self._fields.items():
+            column[row] = (entry["meta"] or {}).get(field)
+        self._rows[entry["id"]] = row
+        self._live[row] = True
+        # Rewritten vectors may belong to another list now
+        self._assign[row] = -1
+
+
+class MmapStoreClient:
+    """Opens MmapVectorStore collections under one directory."""
+
+    def __init__(
+        self,
+        path: str,
+        index: str = "flat",
+        nprobe: int = 8,
+        ivf_min_rows: int = 20000,
+        quantization: str = "none",
+        rescore: int = 20,
+        recall_sample: float = 0.0,
+    ):
+        self.path = path
+        self.index = index
+        self.nprobe = nprobe
+        self.ivf_min_rows = ivf_min_rows
+        self.quantization = quantization
+        self.rescore = rescore
+        self.recall_sample = recall_sample
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str, metadata=None, embedding_function=None):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = MmapVectorStore(
+                    self.path,
+                    name,
+                    embedding_function=embedding_function,
+                    metadata=metadata,
+                    index=self.index,
+                    nprobe=self.nprobe,
+                    ivf_min_rows=self.ivf_min_rows,
+                    quantization=self.quantization,
+                    rescore=self.rescore,
+                    recall_sample=self.recall_sample,
+                )
+                self._collections[name] = collection
+            return collection
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
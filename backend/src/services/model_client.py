@@ -0,0 +1,130 @@
+"""
+Client side of the shared model server (see model_server).
+RemoteEmbeddingFunction plugs into Chroma and the query embedding cache,
+RemoteReranker into retrieve() through get_reranker().
+"""
+
+import socket
+import threading
+import numpy as np
+from chromadb.api.types import Documents, Embeddings
+from chromadb.utils.embedding_functions.sentence_transformer_embedding_function import (
+    SentenceTransformerEmbeddingFunction,
+)
+from src.config.settings import Config
+from src.services.model_server import (
+    OP_EMBED,
+    OP_PING,
+    OP_RERANK,
+    STATUS_OK,
+    pack_strings,
+    recv_frame,
+    send_frame,
+    unpack_matrix,
+)
+
+
+class ModelClient:
+    """
+    Talks to the model server over its Unix socket.
+
+    Each thread keeps its own connection, so concurrent requests of a
+    worker reach the server in parallel and are batched there. A broken
+    connection is reopened and the (idempotent) request retried once.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def embed(self, texts: list) -> np.ndarray:
+        """Embeddings of texts, one row per text."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._call(OP_EMBED, pack_strings(list(texts)))
+
+    def rerank(self, pairs: list) -> np.ndarray:
+        """Cross-encoder scores of (query, chunk) pairs, in order."""
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        texts = [text for pair in pairs for text in pair]
+        return self._call(OP_RERANK, pack_strings(texts)).reshape(-1)
+
+    def ping(self) -> bool:
+        try:
+            self._call(OP_PING, b"")
+        except OSError:
+            return False
+        return True
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _call(self, op: int, payload: bytes) -> np.ndarray:
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_frame(sock, op, payload)
+                status, body = recv_frame(sock)
+                break
+            except OSError:
+                self.close()
+                if attempt:
+                    raise
+        if status != STATUS_OK:
+            raise RuntimeError(f"Model server error: {body.decode('utf-8')}")
+        return unpack_matrix(body)
+
+
+class RemoteEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """
+    Chroma embedding function served by the model server.
+
+    Chroma persists the function's name and config with each collection and
+    refuses to reopen it with a function reporting another name, so this
+    reports the server's sentence-transformer function: config is its
+    config (see models.embedding_config), and no model is loaded here.
+    """
+
+    def __init__(self, client: ModelClient, config: dict):
+        self.client = client
+        self.model_name = config["model_name"]
+        self.device = config["device"]
+        self.normalize_embeddings = config["normalize_embeddings"]
+        self.kwargs = config.get("kwargs", {})
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return list(self.client.embed(list(input)))
+
+    @staticmethod
+    def build_from_config(config: dict) -> "RemoteEmbeddingFunction":
+        return RemoteEmbeddingFunction(
+            ModelClient(Config.MODEL_SERVER_SOCKET, Config.MODEL_SERVER_TIMEOUT_S), config
+        )
+
+
+class RemoteReranker:
+    """Reranker with the CrossEncoder predict() interface, served remotely."""
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+
+    def predict(self, pairs: list, batch_size: int = 32) -> np.ndarray:
+        return self.client.rerank(pairs)
@@ -0,0 +1,232 @@
+"""
+Shared model server for multi-worker deployments.
+One process hosts the embedder and the reranker; Flask workers reach it
+through a Unix socket (see model_client) instead of each loading its own
+copy of the weights and its own inference thread pool. Requests from all
+workers are micro-batched into shared forward passes.
+
+Run it with `python -m src.services.model_server` and point the workers at
+it with MODEL_SERVER_SOCKET.
+
+Wire format (little-endian), one request and one response per frame:
+    frame   = op or status (uint8), payload length (uint32), payload
+    strings = count (uint32), count byte lengths (uint32), utf-8 bytes
+    matrix  = rows (uint32), cols (uint32), rows * cols float32
+OP_EMBED sends strings and gets a rows x dim matrix; OP_RERANK sends
+2 * n strings (query, chunk interleaved) and gets an n x 1 matrix; OP_PING
+gets an empty matrix. Errors come back as STATUS_ERROR with a utf-8
+message.
+"""
+
+import os
+import struct
+import logging
+import threading
+import socketserver
+from typing import Callable
+import numpy as np
+from src.config.settings import Config
+from src.services.inference_budget import InferenceBudget
+from src.services.rerank_batcher import RerankBatcher
+
+OP_PING = 0
+OP_EMBED = 1
+OP_RERANK = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+_HEADER = struct.Struct("<BI")
+_COUNT = struct.Struct("<I")
+_SHAPE = struct.Struct("<II")
+
+
+def pack_strings(texts: list) -> bytes:
+    encoded = [text.encode("utf-8") for text in texts]
+    lengths = struct.pack(f"<{len(encoded)}I", *(len(b) for b in encoded))
+    return _COUNT.pack(len(encoded)) + lengths + b"".join(encoded)
+
+
+def unpack_strings(payload: bytes) -> list:
+    (count,) = _COUNT.unpack_from(payload)
+    lengths = struct.unpack_from(f"<{count}I", payload, _COUNT.size)
+    texts = []
+    offset = _COUNT.size + 4 * count
+    for length in lengths:
+        texts.append(payload[offset : offset + length].decode("utf-8"))
+        offset += length
+    return texts
+
+
+def pack_matrix(matrix) -> bytes:
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(-1, 1)
+    return _SHAPE.pack(*matrix.shape) + matrix.tobytes()
+
+
+def unpack_matrix(payload: bytes) -> np.ndarray:
+    rows, cols = _SHAPE.unpack_from(payload)
+    return np.frombuffer(payload, dtype="<f4", count=rows * cols, offset=_SHAPE.size).reshape(
+        rows, cols
+    )
+
+
+def send_frame(sock, code: int, payload: bytes = b""):
+    sock.sendall(_HEADER.pack(code, len(payload)) + payload)
+
+
+def recv_frame(sock) -> tuple:
+    """Return (op or status, payload); raises ConnectionError on EOF."""
+    code, length = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return code, _recv_exact(sock, length)
+
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    received = 0
+    while received < n:
+        got = sock.recv_into(view[received:])
+        if not got:
+            raise ConnectionError("Model server connection closed")
+        received += got
+    return bytes(buf)
+
+
+class _Encoder:
+    """Embedding function behind the RerankBatcher predict() interface."""
+
+    def __init__(self, embed_fn: Callable):
+        self.embed_fn = embed_fn
+
+    def predict(self, texts: list, batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.embed_fn(texts), dtype=np.float32)
+
+
+class ModelServer:
+    """
+    Hosts the embedder and reranker for every worker on the machine.
+
+    load_embedder returns a Chroma-style list[str] -> vectors function and
+    load_reranker a model with predict(pairs, batch_size); both are loaded
+    once at start(). Each connection is served by its own thread and
+    hands its texts or pairs to a batcher, which merges concurrent requests
+    into one forward pass of up to max_batch items. threads (0 = library
+    default) is the server's core budget, split between the embed and
+    rerank passes (see InferenceBudget).
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        load_embedder: Callable,
+        load_reranker: Callable = None,
+        threads: int = 0,
+        max_batch: int = 64,
+        window_ms: float = 2.0,
+    ):
+        self.socket_path = socket_path
+        self.load_embedder = load_embedder
+        self.load_reranker = load_reranker
+        self.threads = threads
+        self._encoder = None
+        self._reranker = None
+        self.embed_batcher = RerankBatcher(
+            lambda: self._encoder, max_batch=max_batch, window_ms=window_ms, length=len
+        )
+        self.rerank_batcher = RerankBatcher(
+            lambda: self._reranker, max_batch=max_batch, window_ms=window_ms
+        )
+        self._server = None
+
+    def start(self):
+        """Load the models and listen on the socket; returns immediately."""
+        if self.threads > 0:
+            # One embed and one rerank pass can run at a time
+            InferenceBudget(total_cores=self.threads, max_concurrent=2).apply()
+        self._encoder = _Encoder(self.load_embedder())
+        if self.load_reranker is not None:
+            self._reranker = self.load_reranker()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socketserver.ThreadingUnixStreamServer(self.socket_path, _Handler)
+        server.daemon_threads = True
+        server.model_server = self
+        self._server = server
+        threading.Thread(
+            target=server.serve_forever, name="model-server", daemon=True
+        ).start()
+        logging.info("Model server listening on %s", self.socket_path)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def handle(self, op: int, payload: bytes) -> bytes:
+        """Run one request and return its matrix payload."""
+        if op == OP_PING:
+            return pack_matrix(np.zeros((0, 0), dtype=np.float32))
+        texts = unpack_strings(payload)
+        if not texts:
+            return pack_matrix(np.zeros((0, 0), dtype=np.float32))
+        if op == OP_EMBED:
+            return pack_matrix(self.embed_batcher.predict(texts).reshape(len(texts), -1))
+        if op == OP_RERANK:
+            if self._reranker is None:
+                raise RuntimeError("Reranker is not loaded")
+            pairs = list(zip(texts[0::2], texts[1::2]))
+            return pack_matrix(self.rerank_batcher.predict(pairs))
+        raise ValueError(f"Unknown op {op}")
+
+    def stats(self) -> dict:
+        return {
+            "embed": self.embed_batcher.stats(),
+            "rerank": self.rerank_batcher.stats(),
+        }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        model_server = self.server.model_server
+        while True:
+            try:
+                op, payload = recv_frame(self.request)
+            except ConnectionError:
+                return
+            try:
+                response = model_server.handle(op, payload)
+            except Exception as exc:
+                send_frame(self.request, STATUS_ERROR, f"{type(exc).__name__}: {exc}".encode("utf-8"))
+                continue
+            send_frame(self.request, STATUS_OK, response)
+
+
+def serve():
+    """Run the model server configured by MODEL_SERVER_* until interrupted."""
+    from src.services.models import embedding_function, load_reranker
+
+    logging.basicConfig(level=logging.INFO)
+    server = ModelServer(
+        Config.MODEL_SERVER_SOCKET or "/tmp/rag-models.sock",
+        lambda: embedding_function(Config.EMBED_MODEL_NAME, Config.INFERENCE_BACKEND),
+        lambda: load_reranker(Config.RERANKER_MODEL_NAME, Config.INFERENCE_BACKEND),
+        threads=Config.MODEL_SERVER_THREADS,
+        max_batch=Config.MODEL_SERVER_MAX_BATCH,
+        window_ms=Config.MODEL_SERVER_BATCH_WINDOW_MS,
+    )
+    server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,95 @@
+"""
+Model loading for the embedder and reranker.
+INFERENCE_BACKEND selects full-precision PyTorch ("torch"), ONNX Runtime
+("onnx") or ONNX Runtime with a dynamically int8-quantized export
+("onnx-int8"). Quantized exports are written once under ONNX_MODEL_DIR.
+ONNX Runtime sessions get the thread counts of the inference budget;
+those session options are passed when the model is loaded only, and stay
+out of the kwargs Chroma persists as JSON with each collection.
+"""
+
+import os
+import logging
+from chromadb.utils.embedding_functions import sentence_transformer_embedding_function
+from src.config.settings import Config
+from src.services.inference_budget import inference_budget
+
+INFERENCE_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def model_source(model_name: str, backend: str, model_cls=None) -> tuple:
+    """
+    Return (name_or_path, kwargs) to load model_name with the backend.
+
+    model_cls (SentenceTransformer or CrossEncoder) is only used to export
+    the int8 model the first time it is needed; without it nothing is
+    exported, e.g. when describing a model another process loads.
+    """
+    if backend == "torch":
+        return model_name, {}
+    if backend == "onnx":
+        return model_name, {"backend": "onnx"}
+    if backend != "onnx-int8":
+        raise ValueError(
+            f"Unknown INFERENCE_BACKEND {backend!r}, expected one of {INFERENCE_BACKENDS}"
+        )
+
+    local_dir = os.path.join(Config.ONNX_MODEL_DIR, model_name.replace("/", "--"))
+    file_name = f"onnx/model_qint8_{Config.ONNX_QUANTIZATION}.onnx"
+    if model_cls is not None and not os.path.exists(os.path.join(local_dir, file_name)):
+        _export_int8(model_name, model_cls, local_dir)
+    return local_dir, {"backend": "onnx", "model_kwargs": {"file_name": file_name}}
+
+
+def _load_kwargs(kwargs: dict) -> dict:
+    """kwargs plus the budget's ONNX Runtime session options."""
+    if kwargs.get("backend") != "onnx":
+        return kwargs
+    options = inference_budget.onnx_session_options()
+    if options is None:
+        return kwargs
+    model_kwargs = {**kwargs.get("model_kwargs", {}), "session_options": options}
+    return {**kwargs, "model_kwargs": model_kwargs}
+
+
+def _export_int8(model_name: str, model_cls, local_dir: str):
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    logging.info("Exporting int8 ONNX model for %s to %s", model_name, local_dir)
+    model = model_cls(model_name, backend="onnx")
+    model.save(local_dir)
+    export_dynamic_quantized_onnx_model(model, Config.ONNX_QUANTIZATION, local_dir)
+
+
+def embedding_function(model_name: str, backend: str):
+    """Chroma embedding function running the embedder on the backend."""
+    from sentence_transformers import SentenceTransformer
+
+    name_or_path, kwargs = model_source(model_name, backend, SentenceTransformer)
+    ef_cls = sentence_transformer_embedding_function.SentenceTransformerEmbeddingFunction
+    # The function reuses the model cached under its name, so it can be
+    # loaded with the session options while the function keeps only the
+    # serializable kwargs in its config
+    ef_cls.models[name_or_path] = SentenceTransformer(
+        name_or_path, device="cpu", **_load_kwargs(kwargs)
+    )
+    return ef_cls(model_name=name_or_path, **kwargs)
+
+
+def embedding_config(model_name: str, backend: str) -> dict:
+    """Chroma config of embedding_function(model_name, backend), without loading it."""
+    name_or_path, kwargs = model_source(model_name, backend)
+    return {
+        "model_name": name_or_path,
+        "device": "cpu",
+        "normalize_embeddings": False,
+        "kwargs": kwargs,
+    }
+
+
+def load_reranker(model_name: str, backend: str):
+    """Cross-encoder reranker running on the backend."""
+    from sentence_transformers import CrossEncoder
+
+    name_or_path, kwargs = model_source(model_name, backend, CrossEncoder)
+    return CrossEncoder(name_or_path, **_load_kwargs(kwargs))
@@ -0,0 +1,98 @@
+"""
+Query embedding cache.
+Retries, regenerated answers and eval replays ask the same question again;
+the query is embedded once per (normalized text, model) and the vector is
+shared by every consumer in the request instead of letting Chroma re-embed
+query_texts on each call.
+"""
+
+import time
+import threading
+from typing import Callable, Optional
+import numpy as np
+from src.config.settings import Config
+from src.services.rerank_cache import normalize_query
+from src.utils.cache import TTLCache
+
+
+class QueryEmbeddingCache:
+    """
+    LRU cache of query vectors keyed by (normalized query, model name).
+
+    bind() sets the embedding function used on a miss (the collection's,
+    so query and chunk vectors come from the same model). Cached vectors
+    are read-only float32 arrays shared between callers.
+    """
+
+    def __init__(self, max_entries: int, ttl: float = 0):
+        self._cache = TTLCache(max_entries, ttl)
+        self._lock = threading.Lock()
+        self._embed_fn = None
+        self._model_name = ""
+        self.embedded = 0
+        self.embed_s = 0.0
+
+    def bind(self, embed_fn: Callable, model_name: str):
+        """Embed misses with embed_fn, a Chroma-style list[str] -> vectors."""
+        with self._lock:
+            self._embed_fn = embed_fn
+            self._model_name = model_name
+
+    @property
+    def bound(self) -> bool:
+        return self._embed_fn is not None
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        """Embedding of query, or None when no embedding function is bound."""
+        vectors = self.embed_many([query])
+        return None if vectors is None else vectors[0]
+
+    def embed_many(self, queries: list) -> Optional[list]:
+        """
+        Embeddings of queries, in order, with every miss embedded in one
+        batch; None when no embedding function is bound.
+        """
+        embed_fn, model_name = self._embed_fn, self._model_name
+        if embed_fn is None:
+            return None
+        keys = [(normalize_query(query), model_name) for query in queries]
+        vectors = self._cache.get_many(keys)
+        missing = {}  # key -> first query text with it
+        for key, query, vector in zip(keys, queries, vectors):
+            if vector is None:
+                missing.setdefault(key, query)
+        if not missing:
+            return vectors
+
+        t0 = time.perf_counter()
+        embedded = embed_fn(list(missing.values()))
+        elapsed = time.perf_counter() - t0
+        fresh = {}
+        for key, vector in zip(missing, embedded):
+            vector = np.asarray(vector, dtype=np.float32)
+            vector.setflags(write=False)
+            fresh[key] = vector
+        self._cache.put_many(fresh.items())
+        with self._lock:
+            self.embedded += len(fresh)
+            self.embed_s += elapsed
+        return [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the mean embedding latency."""
+        stats = self._cache.stats()
+        with self._lock:
+            stats["embedded"] = self.embedded
+            stats["avg_embed_ms"] = (
+                round(self.embed_s / self.embedded * 1000, 2) if self.embedded else 0.0
+            )
+        return stats
+
+
+# Bound to the collection's embedding function by the app factory
+query_embeddings = QueryEmbeddingCache(
+    max_entries=Config.QUERY_EMBED_CACHE_MAX_ENTRIES, ttl=Config.QUERY_EMBED_CACHE_TTL_S
+)
@@ -0,0 +1,118 @@
+"""
+Micro-batching executor for cross-encoder reranking.
+Concurrent requests hand their (query, chunk) pairs to one worker thread,
+which merges whatever arrives within a short window into a single
+length-sorted forward pass and returns each caller its own scores.
+"""
+
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable
+import numpy as np
+
+
+class RerankBatcher:
+    """
+    Shares reranker forward passes across concurrent callers.
+
+    predict() blocks until the caller's scores are ready. The worker waits
+    up to window_ms after the first pending request for others to join, or
+    until max_batch pairs are pending, then scores all of them in one
+    predict() call with pairs sorted by length to cut padding.
+
+    Any model with predict(items, batch_size) can be batched; length
+    gives the sort key of an item (default: a (query, chunk) pair).
+    """
+
+    def __init__(
+        self,
+        get_model: Callable,
+        max_batch: int = 64,
+        window_ms: float = 5.0,
+        length: Callable = None,
+    ):
+        self.get_model = get_model
+        self.length = length or (lambda pair: len(pair[0]) + len(pair[1]))
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.pairs = 0
+        self.requests = 0
+
+    def predict(self, pairs: list) -> np.ndarray:
+        """Scores for the given pairs, in order."""
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((list(pairs), future))
+        return future.result()
+
+    def stats(self) -> dict:
+        """Return batching counters."""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "pairs": self.pairs,
+                "avg_batch_pairs": self.pairs / self.batches if self.batches else 0.0,
+            }
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="rerank-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            n_pairs = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while n_pairs < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n_pairs += len(item[0])
+            self._score(batch)
+
+    def _score(self, batch: list):
+        pairs = [pair for item_pairs, _ in batch for pair in item_pairs]
+        try:
+            model = self.get_model()
+            if model is None:
+                raise RuntimeError("Reranker is not available")
+            # Similar lengths side by side so each sub-batch pads less
+            order = sorted(range(len(pairs)), key=lambda i: self.length(pairs[i]))
+            sorted_scores = np.asarray(
+                model.predict([pairs[i] for i in order], batch_size=self.max_batch)
+            )
+            scores = np.empty_like(sorted_scores)
+            scores[order] = sorted_scores
+        except Exception as exc:
+            logging.warning("Batched rerank failed: %s", exc)
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.pairs += len(pairs)
+        start = 0
+        for item_pairs, future in batch:
+            future.set_result(scores[start : start + len(item_pairs)])
+            start += len(item_pairs)
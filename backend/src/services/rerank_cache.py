@@ -0,0 +1,89 @@
+"""
+Rerank score cache.
+Cross-encoder scores depend only on the query, the chunk text and the
+model, so repeated or near-identical questions reuse earlier scores and
+only the pairs that miss the cache are sent to the reranker.
+"""
+
+import re
+import time
+import hashlib
+import threading
+from typing import Callable
+import numpy as np
+from src.utils.cache import TTLCache
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation insensitive query key."""
+    return re.sub(r"\s+", " ", query).strip().strip("?!.").strip().lower()
+
+
+class RerankScoreCache:
+    """
+    Caches rerank scores by (normalized query, chunk md5, model name).
+
+    score() looks up every pair, scores only the misses with the given
+    predict function and stores the results. Time saved is estimated from
+    the measured per-pair cost of the misses.
+    """
+
+    def __init__(self, max_entries: int, ttl: float = 0):
+        self._cache = TTLCache(max_entries, ttl)
+        self._lock = threading.Lock()
+        self.scored_pairs = 0
+        self.scoring_s = 0.0
+        self.saved_s = 0.0
+
+    def score(self, predict: Callable, query: str, chunks: list, model_name: str):
+        """Rerank scores for (query, chunk) pairs, in order."""
+        return self.score_many(predict, [query], [chunks], model_name)[0]
+
+    def score_many(self, predict: Callable, queries: list, chunk_lists: list, model_name: str):
+        """
+        score() for several queries, each with its own chunks; the misses of
+        all of them go to predict in one call.
+        """
+        pairs, keys = [], []
+        for query, chunks in zip(queries, chunk_lists):
+            query_key = normalize_query(query)
+            for chunk in chunks:
+                pairs.append((query, chunk))
+                keys.append(
+                    (query_key, hashlib.md5(chunk.encode("utf-8")).hexdigest(), model_name)
+                )
+        scores = self._cache.get_many(keys)
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            t0 = time.perf_counter()
+            fresh = predict([pairs[i] for i in missing])
+            elapsed = time.perf_counter() - t0
+            for i, score in zip(missing, fresh):
+                scores[i] = float(score)
+            self._cache.put_many((keys[i], scores[i]) for i in missing)
+            with self._lock:
+                self.scored_pairs += len(missing)
+                self.scoring_s += elapsed
+
+        with self._lock:
+            if self.scored_pairs:
+                per_pair = self.scoring_s / self.scored_pairs
+                self.saved_s += (len(pairs) - len(missing)) * per_pair
+
+        results, start = [], 0
+        for chunks in chunk_lists:
+            results.append(np.asarray(scores[start : start + len(chunks)], dtype=np.float32))
+            start += len(chunks)
+        return results
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, hit rate and estimated time saved."""
+        stats = self._cache.stats()
+        with self._lock:
+            stats["scored_pairs"] = self.scored_pairs
+            stats["saved_s"] = round(self.saved_s, 3)
+        return stats
@@ -0,0 +1,146 @@
+"""
+Retrieval result cache.
+retrieve() results are cached per tenant scope and corpus version, so a
+popular question skips embedding, vector search, BM25 and reranking until
+an ingest changes the documents it could have matched. Users without
+private documents all see the same corpus and share department-wide
+entries.
+
+Corpus versions and the "has private documents" lookups live in this
+process only: with several workers, an ingest handled by one of them is
+seen by the others after RESULT_CACHE_SCOPE_TTL_S (private documents)
+or RESULT_CACHE_TTL_S (results) at the latest. The cache is off by
+default for that reason.
+"""
+
+import json
+import logging
+import threading
+from src.config.settings import Config
+from src.services.bm25_index import tier_key
+from src.services.filters import private_where, visibility_where, without_clauses
+from src.services.rerank_cache import normalize_query
+from src.utils.cache import TTLCache
+
+
+def _result_nbytes(result: tuple) -> int:
+    """Approximate in-memory size of a cached (ctx, error) result."""
+    return len(json.dumps(result, default=str)) + 200
+
+
+class RetrievalResultCache:
+    """
+    Caches retrieve() results by (collection, scope, normalized query,
+    filters, mode flags, corpus version).
+
+    A scope is ("dept", dept_id) for users without private documents and
+    ("user", dept_id, user_id) otherwise. Corpus versions are counted per
+    scope in this process and bumped by ingestion; the ttl bounds how long
+    another worker process may serve results from before its ingests.
+    Whether a user has private documents is looked up again after
+    scope_ttl, and results holding a private chunk are never stored under
+    a department-wide key.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float = 0, scope_ttl: float = 30):
+        self._cache = TTLCache(max_entries, ttl, max_bytes=max_bytes, sizeof=_result_nbytes)
+        self._lock = threading.Lock()
+        self._versions = {}  # tier key -> corpus version
+        self._has_private = TTLCache(max_entries, scope_ttl)  # (dept_id, user_id) -> bool
+
+    def bump(self, metas: list):
+        """Advance the corpus version of every scope the upserted chunks touch."""
+        with self._lock:
+            for key in {tier_key(meta or {}) for meta in metas}:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                if key[0] == "user":
+                    self._has_private.put(key[1:], True)
+
+    def key(self, collection, dept_id: str, user_id: str, query: str, where, flags: tuple):
+        """
+        Cache key of one retrieve() call, or None when the user's scope
+        cannot be determined.
+        """
+        scope = self.scope(collection, dept_id, user_id)
+        if scope is None:
+            return None
+        versions = self.versions(scope)
+        # The visibility clauses are implied by the scope
+        filters = without_clauses(where, visibility_where(dept_id, user_id)["$and"])
+        return (
+            getattr(collection, "name", type(collection).__name__),
+            scope[-1],
+            versions,
+            normalize_query(query),
+            json.dumps(filters, sort_keys=True),
+            flags,
+        )
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def put(self, key, result: tuple):
+        """
+        Store a (ctx, error) result, unless it holds a private chunk and
+        key is department-wide: the owner's scope is marked private then,
+        and their next lookup gets a key of its own.
+        """
+        if self._mark_private(result[0]) and key[1][0] == "dept":
+            return
+        self._cache.put(key, result)
+
+    def clear(self):
+        self._cache.clear()
+        self._has_private.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters, hit rate and cached bytes."""
+        return self._cache.stats()
+
+    def versions(self, scope: tuple) -> tuple:
+        """Corpus versions of the tier keys in a scope."""
+        with self._lock:
+            return tuple(self._versions.get(key, 0) for key in scope)
+
+    def scope(self, collection, dept_id: str, user_id: str, ctx: list = None):
+        """
+        Tier keys whose documents the user's results depend on: the
+        department's, plus the user's own when they have private documents
+        (or ctx, retrieved context items, holds one of theirs). None when
+        that cannot be determined.
+        """
+        shared = ("dept", dept_id)
+        private = ("user", dept_id, user_id)
+        if ctx:
+            self._mark_private(ctx)
+        has_private = self._has_private.get((dept_id, user_id))
+        if has_private is None:
+            try:
+                res = collection.get(
+                    where=private_where(dept_id, user_id), limit=1, include=[]
+                )
+            except Exception as exc:
+                logging.warning("Result cache scope lookup failed: %s", exc)
+                return None
+            has_private = bool(res.get("ids"))
+            self._has_private.put((dept_id, user_id), has_private)
+        return (shared, private) if has_private else (shared,)
+
+    def _mark_private(self, ctx: list) -> bool:
+        """Record the owners of ctx's private chunks; True when there are any."""
+        owners = {
+            (item.get("dept_id", ""), item.get("user_id", ""))
+            for item in ctx
+            if item.get("file_for_user")
+        }
+        for owner in owners:
+            self._has_private.put(owner, True)
+        return bool(owners)
+
+
+retrieval_cache = RetrievalResultCache(
+    max_entries=Config.RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=int(Config.RESULT_CACHE_MAX_MB * 1024 * 1024),
+    ttl=Config.RESULT_CACHE_TTL_S,
+    scope_ttl=Config.RESULT_CACHE_SCOPE_TTL_S,
+)
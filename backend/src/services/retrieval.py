@@ -4,12 +4,25 @@ Handles semantic search, hybrid search (BM25 + semantic), and reranking.
 """
 
 import os
+import time
 import logging
-import numpy as np
-from rank_bm25 import BM25Okapi
-from sentence_transformers import CrossEncoder
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
 from typing import Optional
+from src.config.settings import Config
+import numpy as np
+from src.services.bm25_index import bm25_indexes
+from src.services.filters import tags_where, visibility_where, without_clauses
+from src.services.rerank_batcher import RerankBatcher
+from src.services.rerank_cache import RerankScoreCache
+from src.services.models import load_reranker
+from src.services.model_client import ModelClient, RemoteReranker
+from src.services.inference_budget import BudgetedModel, inference_budget
+from src.services.query_embedding import query_embeddings
+from src.services.result_cache import retrieval_cache
+from src.services import fusion
 from src.utils.safety import coverage_ok
+from src.utils.timings import LatencyStats
 
 # Configuration from environment
 CANDIDATES = 20
@@ -21,37 +34,65 @@ AVG_SEM_SIM = 0.2  # confidence gate for semantic-only
 MIN_RERANK = 0.5  # minimum rerank score threshold
 AVG_RERANK = 0.3  # average rerank score threshold for coverage
 TOP_K = 5
+MAX_CANDIDATES = 200  # deepest semantic re-query when a filter leaves too few
 
 RERANKER_MODEL_NAME = os.getenv(
     "RERANKER_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2"
 )
 
-# Global state for BM25 index (cached per user/dept)
-_bm25 = None
-_bm25_ids = []
-_bm25_docs = []
-_bm25_metas = []
-dept_previous = ""
-user_previous = ""
 _reranker = None
 
 
-def norm(xs):
-    """Normalize a list of scores to [0, 1] range."""
-    if not xs:
-        return []
-    mn, mx = min(xs), max(xs)
-    if mx - mn < 1e-9:
-        return [0.5 for _ in xs]
-    return [(x - mn) / (mx - mn) for x in xs]
+class Candidate:
+    """
+    A retrieval candidate: chunk text, its store metadata and its scores.
+    Context dicts are only built for the final top_k (see to_dict).
+    """
+
+    __slots__ = ("chunk", "meta", "sem_sim", "bm25", "hybrid", "rerank")
+
+    def __init__(self, chunk: str, meta: dict, sem_sim=0.0, bm25=0.0):
+        self.chunk = chunk
+        self.meta = meta
+        self.sem_sim = sem_sim
+        self.bm25 = bm25
+        self.hybrid = 0.0
+        self.rerank = 0.0
+
+    @property
+    def chunk_id(self) -> str:
+        return self.meta.get("chunk_id", "")
+
+    def to_dict(self) -> dict:
+        """Context item as returned to /chat."""
+        meta = self.meta
+        return {
+            "dept_id": meta.get("dept_id", ""),
+            "user_id": meta.get("user_id", ""),
+            "file_for_user": meta.get("file_for_user", False),
+            "chunk_id": meta.get("chunk_id", ""),
+            "chunk": self.chunk,
+            "file_id": meta.get("file_id", ""),
+            "source": meta.get("source", ""),
+            "ext": meta.get("ext", ""),
+            "tags": meta.get("tags", ""),
+            "size_kb": meta.get("size_kb", 0),
+            "upload_at": meta.get("upload_at", ""),
+            "uploaded_at_ts": meta.get("uploaded_at_ts", 0),
+            "page": meta.get("page", 0),
+            "sem_sim": self.sem_sim,
+            "bm25": self.bm25,
+            "hybrid": self.hybrid,
+            "rerank": self.rerank,
+        }
 
 
 def unique_snippet(ctx, prefix=150):
-    """Remove duplicate snippets based on source and chunk prefix."""
+    """Remove duplicate candidates based on source and chunk prefix."""
     seen = set()
     out = []
     for it in ctx:
-        key = it["source"] + it["chunk"][0:prefix]
+        key = it.meta.get("source", "") + it.chunk[0:prefix]
         if key in seen:
             continue
         seen.add(key)
@@ -63,52 +104,44 @@ def get_reranker():
     """Get or initialize the reranker model."""
     global _reranker
     if _reranker is None:
+        if Config.MODEL_SERVER_SOCKET:
+            # Scored by the shared model server instead of a local copy
+            _reranker = RemoteReranker(
+                ModelClient(Config.MODEL_SERVER_SOCKET, Config.MODEL_SERVER_TIMEOUT_S)
+            )
+            return _reranker
         try:
-            _reranker = CrossEncoder(RERANKER_MODEL_NAME)
+            _reranker = BudgetedModel(
+                load_reranker(RERANKER_MODEL_NAME, Config.INFERENCE_BACKEND),
+                inference_budget,
+            )
         except Exception as exc:
             logging.warning("Failed to load reranker %s: %s", RERANKER_MODEL_NAME, exc)
             return None
     return _reranker
 
 
-def build_bm25(collection, dept_id: str, user_id: str):
-    """
-    Build BM25 index for the given user and department.
-    Filters documents by dept_id and user_id (includes shared documents).
-    """
-    global _bm25, _bm25_ids, _bm25_docs, _bm25_metas
-    try:
-        res = collection.get(include=["documents", "metadatas"])
-        docs = res["documents"] if res and "documents" in res else []
-        metas = res["metadatas"] if res and "metadatas" in res else []
-        ids = res.get("ids", []) or []
-        docs = docs[0] if docs and isinstance(docs[0], list) else docs
-        ids = ids[0] if ids and isinstance(ids[0], list) else ids
-        metas = metas[0] if metas and isinstance(metas[0], list) else metas
-
-        # Filter by user_id and dept_id
-        filtered_ids, filtered_docs, filtered_metas = [], [], []
-        for i, meta in enumerate(metas):
-            if meta.get("dept_id", "") == dept_id and (
-                (
-                    meta.get("user_id", "") == user_id
-                    or (not meta.get("file_for_user", False))
-                )
-            ):
-                filtered_ids.append(ids[i])
-                filtered_docs.append(docs[i])
-                filtered_metas.append(meta)
-
-        tokenized = [d.split() for d in filtered_docs]
-        _bm25 = BM25Okapi(tokenized)
-        _bm25_ids = filtered_ids
-        _bm25_docs = filtered_docs
-        _bm25_metas = filtered_metas
-    except:
-        _bm25 = None
-        _bm25_ids = []
-        _bm25_docs = []
-        _bm25_metas = []
+# Shared by all requests so concurrent reranks run as one forward pass
+rerank_batcher = RerankBatcher(
+    get_reranker,
+    max_batch=Config.RERANK_MAX_BATCH,
+    window_ms=Config.RERANK_BATCH_WINDOW_MS,
+)
+
+# Scores of (query, chunk) pairs seen recently, e.g. re-asked questions
+rerank_cache = RerankScoreCache(
+    max_entries=Config.RERANK_CACHE_MAX_ENTRIES, ttl=Config.RERANK_CACHE_TTL_S
+)
+
+# BM25 legs of hybrid searches run here while the caller runs the
+# semantic leg; embedding and NumPy scoring both release the GIL
+leg_pool = ThreadPoolExecutor(
+    max_workers=Config.RETRIEVAL_LEG_WORKERS, thread_name_prefix="retrieval-leg"
+)
+
+# Per-leg latency: semantic (embed + vector search), bm25 (index fetch +
+# scoring) and legs (both, i.e. the critical path)
+leg_timings = LatencyStats()
 
 
 def build_prompt(query, ctx, use_ctx=False):
@@ -179,6 +212,7 @@ def retrieve(
     where: dict | None = None,
     use_hybrid=False,
     use_reranker=False,
+    query_embedding=None,
 ):
     """
     Retrieve relevant documents for a query.
@@ -192,250 +226,427 @@ def retrieve(
         where: ChromaDB where clause for filtering
         use_hybrid: Whether to use hybrid search (BM25 + semantic)
         use_reranker: Whether to use reranker
+        query_embedding: Precomputed query vector; embedded through the
+            query embedding cache when omitted
+
+    Results are served from the retrieval result cache while the corpus
+    the user can see is unchanged.
 
     Returns:
         Tuple of (context_list, error_message)
     """
-    global dept_previous, user_previous
+    cache_key = _cache_key(
+        collection, query, dept_id, user_id, top_k, where, use_hybrid, use_reranker
+    )
+    cached = retrieval_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        ctx, error = cached
+        return [dict(item) for item in ctx], error
+
+    try:
+        ctx, error = _retrieve(
+            collection, query, dept_id, user_id, top_k, where,
+            use_hybrid, use_reranker, query_embedding,
+        )
+    except Exception as e:
+        return [], str(e)
+    _remember(cache_key, ctx, error)
+    return ctx, error
+
+
+def retrieve_many(
+    collection,
+    queries,
+    dept_id="",
+    user_id="",
+    top_k=TOP_K,
+    where: dict | None = None,
+    use_hybrid=False,
+    use_reranker=False,
+):
+    """
+    Retrieve relevant documents for several queries at once.
 
+    The queries are embedded in one batch, searched with one multi-query
+    collection.query, scored against the BM25 index in one pass and
+    reranked with one batched predict. Arguments are as for retrieve().
+
+    Returns:
+        List of (context_list, error_message), one per query, each as
+        retrieve() would return it
+    """
+    results = [None] * len(queries)
+    cache_keys = [
+        _cache_key(
+            collection, query, dept_id, user_id, top_k, where, use_hybrid, use_reranker
+        )
+        for query in queries
+    ]
+    for i, cache_key in enumerate(cache_keys):
+        cached = retrieval_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            results[i] = ([dict(item) for item in cached[0]], cached[1])
+
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
     try:
+        fresh = _retrieve_many(
+            collection, [queries[i] for i in pending], dept_id, user_id, top_k, where,
+            use_hybrid, use_reranker,
+        )
+    except Exception as e:
+        for i in pending:
+            results[i] = ([], str(e))
+        return results
+    for i, (ctx, error) in zip(pending, fresh):
+        results[i] = (ctx, error)
+        _remember(cache_keys[i], ctx, error)
+    return results
+
+
+def _cache_key(collection, query, dept_id, user_id, top_k, where, use_hybrid, use_reranker):
+    if not Config.USE_RESULT_CACHE:
+        return None
+    return retrieval_cache.key(
+        collection, dept_id, user_id, query, where, (top_k, use_hybrid, use_reranker)
+    )
+
+
+def _remember(cache_key, ctx, error):
+    # Confidence-gated empty results are as stable as hits; failures are not
+    if cache_key and (error is None or error.startswith("No ")):
+        retrieval_cache.put(cache_key, ([dict(item) for item in ctx], error))
+
+
+def _retrieve(
+    collection, query, dept_id, user_id, top_k, where,
+    use_hybrid, use_reranker, query_embedding,
+):
+    """Run the retrieval pipeline; see retrieve()."""
+    vectors = None if query_embedding is None else [query_embedding]
+    [(docs, metas, dists)], [bm25_hits] = _search_legs(
+        collection, [query], vectors, dept_id, user_id, top_k, where, use_hybrid
+    )
+
+    print(f"Retrieved {len(docs)} documents for query: {query}")
+
+    if not docs:
+        return [], "No relevant documents found"
+
+    ctx_candidates, error = _rank_candidates(
+        docs, metas, dists, top_k, use_hybrid, bm25_hits
+    )
+    if error:
+        return [], error
+
+    # Rerank top candidates if reranker is available
+    if use_reranker:
+        reranker = get_reranker()
+        if not reranker:
+            return [], "Rerank failed."
+        if not ctx_candidates:
+            return [], "No candidates to rerank."
+
+        try:
+            ctx_for_rerank = ctx_candidates[: _rerank_count(ctx_candidates, top_k)]
+            rerank_scores = rerank_cache.score(
+                rerank_batcher.predict,
+                query,
+                [item.chunk for item in ctx_for_rerank],
+                # Quantized backends score slightly differently
+                f"{RERANKER_MODEL_NAME}@{Config.INFERENCE_BACKEND}",
+            )
+            return _apply_rerank(ctx_for_rerank, rerank_scores, top_k)
+        except Exception as e:
+            print(f"Rerank error: {e}")
+            return [], f"Rerank failed: {str(e)}"
+
+    return [item.to_dict() for item in ctx_candidates[:top_k]], None
+
+
+def _retrieve_many(
+    collection, queries, dept_id, user_id, top_k, where, use_hybrid, use_reranker
+):
+    """Run the retrieval pipeline for several queries; see retrieve_many()."""
+    searched, bm25_hits = _search_legs(
+        collection, queries, None, dept_id, user_id, top_k, where, use_hybrid
+    )
+    print(f"Retrieved documents for {len(queries)} queries")
+
+    results = [None] * len(queries)
+    ranked = {}  # query index -> ordered candidates
+    for i, ((docs, metas, dists), hits) in enumerate(zip(searched, bm25_hits)):
+        if not docs:
+            results[i] = ([], "No relevant documents found")
+            continue
+        ctx_candidates, error = _rank_candidates(
+            docs, metas, dists, top_k, use_hybrid, hits
+        )
+        if error:
+            results[i] = ([], error)
+        elif not use_reranker:
+            results[i] = ([item.to_dict() for item in ctx_candidates[:top_k]], None)
+        else:
+            ranked[i] = ctx_candidates
+
+    if ranked:
+        reranker = get_reranker()
+        for i, ctx_candidates in list(ranked.items()):
+            if not reranker:
+                results[i] = ([], "Rerank failed.")
+            elif not ctx_candidates:
+                results[i] = ([], "No candidates to rerank.")
+            else:
+                ranked[i] = ctx_candidates[: _rerank_count(ctx_candidates, top_k)]
+                continue
+            del ranked[i]
+
+        try:
+            # Every query's pairs in one batched predict
+            scores = rerank_cache.score_many(
+                rerank_batcher.predict,
+                [queries[i] for i in ranked],
+                [[item.chunk for item in ctx] for ctx in ranked.values()],
+                f"{RERANKER_MODEL_NAME}@{Config.INFERENCE_BACKEND}",
+            )
+            for (i, ctx_for_rerank), rerank_scores in zip(ranked.items(), scores):
+                results[i] = _apply_rerank(ctx_for_rerank, rerank_scores, top_k)
+        except Exception as e:
+            print(f"Rerank error: {e}")
+            for i in ranked:
+                results[i] = ([], f"Rerank failed: {str(e)}")
+    return results
+
+
+def _search_legs(collection, queries, vectors, dept_id, user_id, top_k, where, use_hybrid):
+    """
+    Run the semantic leg and, in hybrid mode, the BM25 leg concurrently.
+
+    vectors are precomputed query embeddings, or None to embed through the
+    query embedding cache. Returns (searched, bm25_hits): per query, the
+    (docs, metas, dists) of the semantic search and the BM25 hits (None
+    when there is no BM25 index to search).
+    """
+    t0 = time.perf_counter()
+    bm25_future = None
+    if use_hybrid:
+        bm25_future = leg_pool.submit(
+            _bm25_leg, collection, queries, dept_id, user_id, top_k, where
+        )
+
+    if vectors is None:
+        vectors = query_embeddings.embed_many(queries)
+    filtered = _request_where(where, dept_id, user_id) is not None
+    searched = _semantic_search(collection, queries, vectors, where, top_k, filtered)
+    semantic_ms = (time.perf_counter() - t0) * 1000
+
+    bm25_hits, bm25_ms = [None] * len(queries), None
+    if bm25_future is not None:
+        bm25_hits, bm25_ms = bm25_future.result()
+    legs_ms = (time.perf_counter() - t0) * 1000
+    leg_timings.record(semantic=semantic_ms, bm25=bm25_ms, legs=legs_ms)
+    logging.debug(
+        "Retrieval legs for %d queries: semantic %.1f ms, bm25 %s ms, both %.1f ms",
+        len(queries), semantic_ms, bm25_ms and round(bm25_ms, 1), legs_ms,
+    )
+    return searched, bm25_hits
+
+
+def _bm25_leg(collection, queries, dept_id, user_id, top_k, where):
+    """BM25 hits of each query, with the leg's duration in ms."""
+    t0 = time.perf_counter()
+    hits = [None] * len(queries)
+    index = bm25_indexes.get(collection, dept_id, user_id)
+    if index and len(index):
+        hits = index.search_many(
+            [query.split() for query in queries],
+            max(CANDIDATES, top_k),
+            where=_request_where(where, dept_id, user_id),
+        )
+    return hits, (time.perf_counter() - t0) * 1000
+
+
+def _semantic_search(collection, queries, vectors, where, top_k, filtered=False):
+    """
+    (docs, metas, dists) of each query from one multi-query search;
+    vectors are the query embeddings, or None to let Chroma embed the text.
+    filtered is set when where narrows the search beyond visibility.
+    """
+    results = [None] * len(queries)
+
+    def search(rows, n_results):
+        # Without a bound embedder Chroma embeds the text itself
+        query_args = (
+            {"query_texts": [queries[i] for i in rows]}
+            if vectors is None
+            else {"query_embeddings": [vectors[i] for i in rows]}
+        )
         res = collection.query(
-            query_texts=[query],
-            n_results=max(CANDIDATES, top_k),
+            **query_args,
+            n_results=n_results,
             where=where,
             include=["documents", "metadatas", "distances"],
         )
-        docs = res["documents"][0] if res.get("documents") else []
-        metas = res["metadatas"][0] if res.get("metadatas") else []
-        dists = res["distances"][0] if res.get("distances") else []
+        for j, i in enumerate(rows):
+            results[i] = (
+                res["documents"][j] if res.get("documents") else [],
+                res["metadatas"][j] if res.get("metadatas") else [],
+                res["distances"][j] if res.get("distances") else [],
+            )
 
-        print(f"Retrieved {len(docs)} documents for query: {query}")
+    n_results = max(CANDIDATES, top_k)
+    search(range(len(queries)), n_results)
 
-        if not docs:
-            return [], "No relevant documents found"
-
-        # Transform cosine distance -> similarity (1 - distance), normalize within semantic top-N
-        sims_raw = [max(0, 1 - d) for d in dists]
-        sims_norm = norm(sims_raw)  # Normalize semantic scores BEFORE union
-
-        ctx_original = [
-            {
-                "dept_id": meta.get("dept_id", "") if meta else "",
-                "user_id": meta.get("user_id", "") if meta else "",
-                "file_for_user": meta.get("file_for_user", False) if meta else False,
-                "chunk_id": meta.get("chunk_id", "") if meta else "",
-                "chunk": d,
-                "file_id": meta.get("file_id", "") if meta else "",
-                "source": meta.get("source", "") if meta else "",
-                "ext": meta.get("ext", "") if meta else "",
-                "tags": meta.get("tags", "") if meta else "",
-                "size_kb": meta.get("size_kb", 0) if meta else 0,
-                "upload_at": meta.get("upload_at", "") if meta else "",
-                "uploaded_at_ts": meta.get("uploaded_at_ts", 0) if meta else 0,
-                "page": meta.get("page", 0) if meta else 0,
-                "sem_sim": sim_norm,  # Already normalized within semantic top-N
-                "bm25": 0.0,
-                "hybrid": 0.0,
-                "rerank": 0.0,
-            }
-            for d, meta, sim_norm in zip(docs, metas, sims_norm)
-        ]
-        ctx_original = unique_snippet(ctx_original, prefix=150)
-
-        ctx_candidates = []
-
-        # Run BM25 and combine semantic + BM25 scores if hybrid
-        if use_hybrid:
-            if not _bm25 or user_id != user_previous or dept_id != dept_previous:
-                print("BM25 index not built, building now...")
-                build_bm25(collection, dept_id, user_id)
-                dept_previous = dept_id
-                user_previous = user_id
-
-            if _bm25 and _bm25_docs:
-                _bm25_scores = _bm25.get_scores(query.split())
-                count = max(CANDIDATES, top_k)
-                top_indexes = np.argsort(_bm25_scores)[::-1][:count]
-                # Normalize BM25 scores BEFORE union (within BM25 top-N)
-                bm25_norm = norm([_bm25_scores[i] for i in top_indexes])
-
-                ctx_bm25 = [
-                    {
-                        "dept_id": (
-                            _bm25_metas[idx].get("dept_id", "") if _bm25_metas else ""
-                        ),
-                        "user_id": (
-                            _bm25_metas[idx].get("user_id", "") if _bm25_metas else ""
-                        ),
-                        "file_for_user": (
-                            _bm25_metas[idx].get("file_for_user", False)
-                            if _bm25_metas
-                            else False
-                        ),
-                        "chunk_id": (
-                            _bm25_metas[idx].get("chunk_id", "") if _bm25_metas else ""
-                        ),
-                        "chunk": _bm25_docs[idx],
-                        "file_id": (
-                            _bm25_metas[idx].get("file_id", "") if _bm25_metas else ""
-                        ),
-                        "source": (
-                            _bm25_metas[idx].get("source", "") if _bm25_metas else ""
-                        ),
-                        "ext": _bm25_metas[idx].get("ext", "") if _bm25_metas else "",
-                        "tags": _bm25_metas[idx].get("tags", "") if _bm25_metas else "",
-                        "size_kb": (
-                            _bm25_metas[idx].get("size_kb", 0) if _bm25_metas else 0
-                        ),
-                        "upload_at": (
-                            _bm25_metas[idx].get("upload_at", "") if _bm25_metas else ""
-                        ),
-                        "uploaded_at_ts": (
-                            _bm25_metas[idx].get("uploaded_at_ts", 0)
-                            if _bm25_metas
-                            else 0
-                        ),
-                        "page": (_bm25_metas[idx].get("page", 0) if _bm25_metas else 0),
-                        "sem_sim": 0.0,
-                        "bm25": float(score),  # Already normalized within BM25 top-N
-                        "hybrid": 0.0,
-                        "rerank": 0.0,
-                    }
-                    for idx, score in zip(top_indexes, bm25_norm)
-                ]
-                ctx_bm25 = unique_snippet(ctx_bm25, prefix=150)
-
-                # Union both result sets
-                ctx_unioned = {}
-                for bm25_item in ctx_bm25:
-                    key = bm25_item["chunk_id"]
-                    ctx_unioned[key] = bm25_item
-
-                for sem_item in ctx_original:
-                    key = sem_item["chunk_id"]
-                    if key in ctx_unioned:
-                        # Merge: overlapping chunks get both normalized scores
-                        ctx_unioned[key] = {**ctx_unioned[key], **sem_item}
-                    else:
-                        # Semantic-only chunks: sem_sim is normalized, bm25=0
-                        ctx_unioned[key] = sem_item
-
-                ctx_candidates = list(ctx_unioned.values())
-
-                # Calculate hybrid with normalized scores (both already in [0,1])
-                for item in ctx_candidates:
-                    item["hybrid"] = FUSE_ALPHA * item.get("bm25", 0.0) + (
-                        1 - FUSE_ALPHA
-                    ) * item.get("sem_sim", 0.0)
-
-                # Confidence gate on hybrid
-                max_hybrid = (
-                    max(item.get("hybrid", 0) for item in ctx_candidates)
-                    if ctx_candidates
-                    else 0
-                )
-                if max_hybrid < MIN_HYBRID:
-                    return (
-                        [],
-                        "No relevant documents found after applying hybrid confidence threshold.",
-                    )
-
-                # Use coverage check to filter candidates
-                scores = [item.get("hybrid", 0) for item in ctx_candidates]
-                covered = coverage_ok(
-                    scores,
-                    topk=min(len(ctx_candidates), top_k * 2),
-                    score_avg=AVG_HYBRID,
-                    score_min=MIN_HYBRID,
-                )
-                if not covered:
-                    return (
-                        [],
-                        "No relevant documents found after applying hybrid coverage check.",
-                    )
-
-                ctx_candidates = sorted(
-                    ctx_candidates, key=lambda x: x.get("hybrid", 0), reverse=True
-                )
-        else:
-            # Confidence gate on semantic-only (already normalized in ctx_original)
-            ctx_candidates = [item for item in ctx_original]
-            if max(sims_raw) < MIN_SEM_SIM:
+    # A selective tag or extension filter can leave fewer than top_k chunks
+    # in the approximate neighbour search; look deeper once before giving
+    # up. Visibility alone does not: the tenant just has few chunks.
+    if filtered and n_results < MAX_CANDIDATES:
+        starved = [i for i, (docs, _, _) in enumerate(results) if len(docs) < top_k]
+        if starved:
+            search(starved, MAX_CANDIDATES)
+    return results
+
+
+def _request_where(where, dept_id, user_id):
+    # The request's own filters, without the visibility clauses (the BM25
+    # index only holds visible chunks)
+    return without_clauses(where, visibility_where(dept_id, user_id)["$and"])
+
+
+def _rank_candidates(docs, metas, dists, top_k, use_hybrid, bm25_hits):
+    """
+    Score, gate and order one query's candidates.
+
+    bm25_hits are the query's BM25 hits, or None when hybrid search has
+    no index to search. Returns (candidates, error_message).
+    """
+    # Transform cosine distance -> similarity (1 - distance), normalize within semantic top-N
+    sims_raw = np.maximum(0, 1 - np.asarray(dists, dtype=np.float64))
+    # Normalize semantic scores BEFORE union
+    sims_norm = fusion.normalize(sims_raw, Config.FUSION_NORM).tolist()
+
+    ctx_original = [
+        # sem_sim already normalized within semantic top-N
+        Candidate(d, meta or {}, sem_sim=sim_norm)
+        for d, meta, sim_norm in zip(docs, metas, sims_norm)
+    ]
+    ctx_original = unique_snippet(ctx_original, prefix=150)
+
+    ctx_candidates = []
+
+    # Combine semantic + BM25 scores if hybrid
+    if use_hybrid:
+        if bm25_hits is not None:
+            # Normalize BM25 scores BEFORE union (within BM25 top-N)
+            bm25_norm = fusion.normalize(
+                [hit[0] for hit in bm25_hits], Config.FUSION_NORM
+            ).tolist()
+
+            ctx_bm25 = [
+                # Already normalized within BM25 top-N
+                Candidate(doc, meta, bm25=float(score))
+                for (_, _, doc, meta), score in zip(bm25_hits, bm25_norm)
+            ]
+            ctx_bm25 = unique_snippet(ctx_bm25, prefix=150)
+
+            # Union both result sets by chunk id and fuse the normalized
+            # scores
+            ids, bm25_col, sem_col, hybrid = fusion.fuse(
+                [item.chunk_id for item in ctx_bm25],
+                [item.bm25 for item in ctx_bm25],
+                [item.chunk_id for item in ctx_original],
+                [item.sem_sim for item in ctx_original],
+                alpha=FUSE_ALPHA,
+                mode=Config.FUSION_MODE,
+                rrf_k=Config.RRF_K,
+            )
+            by_id = {item.chunk_id: item for item in ctx_bm25}
+            by_id.update((item.chunk_id, item) for item in ctx_original)
+            ctx_candidates = [by_id[chunk_id] for chunk_id in ids]
+            for item, bm25, sem_sim, score in zip(
+                ctx_candidates, bm25_col.tolist(), sem_col.tolist(), hybrid.tolist()
+            ):
+                item.bm25, item.sem_sim, item.hybrid = bm25, sem_sim, score
+
+            # Confidence gate on hybrid
+            if not len(hybrid) or hybrid.max() < MIN_HYBRID:
                 return (
                     [],
-                    "No relevant documents found after applying semantic confidence threshold.",
+                    "No relevant documents found after applying hybrid confidence threshold.",
                 )
-            # Use coverage check to filter semantic only candidates
+
+            # Use coverage check to filter candidates
             covered = coverage_ok(
-                sims_raw,
-                topk=min(len(ctx_candidates), top_k),
-                score_avg=AVG_SEM_SIM,
-                score_min=MIN_SEM_SIM,
+                hybrid,
+                topk=min(len(ctx_candidates), top_k * 2),
+                score_avg=AVG_HYBRID,
+                score_min=MIN_HYBRID,
             )
             if not covered:
                 return (
                     [],
-                    "No relevant documents found after applying semantic coverage check.",
+                    "No relevant documents found after applying hybrid coverage check.",
                 )
 
-            ctx_candidates = sorted(
-                ctx_candidates, key=lambda x: x.get("sem_sim", 0), reverse=True
+            order = np.argsort(-hybrid, kind="stable")
+            ctx_candidates = [ctx_candidates[i] for i in order]
+    else:
+        # Confidence gate on semantic-only (already normalized in ctx_original)
+        ctx_candidates = list(ctx_original)
+        if sims_raw.max() < MIN_SEM_SIM:
+            return (
+                [],
+                "No relevant documents found after applying semantic confidence threshold.",
+            )
+        # Use coverage check to filter semantic only candidates
+        covered = coverage_ok(
+            sims_raw,
+            topk=min(len(ctx_candidates), top_k),
+            score_avg=AVG_SEM_SIM,
+            score_min=MIN_SEM_SIM,
+        )
+        if not covered:
+            return (
+                [],
+                "No relevant documents found after applying semantic coverage check.",
             )
 
-        # Rerank top candidates if reranker is available
-        if use_reranker:
-            reranker = get_reranker()
-            if not reranker:
-                return [], "Rerank failed."
-            if not ctx_candidates:
-                return [], "No candidates to rerank."
-
-            try:
-                count = min(len(ctx_candidates), max(top_k * 3, 12))
-                ctx_for_rerank = ctx_candidates[:count]
-                rerank_inputs = [(query, item["chunk"]) for item in ctx_for_rerank]
-                rerank_scores = reranker.predict(rerank_inputs)
-
-                # Apply confidence gating on rerank scores
-                max_rerank_score = (
-                    max(rerank_scores)
-                    if rerank_scores is not None and len(rerank_scores) > 0
-                    else 0
-                )
-                if max_rerank_score < MIN_RERANK:
-                    return (
-                        [],
-                        "No relevant documents found after applying rerank confidence threshold.",
-                    )
-
-                # Apply coverage check on rerank scores
-                covered = coverage_ok(
-                    scores=rerank_scores.tolist(),
-                    topk=min(len(rerank_scores), top_k),
-                    score_avg=AVG_RERANK,
-                    score_min=MIN_RERANK,
-                )
-                if not covered:
-                    return (
-                        [],
-                        "No relevant documents found after applying rerank coverage check.",
-                    )
-
-                ranked_pair = sorted(
-                    zip(rerank_scores, ctx_for_rerank),
-                    key=lambda pair: pair[0],
-                    reverse=True,
-                )
-                ctx_candidates = [
-                    {**item, "rerank": float(score)} for score, item in ranked_pair
-                ]
-            except Exception as e:
-                print(f"Rerank error: {e}")
-                return [], f"Rerank failed: {str(e)}"
-
-        return ctx_candidates[:top_k], None
-    except Exception as e:
-        return [], str(e)
+        ctx_candidates.sort(key=attrgetter("sem_sim"), reverse=True)
+
+    return ctx_candidates, None
+
+
+def _rerank_count(ctx_candidates, top_k):
+    return min(len(ctx_candidates), max(top_k * 3, 12))
+
+
+def _apply_rerank(ctx_for_rerank, rerank_scores, top_k):
+    """Gate on rerank scores and order by them; returns (context_list, error)."""
+    # Apply confidence gating on rerank scores
+    if not len(rerank_scores) or rerank_scores.max() < MIN_RERANK:
+        return (
+            [],
+            "No relevant documents found after applying rerank confidence threshold.",
+        )
+
+    # Apply coverage check on rerank scores
+    covered = coverage_ok(
+        rerank_scores,
+        topk=min(len(rerank_scores), top_k),
+        score_avg=AVG_RERANK,
+        score_min=MIN_RERANK,
+    )
+    if not covered:
+        return (
+            [],
+            "No relevant documents found after applying rerank coverage check.",
+        )
+
+    for item, score in zip(ctx_for_rerank, rerank_scores.tolist()):
+        item.rerank = score
+    ctx_for_rerank.sort(key=attrgetter("rerank"), reverse=True)
+    return [item.to_dict() for item in ctx_for_rerank[:top_k]], None
 
 
 def build_where(request, dept_id, user_id):
@@ -465,6 +676,14 @@ def build_where(request, dept_id, user_id):
         ),
         None,
     )
+    tags = next(
+        (
+            f.get("tags")
+            for f in filters
+            if "tags" in f and isinstance(f.get("tags"), list)
+        ),
+        None,
+    )
 
     where_clauses = []
     # Build exts clause
@@ -474,10 +693,13 @@ def build_where(request, dept_id, user_id):
         elif len(exts) > 1:
             where_clauses.append({"$or": [{"ext": ext} for ext in exts]})
 
-    # Build dept_id clause
-    where_clauses.append({"dept_id": dept_id})
-    # Build user_id clause if file_for_user is specified
-    where_clauses.append({"$or": [{"file_for_user": False}, {"user_id": user_id}]})
+    # Build tags clause (chunks with any of the tags)
+    tags = [tag for tag in tags or [] if isinstance(tag, str) and tag.strip()]
+    if tags:
+        where_clauses.append(tags_where(tags))
+
+    # Build dept_id and user visibility clauses
+    where_clauses.extend(visibility_where(dept_id, user_id)["$and"])
 
     if len(where_clauses) > 1:
         return {"$and": where_clauses}
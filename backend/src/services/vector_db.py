@@ -1,35 +1,142 @@
-"""Vector database service"""
+"""
+Vector store interface.
+The app, retrieval and ingestion work against a VectorStore: a collection
+with upsert, query, get, delete and count, whose results use Chroma's
+column-per-field dict layout. VECTOR_STORE selects the backend: "chroma"
+(HNSW search in a Chroma collection) or "mmap" (float16 memory-mapped
+arrays with exact or IVF search, see mmap_store).
+"""
+
+from abc import ABC, abstractmethod
 import chromadb
-from chromadb.utils.embedding_functions import sentence_transformer_embedding_function
+from src.config.settings import Config
+
+VECTOR_STORES = ("chroma", "mmap")
+
+QUERY_INCLUDE = ("documents", "metadatas", "distances")
+GET_INCLUDE = ("documents", "metadatas")
+
+
+class VectorStore(ABC):
+    """
+    One collection of chunks with their embeddings.
+
+    query() and get() return dicts keyed by "ids" and the included fields
+    ("documents", "metadatas", "distances", "embeddings"); query() has one
+    list per query. Distances are cosine distances (1 - similarity).
+    where clauses use Chroma's syntax (see services.filters).
+    """
+
+    name = ""
+
+    @abstractmethod
+    def upsert(self, ids: list, documents: list, metadatas: list, embeddings=None):
+        """Insert or replace chunks; embeddings are computed when omitted."""
+
+    @abstractmethod
+    def query(
+        self,
+        query_embeddings=None,
+        query_texts=None,
+        n_results: int = 10,
+        where: dict = None,
+        include=QUERY_INCLUDE,
+    ) -> dict:
+        """Nearest chunks of each query vector (or text) matching where."""
+
+    @abstractmethod
+    def get(
+        self,
+        ids: list = None,
+        where: dict = None,
+        include=GET_INCLUDE,
+        limit: int = None,
+        offset: int = None,
+    ) -> dict:
+        """Chunks by id and/or where clause, a page at a time."""
+
+    @abstractmethod
+    def delete(self, ids: list = None, where: dict = None):
+        """Remove chunks by id and/or where clause."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of chunks in the collection."""
+
+
+class ChromaStore(VectorStore):
+    """VectorStore backed by a Chroma collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+        self.metadata = collection.metadata
 
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        kwargs = {"ids": ids, "documents": documents, "metadatas": metadatas}
+        if embeddings is not None:
+            kwargs["embeddings"] = embeddings
+        self.collection.upsert(**kwargs)
 
-class VectorDB:
-    """ChromaDB wrapper"""
-    
-    def __init__(self, path: str, model_name: str):
-        self.embedding_fun = sentence_transformer_embedding_function.SentenceTransformerEmbeddingFunction(
-            model_name=model_name
+    def query(
+        self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=QUERY_INCLUDE
+    ):
+        query_args = (
+            {"query_texts": query_texts}
+            if query_embeddings is None
+            else {"query_embeddings": query_embeddings}
         )
+        return self.collection.query(
+            **query_args, n_results=n_results, where=where, include=list(include)
+        )
+
+    def get(self, ids=None, where=None, include=GET_INCLUDE, limit=None, offset=None):
+        return self.collection.get(
+            ids=ids, where=where, include=list(include), limit=limit, offset=offset
+        )
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def count(self):
+        return self.collection.count()
+
+
+class ChromaStoreClient:
+    """Opens ChromaStore collections from a persistent Chroma database."""
+
+    def __init__(self, path: str):
         self.client = chromadb.PersistentClient(path=path)
-        self.collection = self.client.get_or_create_collection(
-            name="docs",
-            metadata={"hnsw:space": "cosine"},
-            embedding_function=self.embedding_fun
+
+    def get_or_create_collection(self, name: str, metadata=None, embedding_function=None):
+        return ChromaStore(
+            self.client.get_or_create_collection(
+                name=name, metadata=metadata, embedding_function=embedding_function
+            )
         )
-    
-    def upsert(self, ids: list, documents: list, metadatas: list):
-        """Insert or update documents"""
-        self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas)
-    
-    def query(self, query_texts: list, n_results: int, where: dict = None, include: list = None):
-        """Query similar documents"""
-        return self.collection.query(
-            query_texts=query_texts,
-            n_results=n_results,
-            where=where,
-            include=include or ["documents", "metadatas", "distances"]
+
+    def delete_collection(self, name: str):
+        self.client.delete_collection(name)
+
+
+def create_store_client(backend: str, path: str = None):
+    """
+    Client of the given VECTOR_STORE backend; its get_or_create_collection
+    returns VectorStore collections. path defaults to the backend's
+    configured directory.
+    """
+    if backend == "chroma":
+        return ChromaStoreClient(path or Config.CHROMA_PATH)
+    if backend == "mmap":
+        from src.services.mmap_store import MmapStoreClient
+
+        return MmapStoreClient(
+            path or Config.MMAP_STORE_PATH,
+            index=Config.MMAP_INDEX,
+            nprobe=Config.MMAP_IVF_NPROBE,
+            ivf_min_rows=Config.MMAP_IVF_MIN_ROWS,
+            quantization=Config.MMAP_QUANTIZATION,
+            rescore=Config.MMAP_RESCORE_CANDIDATES,
+            recall_sample=Config.MMAP_RECALL_SAMPLE,
         )
-    
-    def get(self, include: list = None):
-        """Get all documents"""
-        return self.collection.get(include=include or ["documents", "metadatas"])
+    raise ValueError(f"Unknown VECTOR_STORE {backend!r}, expected one of {VECTOR_STORES}")
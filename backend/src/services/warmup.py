@@ -0,0 +1,146 @@
+"""
+Startup warm-up.
+Loads the reranker, runs dummy embedder and reranker inference so lazy
+initialization and first-call allocations happen before real traffic, and
+pre-builds BM25 indexes for listed tenants. /ready reports readiness and
+per-step timings.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+_SAMPLE_TEXTS = [
+    "warm up",
+    "How many vacation days do new employees get in their first year?",
+    "Expense reports must be submitted within thirty days of travel, with "
+    "itemized receipts for lodging, meals and ground transportation.",
+]
+
+
+class Warmup:
+    """
+    Runs named warm-up steps once, in order, and tracks their outcome.
+
+    ready is False until every step has run. A failing step is logged and
+    reported with its error; the remaining steps still run and the state
+    ends as "degraded" instead of "ready". A degraded warm-up is not ready
+    unless ready_when_degraded is set.
+    """
+
+    def __init__(self, ready_when_degraded: bool = False):
+        self.ready_when_degraded = ready_when_degraded
+        self.state = "pending"
+        self.steps = OrderedDict()  # name -> {"ms", "ok"[, "error"]}
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready" or (
+            self.state == "degraded" and self.ready_when_degraded
+        )
+
+    def run(self, steps: list):
+        """Run (name, fn) steps in the calling thread."""
+        with self._lock:
+            self.state = "running"
+        t_start = time.perf_counter()
+        failed = False
+        for name, fn in steps:
+            t0 = time.perf_counter()
+            result = {"ok": True}
+            try:
+                fn()
+            except Exception as exc:
+                logging.warning("Warm-up step %s failed: %s", name, exc)
+                result = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+                failed = True
+            result["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            with self._lock:
+                self.steps[name] = result
+        with self._lock:
+            self.total_ms = round((time.perf_counter() - t_start) * 1000, 2)
+            self.state = "degraded" if failed else "ready"
+
+    def start(self, steps: list, background: bool = True):
+        """Run the steps, in a daemon thread when background is set."""
+        if not background:
+            self.run(steps)
+            return
+        self._thread = threading.Thread(
+            target=self.run, args=(steps,), name="warmup", daemon=True
+        )
+        self._thread.start()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until a background warm-up is done; return ready."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "state": self.state,
+                "total_ms": self.total_ms,
+                "steps": {name: dict(result) for name, result in self.steps.items()},
+            }
+
+
+def parse_tenants(spec: str) -> list:
+    """
+    Parse WARMUP_TENANTS, comma-separated "dept" or "dept:user" entries,
+    into (dept_id, user_id) pairs. A bare department builds its shared
+    index only (with an empty private overlay).
+    """
+    tenants = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        dept_id, _, user_id = entry.partition(":")
+        tenants.append((dept_id.strip(), user_id.strip()))
+    return tenants
+
+
+def warmup_steps(
+    embed_fn: Callable,
+    get_reranker: Callable = None,
+    bm25_indexes=None,
+    collections=None,
+    tenants: list = (),
+) -> list:
+    """
+    Warm-up steps: embedder inference, reranker load and inference (when
+    get_reranker is given) and a BM25 build per (dept_id, user_id) tenant,
+    read from the tenant's collection in the collections router.
+    """
+    steps = [("embedder", lambda: embed_fn(list(_SAMPLE_TEXTS)))]
+
+    if get_reranker is not None:
+
+        def reranker():
+            model = get_reranker()
+            if model is None:
+                raise RuntimeError("Reranker is not available")
+            model.predict([(_SAMPLE_TEXTS[1], text) for text in _SAMPLE_TEXTS])
+
+        steps.append(("reranker", reranker))
+
+    if bm25_indexes is not None and collections is not None:
+        for dept_id, user_id in tenants:
+            name = f"bm25:{dept_id}:{user_id}" if user_id else f"bm25:{dept_id}"
+            steps.append(
+                (
+                    name,
+                    lambda d=dept_id, u=user_id: bm25_indexes.get(
+                        collections.for_dept(d), d, u
+                    ),
+                )
+            )
+    return steps
@@ -0,0 +1,111 @@
+"""Bounded in-process caches"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl seconds.
+
+    Bounded by entry count and, when max_bytes is set, by the total of
+    sizeof(value); the least recently used entry is evicted first. A ttl
+    of 0 disables expiry. Hit/miss/eviction counters are kept for
+    monitoring.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_entries: int, ttl: float = 0, max_bytes: int = 0, sizeof=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._data = OrderedDict()  # key -> (expires_at, value, nbytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get(key)
+            if value is self._MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def get_many(self, keys: list) -> list:
+        """Values for keys, with None for misses, under one lock."""
+        with self._lock:
+            values = []
+            for key in keys:
+                value = self._get(key)
+                if value is self._MISSING:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self.hits += 1
+                    values.append(value)
+            return values
+
+    def put(self, key, value):
+        with self._lock:
+            self._put(key, value)
+
+    def put_many(self, items):
+        with self._lock:
+            for key, value in items:
+                self._put(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """Return cache counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return self._MISSING
+        expires_at, value, nbytes = item
+        if expires_at and expires_at < time.monotonic():
+            del self._data[key]
+            self.nbytes -= nbytes
+            return self._MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0
+        nbytes = self.sizeof(value) if self.sizeof else 0
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[2]
+        self._data[key] = (expires_at, value, nbytes)
+        self.nbytes += nbytes
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self.nbytes > self.max_bytes)
+        ):
+            _, _, evicted = self._data.popitem(last=False)[1]
+            self.nbytes -= evicted
+            self.evictions += 1
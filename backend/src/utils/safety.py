@@ -1,6 +1,7 @@
 from __future__ import annotations
 import re
 from typing import Iterable, Tuple, List, Dict
+import numpy as np
 
 # --- 1) Enhanced prompt-injection heuristics with categorization ---
 DANGEROUS_PATTERNS: Dict[str, List[str]] = {
@@ -132,13 +133,19 @@ def coverage_ok(
     score_avg: float = 0.28,
     score_min: float = 0.38,
 ) -> bool:
-    s = sorted(scores or [], reverse=True)[:topk]
-    if len(s) == 0:
+    """
+    True when the best score reaches score_min and the mean of the top k
+    reaches score_avg. Accepts lists or NumPy arrays; the top k are picked
+    with a partial sort instead of sorting every score.
+    """
+    s = np.fromiter(() if scores is None else scores, dtype=np.float64)
+    if not len(s) or topk <= 0:
         return False
-    if s[0] < score_min:
+    if topk < len(s):
+        s = np.partition(s, len(s) - topk)[len(s) - topk :]
+    if s.max() < score_min:
         return False
-    avg = sum(s) / len(s)
-    return avg >= score_avg
+    return bool(s.mean() >= score_avg)
 
 
 # --- 4) Simple post-check: require citations per sentence ---
@@ -0,0 +1,50 @@
+"""Rolling latency statistics for monitoring"""
+
+import threading
+from collections import defaultdict, deque
+import numpy as np
+
+
+class LatencyStats:
+    """
+    Thread-safe rolling latency samples, in milliseconds, per named stage.
+
+    Keeps the last window samples of each stage and reports count,
+    p50/p95 and max over them.
+    """
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, **stages_ms):
+        """Record one sample per stage, e.g. record(semantic=12.5, bm25=3.1)."""
+        with self._lock:
+            for stage, ms in stages_ms.items():
+                if ms is None:
+                    continue
+                self._samples[stage].append(float(ms))
+                self._counts[stage] += 1
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+
+    def stats(self) -> dict:
+        """Return {stage: {count, p50_ms, p95_ms, max_ms}}."""
+        with self._lock:
+            samples = {stage: np.asarray(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            stage: {
+                "count": counts[stage],
+                "p50_ms": round(float(np.percentile(values, 50)), 2),
+                "p95_ms": round(float(np.percentile(values, 95)), 2),
+                "max_ms": round(float(values.max()), 2),
+            }
+            for stage, values in samples.items()
+            if len(values)
+        }
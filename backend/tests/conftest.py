@@ -37,7 +37,7 @@ def _service_token(email="user@example.com", dept="eng", sid="test-sid"):
 def app():
     """Create and configure a new app instance for each test."""
     # Create app with testing configuration
-    flask_app, limiter, collection = create_app('testing')
+    flask_app, limiter, collections = create_app('testing')
     flask_app.config.update(TESTING=True)
     return flask_app
 
@@ -0,0 +1,44 @@
+import numpy as np
+from src.services.answer_cache import SemanticAnswerCache, context_overlap
+
+SHARED = (("dept", "eng"),)
+PRIVATE = (("dept", "eng"), ("user", "eng", "bob"))
+
+
+def _vec(*xs):
+    return np.asarray(xs, dtype=np.float32)
+
+
+def test_near_duplicate_question_with_the_same_context_hits():
+    cache = SemanticAnswerCache(min_sim=0.95, min_overlap=0.6, max_per_scope=10)
+    cache.store(SHARED, (1,), _vec(1, 0, 0), ["a", "b", "c"], "What is the travel policy?", "Book economy [1].")
+
+    assert cache.lookup(SHARED, (1,), _vec(0.99, 0.05, 0), ["a", "b", "c"]) == "Book economy [1]."
+    # Dissimilar question, or retrieval found other chunks
+    assert cache.lookup(SHARED, (1,), _vec(0, 1, 0), ["a", "b", "c"]) is None
+    assert cache.lookup(SHARED, (1,), _vec(1, 0, 0), ["a", "d", "e"]) is None
+    # Another visibility scope never sees the answer
+    assert cache.lookup(PRIVATE, (1, 1), _vec(1, 0, 0), ["a", "b", "c"]) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_corpus_change_invalidates_the_scope():
+    cache = SemanticAnswerCache(min_sim=0.9, min_overlap=0.5, max_per_scope=10)
+    cache.store(SHARED, (1,), _vec(1, 0), ["a"], "q", "old answer")
+    assert cache.lookup(SHARED, (2,), _vec(1, 0), ["a"]) is None
+    assert cache.lookup(SHARED, (1,), _vec(1, 0), ["a"]) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_each_scope_keeps_only_recent_questions():
+    cache = SemanticAnswerCache(min_sim=0.99, min_overlap=0.5, max_per_scope=2)
+    for i, vector in enumerate([_vec(1, 0), _vec(0, 1), _vec(1, 1)]):
+        cache.store(SHARED, (0,), vector, ["a"], f"q{i}", f"answer {i}")
+    assert cache.lookup(SHARED, (0,), _vec(1, 0), ["a"]) is None
+    assert cache.lookup(SHARED, (0,), _vec(2, 2), ["a"]) == "answer 2"
+    assert cache.stats()["entries"] == 2
+
+
+def test_context_overlap():
+    assert context_overlap(frozenset("ab"), frozenset("bc")) == 1 / 3
+    assert context_overlap(frozenset(), frozenset()) == 1.0
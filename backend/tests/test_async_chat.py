@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from src.asgi import AsyncChatApp, wsgi_environ
+from src.routes.chat import SESSIONS, ChatTurn
+
+DELAY_S = 0.05
+
+
+class FakeStream:
+    def __init__(self, pieces):
+        self.pieces = list(pieces)
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.pieces:
+            raise StopAsyncIteration
+        await asyncio.sleep(DELAY_S)
+        delta = SimpleNamespace(content=self.pieces.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeAsyncClient:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.streams = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        assert kwargs["stream"] is True
+        self.streams.append(FakeStream(self.pieces))
+        return self.streams[-1]
+
+
+def _turn(sid):
+    ctx = [{"chunk_id": "c1", "chunk": "Book economy."}]
+    user_msg = {"role": "user", "content": "travel policy?"}
+    return ChatTurn(sid, user_msg, "travel policy?", [user_msg], ctx)
+
+
+async def _collect(turn, client):
+    return [piece async for piece in turn.agenerate(client)]
+
+
+def test_agenerate_streams_deltas_then_records_the_turn():
+    SESSIONS.pop("async-1", None)
+    client = FakeAsyncClient(["Book ", "economy."])
+    pieces = asyncio.run(_collect(_turn("async-1"), client))
+
+    assert pieces[:2] == ["Book ", "economy."]
+    assert json.loads(pieces[2].split("__CONTEXT__:", 1)[1])[0]["chunk_id"] == "c1"
+    assert [m["content"] for m in SESSIONS["async-1"]] == ["travel policy?", "Book economy."]
+    assert client.streams[0].closed
+
+
+def test_many_streams_share_one_event_loop():
+    client = FakeAsyncClient(["a", "b", "c"])
+
+    async def run_all():
+        return await asyncio.gather(*(_collect(_turn(f"many-{i}"), client) for i in range(300)))
+
+    t0 = time.perf_counter()
+    results = asyncio.run(run_all())
+    assert time.perf_counter() - t0 < 20 * DELAY_S
+    assert all(r[:3] == ["a", "b", "c"] for r in results)
+
+
+def test_disconnect_stops_the_stream_and_keeps_the_partial_answer():
+    SESSIONS.pop("async-2", None)
+    app = AsyncChatApp.__new__(AsyncChatApp)
+    app.client = FakeAsyncClient(["one ", "two ", "three"])
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(1.5 * DELAY_S)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app._stream(_turn("async-2"), receive, send))
+
+    assert [m["body"] for m in sent] == [b"one "]
+    assert [m["content"] for m in SESSIONS["async-2"]] == ["travel policy?", "one two "]
+
+
+def test_wsgi_environ_from_scope():
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/chat",
+        "query_string": b"x=1",
+        "http_version": "1.1",
+        "server": ("127.0.0.1", 5001),
+        "client": ("10.0.0.2", 50000),
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", b"2"),
+            (b"authorization", b"Bearer t"),
+        ],
+    }
+    environ = wsgi_environ(scope, b"{}")
+    assert environ["PATH_INFO"] == "/chat"
+    assert environ["CONTENT_TYPE"] == "application/json"
+    assert environ["CONTENT_LENGTH"] == "2"
+    assert environ["HTTP_AUTHORIZATION"] == "Bearer t"
+    assert environ["REMOTE_ADDR"] == "10.0.0.2"
+    assert environ["wsgi.input"].read() == b"{}"
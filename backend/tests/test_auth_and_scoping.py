@@ -5,6 +5,7 @@ routes = [
     ("/ingest", "post", 401),
     ("/chat", "post", 401),
     ("/files", "get", 401),
+    ("/metrics", "get", 401),
 ]
 
 
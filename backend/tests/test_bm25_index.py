@@ -0,0 +1,451 @@
+import os
+import threading
+import numpy as np
+from rank_bm25 import BM25Okapi
+from src.services.bm25_index import BM25Index, BM25IndexManager, build_bm25
+from src.services.filters import (
+    matches_where,
+    private_where,
+    shared_where,
+    visibility_where,
+    without_clauses,
+)
+
+DOCS = [
+    "the quick brown fox jumps over the lazy dog",
+    "a quick brown dog outpaces a quick fox",
+    "lorem ipsum dolor sit amet",
+    "the dog sleeps in the sun",
+    "foxes and dogs are not the same animal",
+]
+
+
+class StubCollection:
+    """Minimal stand-in for a Chroma collection that counts full scans."""
+
+    def __init__(self, ids, docs, metas):
+        self.ids, self.docs, self.metas = ids, docs, metas
+        self.get_calls = 0
+        self.wheres = []
+
+    def get(self, where=None, include=None, limit=None, offset=0):
+        self.get_calls += 1
+        self.wheres.append(where)
+        rows = [
+            row
+            for row in zip(self.ids, self.docs, self.metas)
+            if where is None or _matches(row[2], where)
+        ][offset : offset + limit if limit else None]
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[1] for r in rows],
+            "metadatas": [r[2] for r in rows],
+        }
+
+
+def _matches(meta, where):
+    if "$and" in where:
+        return all(_matches(meta, w) for w in where["$and"])
+    if "$or" in where:
+        return any(_matches(meta, w) for w in where["$or"])
+    return all(meta.get(k) == v for k, v in where.items())
+
+
+def _collection(depts=("eng",)):
+    ids, docs, metas = [], [], []
+    for dept_id in depts:
+        prefix = "c" if dept_id == "eng" else f"{dept_id}-c"
+        ids += [f"{prefix}{i}" for i in range(len(DOCS))]
+        docs += DOCS
+        metas += [{"dept_id": dept_id, "file_for_user": False} for _ in DOCS]
+    return StubCollection(ids, docs, metas)
+
+
+def _index(docs, file_id="f1"):
+    index = BM25Index()
+    index.add(
+        [f"c{i}" for i in range(len(docs))],
+        docs,
+        [{"file_id": file_id, "chunk_id": f"c{i}"} for i in range(len(docs))],
+    )
+    return index
+
+
+def test_scores_match_rank_bm25():
+    index = _index(DOCS)
+    reference = BM25Okapi([d.split() for d in DOCS])
+    for query in ["quick fox", "the dog", "lorem", "unknown term"]:
+        assert np.allclose(
+            index.get_scores(query.split()), reference.get_scores(query.split())
+        )
+
+
+def test_incremental_add_and_remove_match_rebuild():
+    index = _index(DOCS[:3])
+    index.add(
+        ["c3", "c4"],
+        DOCS[3:],
+        [{"file_id": "f2", "chunk_id": "c3"}, {"file_id": "f2", "chunk_id": "c4"}],
+    )
+    index.remove_file("f1")
+    reference = BM25Okapi([d.split() for d in DOCS[3:]])
+
+    assert sorted(index.ids) == ["c3", "c4"]
+    scores = dict(zip(index.ids, index.get_scores(["the", "dog"])))
+    expected = dict(zip(["c3", "c4"], reference.get_scores(["the", "dog"])))
+    for chunk_id, score in expected.items():
+        assert np.isclose(scores[chunk_id], score)
+
+
+def test_manager_applies_chunks_to_visible_tenants_only():
+    manager = BM25IndexManager(max_entries=4, max_bytes=10**9)
+    collection = _collection()
+    for user_id in ("alice", "bob"):
+        manager.get(collection, "eng", user_id)
+
+    manager.add_chunks(
+        ["p1"],
+        ["private notes about the fox"],
+        [{"dept_id": "eng", "user_id": "alice", "file_for_user": True}],
+    )
+
+    assert "p1" in manager._indexes[("user", "eng", "alice")].ids
+    assert "p1" not in manager._indexes[("user", "eng", "bob")].ids
+    assert "p1" not in manager._indexes[("dept", "eng")].ids
+    assert "p1" in [hit[1] for hit in manager.get(collection, "eng", "alice").search(["fox"], 10)]
+    assert "p1" not in [hit[1] for hit in manager.get(collection, "eng", "bob").search(["fox"], 10)]
+
+
+def test_layered_scores_match_a_single_index_over_the_union():
+    collection = _collection()
+    private = [
+        "alice keeps the fox notes private",
+        "the the the dog report for alice",
+    ]
+    collection.ids += ["p0", "p1"]
+    collection.docs += private
+    collection.metas += [
+        {"dept_id": "eng", "user_id": "alice", "file_for_user": True} for _ in private
+    ]
+    view = BM25IndexManager(8, 10**9).get(collection, "eng", "alice")
+    reference = BM25Okapi([d.split() for d in DOCS + private])
+    ids = [f"c{i}" for i in range(len(DOCS))] + ["p0", "p1"]
+
+    # "the" is in more than half the chunks, exercising the merged idf floor
+    for query in ["quick fox", "the dog", "alice notes", "the"]:
+        expected = dict(zip(ids, reference.get_scores(query.split())))
+        hits = view.search(query.split(), len(ids))
+        assert len(hits) == len(ids)
+        for score, chunk_id, _, _ in hits:
+            assert np.isclose(score, expected[chunk_id])
+
+
+def test_department_users_share_one_copy_of_the_shared_index():
+    manager = BM25IndexManager(max_entries=64, max_bytes=10**9)
+    collection = _collection()
+    views = [manager.get(collection, "eng", f"user{i}") for i in range(10)]
+
+    assert all(view.shared is views[0].shared for view in views)
+    assert manager.stats()["entries"] == 11  # one shared layer + 10 overlays
+    assert manager.stats()["bytes"] < 2 * views[0].shared.nbytes
+
+
+def test_manager_rebuilds_when_ingest_races_a_build():
+    manager = BM25IndexManager(max_entries=4, max_bytes=10**9)
+    collection = _collection()
+    snapshot = collection.get
+
+    def get_during_ingest(**kwargs):
+        res = {k: list(v) for k, v in snapshot(**kwargs).items()}
+        if collection.get_calls == 1:
+            # Ingest upserts and updates cached indexes after the snapshot
+            meta = {"dept_id": "eng", "file_for_user": False}
+            collection.ids.append("new")
+            collection.docs.append("freshly ingested fox report")
+            collection.metas.append(meta)
+            manager.add_chunks(["new"], ["freshly ingested fox report"], [meta])
+        return res
+
+    collection.get = get_during_ingest
+    index = manager.get(collection, "eng", "alice")
+
+    # Shared layer built twice, then the (empty) private overlay once
+    assert "new" in index.shared.ids
+    assert collection.get_calls == 3
+    assert manager.get(collection, "eng", "alice") is index
+
+
+def test_build_fetches_only_visible_chunks_page_by_page():
+    collection = _collection()
+    collection.ids += ["other", "private"]
+    collection.docs += ["another department fox", "alice private fox notes"]
+    collection.metas += [
+        {"dept_id": "ops", "file_for_user": False},
+        {"dept_id": "eng", "user_id": "alice", "file_for_user": True},
+    ]
+
+    index = build_bm25(collection, shared_where("eng"), page_size=2)
+
+    assert sorted(index.ids) == sorted(f"c{i}" for i in range(len(DOCS)))
+    # 5 shared chunks in pages of 2: three pages, the last one short
+    assert collection.get_calls == 3
+    assert all(w == collection.wheres[0] for w in collection.wheres)
+    assert {"dept_id": "eng"} in collection.wheres[0]["$and"]
+    assert build_bm25(collection, private_where("eng", "alice")).ids == ["private"]
+    assert len(build_bm25(collection, private_where("eng", "bob"))) == 0
+
+
+def test_manager_reuses_indexes_for_interleaved_tenants():
+    manager = BM25IndexManager(max_entries=4, max_bytes=10**9)
+    collection = _collection()
+
+    for _ in range(3):
+        for user_id in ("alice", "bob"):
+            assert len(manager.get(collection, "eng", user_id)) == len(DOCS)
+
+    # One shared layer and two overlays, each built once
+    stats = manager.stats()
+    assert collection.get_calls == 3
+    assert stats["misses"] == 3
+    assert stats["hits"] == 9
+    assert stats["evictions"] == 0
+
+
+def test_manager_evicts_least_recently_used_by_entry_count():
+    manager = BM25IndexManager(max_entries=3, max_bytes=10**9)
+    collection = _collection()
+    for user_id in ("a", "b", "a", "c"):
+        manager.get(collection, "eng", user_id)
+
+    # "b" was least recently used when "c" arrived; the shared layer is
+    # touched by every query and stays cached
+    manager.get(collection, "eng", "b")
+    stats = manager.stats()
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 2
+    assert stats["misses"] == 5
+    assert collection.get_calls == 5
+    assert ("dept", "eng") in manager._indexes
+
+
+def test_manager_evicts_by_byte_budget():
+    collection = _collection(depts=("eng", "ops", "hr"))
+    one_dept = BM25IndexManager(max_entries=8, max_bytes=10**9)
+    one_dept.get(collection, "eng", "a")
+    nbytes = one_dept.stats()["bytes"]
+
+    manager = BM25IndexManager(max_entries=8, max_bytes=int(nbytes * 1.5))
+    for dept_id in ("eng", "ops", "hr"):
+        manager.get(collection, dept_id, "a")
+
+    # Only one department's shared layer fits; the tiny overlays may stay
+    stats = manager.stats()
+    assert [k for k in manager._indexes if k[0] == "dept"] == [("dept", "hr")]
+    assert ("user", "hr", "a") in manager._indexes
+    assert stats["evictions"] >= 2
+    assert stats["bytes"] <= manager.max_bytes
+
+
+def test_search_matches_dense_ranking_after_updates():
+    index = _index(DOCS)
+    index.add(["c5"], ["the fox and the dog again"], [{"file_id": "f2"}])
+    index.remove(["c1"])
+    remaining = DOCS[:1] + DOCS[2:] + ["the fox and the dog again"]
+    reference = BM25Okapi([d.split() for d in remaining])
+
+    hits = index.search(["fox", "dog"], 3)
+    expected = np.sort(reference.get_scores(["fox", "dog"]))[::-1][:3]
+    assert np.allclose([hit[0] for hit in hits], expected)
+    assert "c1" not in [hit[1] for hit in hits]
+
+    # Fewer matches than requested: zero-score chunks fill the candidate list
+    hits = index.search(["lorem"], 4)
+    assert len(hits) == 4
+    assert hits[0][1] == "c2"
+    assert [hit[0] for hit in hits[1:]] == [0.0, 0.0, 0.0]
+
+
+def test_saved_index_is_memory_mapped_and_shared_across_managers(tmp_path):
+    collection = _collection()
+    writer = BM25IndexManager(max_entries=8, max_bytes=1 << 30, index_path=str(tmp_path))
+    built = writer.get(collection, "eng", "alice")
+    assert collection.get_calls == 2  # shared layer and private overlay
+
+    # A second process maps the saved files instead of scanning the store
+    reader = BM25IndexManager(max_entries=8, max_bytes=1 << 30, index_path=str(tmp_path))
+    loaded = reader.get(collection, "eng", "alice")
+    assert collection.get_calls == 2
+    assert isinstance(loaded.shared._post_tfs, np.memmap)
+    query = ["quick", "dog"]
+    assert loaded.search(query, 3) == built.search(query, 3)
+
+    # Ingest in the writer replaces the files; the reader notices and reloads
+    writer.add_chunks(
+        ["c9"], ["quick quick dog"], [{"dept_id": "eng", "file_for_user": False}]
+    )
+    reloaded = reader.get(collection, "eng", "alice")
+    assert reloaded is not loaded
+    assert reloaded.search(query, 1)[0][1] == "c9"
+    assert collection.get_calls == 2
+
+    # Invalidation removes the files, so the next reader rebuilds
+    writer.invalidate("eng")
+    BM25IndexManager(8, 1 << 30, str(tmp_path)).get(collection, "eng", "alice")
+    assert collection.get_calls == 4
+
+
+def test_saving_a_layer_does_not_block_other_tenants(tmp_path, monkeypatch):
+    collection = _collection(depts=("eng", "hr"))
+    manager = BM25IndexManager(max_entries=8, max_bytes=1 << 30, index_path=str(tmp_path))
+    manager.get(collection, "eng", "alice")
+    manager.get(collection, "hr", "bob")
+
+    saving, release = threading.Event(), threading.Event()
+    save_delta = BM25Index.save_delta
+
+    def slow_save_delta(index, path):
+        saving.set()
+        release.wait(5)
+        return save_delta(index, path)
+
+    monkeypatch.setattr(BM25Index, "save_delta", slow_save_delta)
+    ingest = threading.Thread(
+        target=manager.add_chunks,
+        args=(["c9"], ["quick quick dog"], [{"dept_id": "eng", "file_for_user": False}]),
+    )
+    ingest.start()
+    assert saving.wait(5)
+
+    # The eng layer is being written; hr queries still get the lock
+    lookup = threading.Thread(target=manager.get, args=(collection, "hr", "bob"))
+    lookup.start()
+    lookup.join(1)
+    blocked = lookup.is_alive()
+    release.set()
+    ingest.join()
+    lookup.join()
+    assert not blocked
+
+    reader = BM25IndexManager(8, 1 << 30, str(tmp_path))
+    assert reader.get(collection, "eng", "alice").search(["quick", "dog"], 1)[0][1] == "c9"
+    assert collection.get_calls == 4
+
+
+def test_updates_rewrite_only_the_delta_until_a_compaction(tmp_path):
+    collection = _collection()
+    writer = BM25IndexManager(max_entries=8, max_bytes=1 << 30, index_path=str(tmp_path))
+    shared = writer.get(collection, "eng", "alice").shared
+    segment_file = os.path.join(writer._path(("dept", "eng")), "post_slots.npy")
+    written = os.stat(segment_file).st_ino
+    meta = {"dept_id": "eng", "file_for_user": False}
+
+    # A small ingest neither compacts nor rewrites the segment
+    writer.add_chunks(["c9"], ["quick quick dog"], [meta])
+    assert shared._delta
+    assert os.stat(segment_file).st_ino == written
+    reader = BM25IndexManager(8, 1 << 30, str(tmp_path)).get(collection, "eng", "alice")
+    assert reader.shared.segment == shared.segment
+    assert reader.search(["quick", "dog"], 1)[0][1] == "c9"
+
+    # Past the compaction threshold the segment is rewritten
+    writer.add_chunks(["c10"], [" ".join(f"term{i}" for i in range(20))], [meta])
+    assert os.stat(segment_file).st_ino != written
+    loaded = BM25IndexManager(8, 1 << 30, str(tmp_path)).get(collection, "eng", "alice")
+    assert isinstance(loaded.shared._post_tfs, np.memmap)
+    assert loaded.shared.segment == shared.segment
+    assert loaded.search(["term3", "dog"], 3) == writer.get(collection, "eng", "alice").search(
+        ["term3", "dog"], 3
+    )
+    assert collection.get_calls == 2
+
+
+def test_updates_from_two_managers_are_both_kept(tmp_path):
+    collection = _collection()
+    first = BM25IndexManager(max_entries=8, max_bytes=1 << 30, index_path=str(tmp_path))
+    second = BM25IndexManager(max_entries=8, max_bytes=1 << 30, index_path=str(tmp_path))
+    first.get(collection, "eng", "alice")
+    second.get(collection, "eng", "alice")
+    meta = {"dept_id": "eng", "file_for_user": False}
+
+    # Each manager ingests into the layer both of them cached
+    first.add_chunks(["x"], ["zebra zebra"], [meta])
+    second.add_chunks(["y"], ["yak yak"], [meta])
+
+    fresh = BM25IndexManager(8, 1 << 30, str(tmp_path))
+    for manager in (first, second, fresh):
+        view = manager.get(collection, "eng", "alice")
+        assert view.search(["zebra"], 1)[0][1] == "x"
+        assert view.search(["yak"], 1)[0][1] == "y"
+    assert collection.get_calls == 2
+
+
+def _filtered_index():
+    index = BM25Index()
+    index.add(
+        [f"c{i}" for i in range(len(DOCS))],
+        DOCS,
+        [
+            {"file_id": f"f{i % 2}", "ext": "pdf" if i % 2 else "md", "page": i,
+             "tags": "hr,policy" if i < 2 else "", "source": f"s{i}"}
+            for i in range(len(DOCS))
+        ],
+    )
+    return index
+
+
+def test_search_returns_only_chunks_matching_the_filter():
+    index = _filtered_index()
+    reference = dict(zip(index.ids, index.get_scores(["fox", "dog"])))
+
+    hits = index.search(["fox", "dog"], 5, where={"ext": "pdf"})
+    assert [hit[1] for hit in hits] == ["c1", "c3"]
+    # Scores keep the unfiltered corpus statistics
+    assert all(np.isclose(hit[0], reference[hit[1]]) for hit in hits)
+
+    where = {"$and": [{"ext": {"$in": ["md", "pdf"]}}, {"tag_policy": True}]}
+    assert sorted(h[1] for h in index.search(["lorem"], 5, where=where)) == ["c0", "c1"]
+    assert index.search(["fox"], 5, where={"page": {"$ne": 0}})[-1][1] != "c0"
+    # Fields without slot sets fall back to the stored metadata
+    assert [h[1] for h in index.search(["fox"], 5, where={"source": "s4"})] == ["c4"]
+
+
+def test_negated_filters_skip_chunks_without_the_field(tmp_path):
+    index = BM25Index()
+    metas = [{"ext": "pdf", "tags": "hr"}, {"ext": "md"}, {"ext": ""}, {"file_id": "f3"}]
+    index.add([f"c{i}" for i in range(4)], ["fox"] * 4, metas)
+    wheres = [
+        {"ext": {"$ne": "pdf"}},
+        {"ext": {"$nin": ["md"]}},
+        {"tag_hr": {"$ne": True}},
+        {"$or": [{"file_id": {"$ne": "f0"}}, {"ext": "pdf"}]},
+    ]
+    # As in Chroma, c3 (no ext) matches neither $ne nor $nin on ext
+    expected = [["c1", "c2"], ["c0", "c2"], [], ["c0", "c3"]]
+
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    for where, ids in zip(wheres, expected):
+        assert [cid for cid, meta in zip(index.ids, metas) if matches_where(meta, where)] == ids
+        for searched in (index, loaded):
+            assert sorted(h[1] for h in searched.search(["fox"], 5, where=where)) == ids
+
+
+def test_filters_survive_updates_and_memory_mapping(tmp_path):
+    index = _filtered_index()
+    index.add(["c9"], ["fox fox"], [{"file_id": "f9", "ext": "pdf"}])
+    index.remove_file("f1")
+    assert [h[1] for h in index.search(["fox"], 5, where={"ext": "pdf"})] == ["c9"]
+
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    for where in ({"ext": "pdf"}, {"tag_hr": True}, {"file_id": {"$nin": ["f0"]}}):
+        assert loaded.search(["fox"], 5, where=where) == index.search(
+            ["fox"], 5, where=where
+        )
+
+
+def test_request_filters_are_separated_from_visibility():
+    visibility = visibility_where("eng", "alice")["$and"]
+    where = {"$and": [{"ext": "pdf"}] + visibility}
+    assert without_clauses(where, visibility) == {"ext": "pdf"}
+    assert without_clauses({"$and": visibility}, visibility) is None
@@ -0,0 +1,117 @@
+import re
+from migrate_collections import migrate
+from src.services.collection_router import CollectionRouter, backfill_tags, collection_name
+
+
+class MemoryCollection:
+    def __init__(self, name, metadata=None):
+        self.name = name
+        self.metadata = metadata
+        self.rows = {}  # id -> (doc, meta, embedding)
+
+    def upsert(self, ids, documents, metadatas, embeddings=None):
+        embeddings = embeddings or [None] * len(ids)
+        for row in zip(ids, documents, metadatas, embeddings):
+            self.rows[row[0]] = row[1:]
+
+    def get(self, ids=None, include=None, limit=None, offset=0):
+        if ids is not None:
+            items = [(i, self.rows[i]) for i in ids if i in self.rows]
+        else:
+            items = list(self.rows.items())[offset : offset + limit]
+        return {
+            "ids": [i for i, _ in items],
+            "documents": [r[0] for _, r in items],
+            "metadatas": [r[1] for _, r in items],
+            "embeddings": [r[2] for _, r in items],
+        }
+
+    def count(self):
+        return len(self.rows)
+
+
+class MemoryClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None, embedding_function=None):
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection(name, metadata)
+        return self.collections[name]
+
+
+def test_each_department_gets_its_own_lazily_created_collection():
+    client = MemoryClient()
+    router = CollectionRouter(client, embedding_function=None)
+    assert client.collections == {}
+
+    eng = router.for_dept("eng")
+    assert router.for_dept("eng") is eng
+    assert router.for_dept("hr") is not eng
+    assert eng.metadata["dept_id"] == "eng"
+    assert router.for_identity({"dept_id": "hr"}) is router.for_dept("hr")
+    assert router.for_identity(None) is None
+
+
+def test_shared_mode_keeps_the_single_collection():
+    router = CollectionRouter(MemoryClient(), embedding_function=None, per_dept=False)
+    assert router.for_dept("eng") is router.for_dept("hr")
+    assert router.for_dept("eng").name == "docs"
+
+
+def test_collection_names_are_valid_and_distinct():
+    names = {collection_name(d) for d in ["eng", "Eng", "R&D / Europe", "研究", "x" * 200]}
+    assert len(names) == 5
+    for name in names:
+        assert 3 <= len(name) <= 63
+        assert re.fullmatch(r"[a-zA-Z0-9][a-zA-Z0-9._-]*[a-zA-Z0-9]", name)
+
+
+def test_migration_splits_the_shared_collection_by_department():
+    client = MemoryClient()
+    router = CollectionRouter(client, embedding_function=None)
+    shared = router.shared()
+    for i in range(25):
+        dept = ["eng", "hr", ""][i % 3]
+        shared.upsert([f"c{i}"], [f"chunk {i}"], [{"dept_id": dept}], [[float(i)]])
+
+    report = migrate(router, page_size=4)
+
+    assert report["skipped"] == 8
+    assert report["departments"]["eng"] == {
+        "copied": 9, "collection": router.for_dept("eng").name, "count": 9,
+    }
+    assert report["departments"]["hr"]["count"] == 8
+    # Stored embeddings are copied, not recomputed
+    assert router.for_dept("hr").rows["c1"] == ("chunk 1", {"dept_id": "hr"}, [1.0])
+
+
+def test_chunks_stored_without_tag_keys_are_backfilled():
+    client = MemoryClient()
+    router = CollectionRouter(client, embedding_function=None)
+    shared = router.shared()
+    shared.upsert(["old"], ["old chunk"], [{"dept_id": "eng", "tags": "HR, policy"}], [[1.0]])
+    shared.upsert(["new"], ["new chunk"], [{"dept_id": "eng", "tags": "hr", "tag_hr": True}], [[2.0]])
+    shared.upsert(["untagged"], ["no tags"], [{"dept_id": "eng", "tags": ""}], [[3.0]])
+
+    # Copying adds the keys too
+    migrate(router)
+    assert router.for_dept("eng").rows["old"][1]["tag_policy"] is True
+
+    assert backfill_tags(shared, page_size=2) == 1
+    assert shared.rows["old"] == (
+        "old chunk", {"dept_id": "eng", "tags": "HR, policy", "tag_hr": True, "tag_policy": True}, [1.0],
+    )
+    assert backfill_tags(shared) == 0
+
+
+def test_collections_are_backfilled_when_first_opened():
+    client = MemoryClient()
+    old = {"dept_id": "eng", "tags": "policy"}
+    CollectionRouter(client, embedding_function=None).for_dept("eng").upsert(
+        ["old"], ["old chunk"], [old], [[1.0]]
+    )
+
+    router = CollectionRouter(client, embedding_function=None, backfill=True)
+    eng = router.for_dept("eng")
+    assert eng.rows["old"] == ("old chunk", {**old, "tag_policy": True}, [1.0])
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+from src.services import fusion
+from src.utils.safety import coverage_ok
+
+
+def reference_fuse(bm25_ids, bm25_scores, sem_ids, sem_scores, alpha):
+    """The per-candidate loop retrieval used before fusion was vectorized."""
+    def norm(xs):
+        if not xs:
+            return []
+        mn, mx = min(xs), max(xs)
+        if mx - mn < 1e-9:
+            return [0.5 for _ in xs]
+        return [(x - mn) / (mx - mn) for x in xs]
+
+    merged = {}
+    for chunk_id, score in zip(bm25_ids, norm(bm25_scores)):
+        merged[chunk_id] = {"bm25": score, "sem": 0.0}
+    for chunk_id, score in zip(sem_ids, norm(sem_scores)):
+        sem_item = {"bm25": 0.0, "sem": score}
+        merged[chunk_id] = {**merged.get(chunk_id, {}), **sem_item}
+    return {
+        chunk_id: alpha * s["bm25"] + (1 - alpha) * s["sem"]
+        for chunk_id, s in merged.items()
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_weighted_fusion_matches_the_loop_implementation(seed):
+    rng = np.random.default_rng(seed)
+    bm25_ids = [f"c{i}" for i in rng.choice(60, size=20, replace=False)]
+    sem_ids = [f"c{i}" for i in rng.choice(60, size=20, replace=False)]
+    bm25_scores = rng.gamma(2.0, 3.0, size=20).tolist()
+    sem_scores = rng.random(20).tolist()
+
+    expected = reference_fuse(bm25_ids, bm25_scores, sem_ids, sem_scores, 0.3)
+    ids, _, _, fused = fusion.fuse(
+        bm25_ids, fusion.minmax(bm25_scores), sem_ids, fusion.minmax(sem_scores), alpha=0.3
+    )
+    assert ids == list(expected)
+    np.testing.assert_allclose(fused, list(expected.values()))
+
+    for topk in (1, 5, 40):
+        top = sorted(expected.values(), reverse=True)[:topk]
+        assert coverage_ok(fused, topk, 0.3, 0.5) == (
+            top[0] >= 0.5 and sum(top) / len(top) >= 0.3
+        )
+
+
+def test_weighted_fusion_keeps_the_semantic_score_of_overlapping_chunks():
+    ids, bm25, sem, fused = fusion.fuse(["a", "b"], [1.0, 0.2], ["b", "c"], [0.9, 0.4])
+    assert ids == ["a", "b", "c"]
+    assert bm25.tolist() == [1.0, 0.0, 0.0]
+    assert sem.tolist() == [0.0, 0.9, 0.4]
+    assert fused.tolist() == pytest.approx([0.5, 0.45, 0.2])
+    # RRF counts both legs
+    _, bm25, _, _ = fusion.fuse(["a", "b"], [1.0, 0.2], ["b", "c"], [0.9, 0.4], mode="rrf")
+    assert bm25.tolist() == [1.0, 0.2, 0.0]
+
+
+def test_rrf_rewards_agreement_between_the_legs():
+    ids, _, _, fused = fusion.fuse(
+        ["a", "b", "c"], [3.0, 2.0, 1.0], ["b", "a", "d"], [0.9, 0.8, 0.7], mode="rrf", rrf_k=60
+    )
+    scores = dict(zip(ids, fused))
+    assert scores["a"] == scores["b"] > scores["c"] == scores["d"]
+    # Ranked first by both legs scores exactly 1
+    _, _, _, top = fusion.fuse(["a"], [1.0], ["a"], [1.0], mode="rrf")
+    assert top.tolist() == [pytest.approx(1.0)]
+    with pytest.raises(ValueError):
+        fusion.fuse(["a"], [1.0], [], [], mode="max")
+
+
+def test_normalizers():
+    assert fusion.minmax([2.0, 2.0]).tolist() == [0.5, 0.5]
+    assert fusion.minmax([1.0, 3.0, 2.0]).tolist() == [0.0, 1.0, 0.5]
+    z = fusion.zscore([1.0, 2.0, 6.0])
+    assert z.mean() == pytest.approx(0.0) and z.std() == pytest.approx(1.0)
+    assert fusion.zscore([2.0, 2.0]).tolist() == [0.0, 0.0]
+    assert fusion.normalize([1.0, 3.0], "zscore").tolist() == [-1.0, 1.0]
+    assert fusion.normalize([1.0, 3.0]).tolist() == [0.0, 1.0]
+    with pytest.raises(ValueError):
+        fusion.normalize([1.0], "rank")
+    assert not coverage_ok([], 5, 0.0, 0.0)
+    assert not coverage_ok(None)
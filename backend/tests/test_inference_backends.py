@@ -0,0 +1,77 @@
+import json
+import numpy as np
+import pytest
+from src.config.settings import Config
+from src.services.inference_budget import inference_budget
+from src.services.models import (
+    INFERENCE_BACKENDS,
+    _load_kwargs,
+    embedding_function,
+    load_reranker,
+    model_source,
+)
+
+QUERY = "How many vacation days do new employees get?"
+CHUNKS = [
+    "New employees receive 20 days of paid vacation per year.",
+    "The cafeteria is open from 8am to 3pm on weekdays.",
+    "Vacation requests must be approved by your manager two weeks ahead.",
+]
+
+
+def _load(loader, model_name, backend):
+    try:
+        return loader(model_name, backend)
+    except OSError as exc:  # model files not cached and no network
+        pytest.skip(f"{model_name} unavailable: {exc}")
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_embeddings_match_torch(backend, tmp_path, monkeypatch):
+    pytest.importorskip("optimum.onnxruntime")
+    monkeypatch.setattr(Config, "ONNX_MODEL_DIR", str(tmp_path))
+    reference = np.array(_load(embedding_function, Config.EMBED_MODEL_NAME, "torch")(CHUNKS))
+    got = np.array(_load(embedding_function, Config.EMBED_MODEL_NAME, backend)(CHUNKS))
+
+    cosine = np.sum(reference * got, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(got, axis=1)
+    )
+    assert cosine.min() > (0.999 if backend == "onnx" else 0.97)
+
+
+@pytest.mark.parametrize("backend", ["onnx", "onnx-int8"])
+def test_rerank_scores_match_torch(backend, tmp_path, monkeypatch):
+    pytest.importorskip("optimum.onnxruntime")
+    monkeypatch.setattr(Config, "ONNX_MODEL_DIR", str(tmp_path))
+    pairs = [(QUERY, chunk) for chunk in CHUNKS]
+    reference = _load(load_reranker, Config.RERANKER_MODEL_NAME, "torch").predict(pairs)
+    got = _load(load_reranker, Config.RERANKER_MODEL_NAME, backend).predict(pairs)
+
+    if backend == "onnx":
+        assert np.allclose(got, reference, atol=1e-3)
+    else:
+        # int8 keeps the ranking, within a small score tolerance
+        assert list(np.argsort(got)) == list(np.argsort(reference))
+        assert np.abs(got - reference).max() < 0.5
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        model_source("any", "tensorrt", object)
+
+
+def test_persisted_kwargs_leave_out_the_session_options(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ONNX_MODEL_DIR", str(tmp_path))
+    exported = tmp_path / "any" / "onnx" / f"model_qint8_{Config.ONNX_QUANTIZATION}.onnx"
+    exported.parent.mkdir(parents=True)
+    exported.touch()
+
+    for backend in INFERENCE_BACKENDS:
+        _, kwargs = model_source("any", backend, object)
+        # Chroma stores the embedding function's kwargs as JSON
+        json.dumps(kwargs)
+
+    pytest.importorskip("onnxruntime")
+    options = _load_kwargs(kwargs)["model_kwargs"]["session_options"]
+    assert options.intra_op_num_threads == inference_budget.intra_op_threads
+    assert "session_options" not in kwargs["model_kwargs"]
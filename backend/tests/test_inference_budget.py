@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+import chromadb
+import numpy as np
+from chromadb.utils.embedding_functions.sentence_transformer_embedding_function import (
+    SentenceTransformerEmbeddingFunction,
+)
+from src.services.inference_budget import (
+    BudgetedEmbeddingFunction,
+    BudgetedModel,
+    InferenceBudget,
+)
+
+
+class SlowModel:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def predict(self, pairs, batch_size=32):
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self._lock:
+            self.active -= 1
+        return [0.0] * len(pairs)
+
+
+def test_cores_are_split_between_workers_and_concurrent_passes():
+    budget = InferenceBudget(total_cores=16, workers=4, max_concurrent=2)
+    assert budget.process_cores == 4
+    assert budget.intra_op_threads == 2
+    # Never below one thread, even with more workers than cores
+    assert InferenceBudget(total_cores=2, workers=8, max_concurrent=4).intra_op_threads == 1
+
+
+def test_apply_sets_thread_environment(monkeypatch):
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "TOKENIZERS_PARALLELISM"):
+        monkeypatch.delenv(name, raising=False)
+    InferenceBudget(total_cores=8, workers=2, max_concurrent=1).apply()
+    assert os.environ["OMP_NUM_THREADS"] == "4"
+    assert os.environ["TOKENIZERS_PARALLELISM"] == "false"
+
+
+def test_slots_cap_concurrent_forward_passes_and_record_waits():
+    budget = InferenceBudget(total_cores=4, workers=1, max_concurrent=2)
+    model = SlowModel()
+    budgeted = BudgetedModel(model, budget)
+
+    threads = [
+        threading.Thread(target=budgeted.predict, args=([("q", "c")],)) for _ in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert model.peak == 2
+    stats = budget.stats()
+    assert stats["in_flight"] == 0
+    assert stats["timings"]["queue_wait"]["count"] == 6
+    assert stats["timings"]["queue_wait"]["max_ms"] >= 50
+
+
+class FakeSentenceTransformer:
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_budgeted_function_reopens_collections_persisted_with_the_plain_one(
+    tmp_path, monkeypatch
+):
+    # A cached model stands in for the download the constructor would do
+    monkeypatch.setitem(
+        SentenceTransformerEmbeddingFunction.models, "fake-model", FakeSentenceTransformer()
+    )
+    plain = SentenceTransformerEmbeddingFunction(model_name="fake-model")
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    client.get_or_create_collection("docs", embedding_function=plain)
+
+    budget = InferenceBudget(total_cores=2, workers=1, max_concurrent=1)
+    budgeted = BudgetedEmbeddingFunction(plain, budget)
+    assert budgeted.name() == plain.name()
+    assert budgeted.get_config() == plain.get_config()
+
+    reopened = chromadb.PersistentClient(path=str(tmp_path))
+    collection = reopened.get_or_create_collection("docs", embedding_function=budgeted)
+    collection.add(ids=["a"], documents=["hello"])
+    assert reopened.get_collection("docs", embedding_function=budgeted).count() == 1
+    assert budget.stats()["timings"]["forward"]["count"] == 1
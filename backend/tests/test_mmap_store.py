@@ -0,0 +1,250 @@
+import threading
+import numpy as np
+import pytest
+from src.services import retrieval
+from src.services.filters import matches_where, visibility_where
+from src.services.mmap_store import MmapStoreClient, MmapVectorStore
+from src.services.vector_db import VectorStore
+
+DIM = 16
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def _fill(store, n=200):
+    vectors = _vectors(n)
+    store.upsert(
+        [f"c{i}" for i in range(n)],
+        [f"chunk {i}" for i in range(n)],
+        [{"dept_id": "eng", "file_for_user": i % 4 == 0, "user_id": "bob" if i % 4 == 0 else ""} for i in range(n)],
+        vectors,
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_exact_query_matches_brute_force(tmp_path):
+    store = MmapVectorStore(str(tmp_path), "docs")
+    unit = _fill(store)
+    query = _vectors(1, seed=1)[0]
+
+    res = store.query(query_embeddings=[query], n_results=5)
+    expected = np.argsort(-(unit @ (query / np.linalg.norm(query))))[:5]
+    assert res["ids"][0] == [f"c{i}" for i in expected]
+    assert res["documents"][0][0] == f"chunk {expected[0]}"
+    # float16 storage keeps cosine distances within a small tolerance
+    exact = 1 - unit[expected] @ (query / np.linalg.norm(query))
+    assert np.allclose(res["distances"][0], exact, atol=2e-3)
+
+
+def test_filters_paging_delete_and_count(tmp_path):
+    store = MmapVectorStore(str(tmp_path), "docs")
+    _fill(store, 40)
+    where = {"$and": [{"dept_id": "eng"}, {"file_for_user": False}]}
+
+    res = store.query(query_embeddings=_vectors(1, seed=2), n_results=50, where=where)
+    assert len(res["ids"][0]) == 30
+    assert all(not m["file_for_user"] for m in res["metadatas"][0])
+
+    page = store.get(where={"user_id": "bob"}, limit=4, offset=8, include=[])
+    assert page == {"ids": ["c32", "c36"]}
+
+    store.delete(where={"user_id": "bob"})
+    store.delete(ids=["c1"])
+    assert store.count() == 29
+    assert store.get(ids=["c1", "c2"])["ids"] == ["c2"]
+
+
+def test_reupsert_replaces_and_other_instances_see_writes(tmp_path):
+    writer = MmapVectorStore(str(tmp_path), "docs")
+    reader = MmapVectorStore(str(tmp_path), "docs")
+    _fill(writer, 10)
+    assert reader.count() == 10
+
+    vector = _vectors(1, seed=3)
+    writer.upsert(["c3"], ["new text"], [{"dept_id": "eng"}], vector)
+    res = reader.query(query_embeddings=vector, n_results=1)
+    assert res["ids"][0] == ["c3"] and res["documents"][0] == ["new text"]
+    assert reader.count() == 10
+
+    # Reopened from disk after a restart
+    reopened = MmapStoreClient(str(tmp_path)).get_or_create_collection("docs")
+    assert reopened.get(ids=["c3"])["documents"] == ["new text"]
+
+
+def test_queries_search_outside_the_lock(tmp_path, monkeypatch):
+    store = MmapVectorStore(str(tmp_path), "docs")
+    _fill(store, 20)
+    searching, release = threading.Event(), threading.Event()
+    released = []
+    top_n = store._top_n
+
+    def slow_top_n(rows, n_queries, n, score):
+        if threading.current_thread() is not threading.main_thread():
+            searching.set()
+            released.append(release.wait(2))
+        return top_n(rows, n_queries, n, score)
+
+    monkeypatch.setattr(store, "_top_n", slow_top_n)
+    results = []
+    slow = threading.Thread(
+        target=lambda: results.append(store.query(query_embeddings=_vectors(1), n_results=3))
+    )
+    slow.start()
+    assert searching.wait(5)
+    try:
+        # Neither a write nor another query waits for the search in flight
+        store.upsert(["extra"], ["extra"], [{"dept_id": "eng"}], _vectors(1, seed=4))
+        assert store.query(query_embeddings=_vectors(1, seed=4), n_results=1)["ids"] == [["extra"]]
+    finally:
+        release.set()
+        slow.join(5)
+    assert released == [True]
+    assert len(results[0]["ids"][0]) == 3
+
+
+def test_ivf_search_recall(tmp_path):
+    store = MmapVectorStore(str(tmp_path), "docs", index="ivf", nprobe=8, ivf_min_rows=100)
+    unit = _fill(store, 3000)
+    queries = _vectors(20, seed=4)
+    res = store.query(query_embeddings=queries, n_results=10)
+
+    recall = []
+    for q, ids in zip(queries, res["ids"]):
+        expected = {f"c{i}" for i in np.argsort(-(unit @ q))[:10]}
+        recall.append(len(expected & set(ids)) / 10)
+    assert np.mean(recall) > 0.5
+    assert all(len(ids) == 10 for ids in res["ids"])
+
+
+def test_stores_must_implement_the_whole_interface():
+    class Partial(VectorStore):
+        def count(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_unknown_index_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        MmapVectorStore(str(tmp_path), "docs", index="hnsw")
+
+
+def test_retrieve_searches_the_mmap_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval.Config, "USE_RESULT_CACHE", False)
+    vocab = ["travel", "policy", "expense", "vacation", "days", "cafeteria"]
+
+    def embed(texts):
+        return [[float(word in text.lower().split()) + 0.01 for word in vocab] for text in texts]
+
+    store = MmapVectorStore(str(tmp_path), "docs", embedding_function=embed)
+    docs = ["travel policy for flights", "vacation days per year", "cafeteria hours"]
+    store.upsert(
+        ["a", "b", "c"], docs,
+        [{"dept_id": "eng", "file_for_user": False, "chunk_id": cid, "source": f"{cid}.md"} for cid in "abc"],
+    )
+    monkeypatch.setattr(retrieval.query_embeddings, "_embed_fn", None)
+
+    ctx, error = retrieval.retrieve(store, "vacation days", "eng", "alice", top_k=1)
+    assert error is None
+    assert ctx[0]["chunk_id"] == "b"
+
+
+# 16 sign bits rank coarsely; binary codes need a deeper rescore
+@pytest.mark.parametrize(
+    "quantization, rescore, min_recall, scan_saved, memory_saved",
+    [("int8", 20, 0.95, 0.75, 0.25), ("binary", 200, 0.7, 0.96875, 0.46875)],
+)
+def test_quantized_search_rescores_with_the_stored_vectors(
+    tmp_path, quantization, rescore, min_recall, scan_saved, memory_saved
+):
+    store = MmapVectorStore(
+        str(tmp_path), "docs", quantization=quantization, rescore=rescore, recall_sample=1.0
+    )
+    unit = _fill(store, 2000)
+    queries = _vectors(20, seed=5)
+    res = store.query(query_embeddings=queries, n_results=10)
+
+    recall = []
+    for q, ids, distances in zip(queries, res["ids"], res["distances"]):
+        q = q / np.linalg.norm(q)
+        expected = {f"c{i}" for i in np.argsort(-(unit @ q))[:10]}
+        recall.append(len(expected & set(ids)) / 10)
+        # Distances come from the float16 vectors, not the codes
+        rows = [int(i[1:]) for i in ids]
+        assert np.allclose(distances, 1 - unit[rows] @ q, atol=2e-3)
+        assert distances == sorted(distances)
+    assert np.mean(recall) >= min_recall
+
+    stats = store.stats()
+    # The float16 vectors are kept for rescoring, next to the codes
+    assert stats["scan_saved"] == pytest.approx(scan_saved, abs=1e-4)
+    assert stats["memory_saved"] == pytest.approx(memory_saved, abs=1e-4)
+    assert stats["recall_queries"] == 20
+    assert stats["recall_at_k"] == pytest.approx(np.mean(recall), abs=0.05)
+
+
+def test_codes_are_built_for_existing_rows_and_kept_current(tmp_path):
+    plain = MmapVectorStore(str(tmp_path), "docs")
+    unit = _fill(plain, 300)
+    quantized = MmapVectorStore(str(tmp_path), "docs", quantization="int8", rescore=20)
+
+    # Written through an instance that does not search the codes itself
+    vector = _vectors(1, seed=6)
+    plain.upsert(["new"], ["new chunk"], [{"dept_id": "eng"}], vector)
+    res = quantized.query(query_embeddings=vector, n_results=3)
+    assert res["ids"][0][0] == "new"
+
+    q = _vectors(1, seed=7)[0]
+    expected = [f"c{i}" for i in np.argsort(-(unit @ (q / np.linalg.norm(q))))[:3]]
+    assert quantized.query(query_embeddings=[q], n_results=3)["ids"][0] == expected
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_filter_matching_nothing_returns_no_hits(tmp_path, quantization):
+    store = MmapVectorStore(str(tmp_path), "docs", quantization=quantization)
+    _fill(store, 50)
+    res = store.query(query_embeddings=_vectors(2, seed=8), n_results=5, where={"dept_id": "hr"})
+    assert res["ids"] == [[], []]
+    assert res["distances"] == [[], []]
+
+
+def test_negated_filters_skip_rows_without_the_field(tmp_path):
+    store = MmapVectorStore(str(tmp_path), "docs")
+    store.upsert(["a", "b", "c"], ["a", "b", "c"], [{"ext": "pdf"}, {"ext": "md"}, {}], _vectors(3))
+    assert store.get(where={"ext": {"$ne": "pdf"}}, include=[])["ids"] == ["b"]
+    res = store.query(query_embeddings=_vectors(1), n_results=5, where={"ext": {"$nin": ["md"]}})
+    assert res["ids"] == [["a"]]
+
+
+def test_filter_masks_match_row_by_row_evaluation(tmp_path):
+    store = MmapVectorStore(str(tmp_path), "docs")
+    _fill(store, 60)
+    wheres = [
+        visibility_where("eng", "bob"),
+        visibility_where("eng", "carol"),
+        {"$and": [{"file_for_user": {"$ne": True}}, {"user_id": {"$in": ["bob", "dave"]}}]},
+        {"$or": [{"ext": "pdf"}, {"user_id": {"$nin": ["", "bob"]}}]},
+        {"dept_id": "eng", "page": {"$gte": 3}},
+    ]
+
+    def expected(where):
+        return [
+            f"c{i}" for i in sorted(int(cid[1:]) for cid in store._rows)
+            if matches_where(store._metas[store._rows[f"c{i}"]], where)
+        ]
+
+    for where in wheres:
+        assert store.get(where=where, include=[])["ids"] == expected(where)
+
+    # Columns built by those filters follow later writes
+    store.upsert(
+        ["c1", "c70"], ["moved", "new"],
+        [{"dept_id": "eng", "ext": "pdf", "page": 5, "user_id": "dave"}, {"dept_id": "hr"}],
+        _vectors(2, seed=9),
+    )
+    store.delete(ids=["c4"])
+    for where in wheres:
+        assert store.get(where=where, include=[])["ids"] == expected(where)
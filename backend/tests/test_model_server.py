@@ -0,0 +1,110 @@
+import threading
+import chromadb
+import numpy as np
+import pytest
+from chromadb.utils.embedding_functions.sentence_transformer_embedding_function import (
+    SentenceTransformerEmbeddingFunction,
+)
+from src.services.model_client import ModelClient, RemoteEmbeddingFunction, RemoteReranker
+from src.services.model_server import ModelServer, pack_strings, unpack_strings
+from src.services.models import embedding_config
+
+
+def fake_embed(texts):
+    return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+
+class FakeCrossEncoder:
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, pairs, batch_size=32):
+        self.calls += 1
+        return np.asarray([len(query) - len(chunk) for query, chunk in pairs], dtype=np.float32)
+
+
+@pytest.fixture()
+def server(tmp_path):
+    reranker = FakeCrossEncoder()
+    server = ModelServer(
+        str(tmp_path / "models.sock"), lambda: fake_embed, lambda: reranker, window_ms=20
+    )
+    server.start()
+    server.reranker = reranker
+    yield server
+    server.shutdown()
+
+
+def test_strings_round_trip():
+    texts = ["", "héllo", "a\nb" * 100]
+    assert unpack_strings(pack_strings(texts)) == texts
+
+
+def test_embed_and_rerank_over_the_socket(server):
+    client = ModelClient(server.socket_path)
+    assert client.ping()
+
+    embed = RemoteEmbeddingFunction(client, embedding_config("fake-model", "torch"))
+    vectors = embed(["ab", "abcd"])
+    assert [list(v) for v in vectors] == [[2.0, 1.0, 0.5], [4.0, 1.0, 0.5]]
+
+    scores = RemoteReranker(client).predict([("abc", "a"), ("a", "abc")])
+    assert scores.tolist() == [2.0, -2.0]
+
+
+def test_concurrent_workers_share_forward_passes(server):
+    client = ModelClient(server.socket_path)
+    results = [None] * 8
+
+    def worker(i):
+        results[i] = client.rerank([("q" * i, "c")])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [r.tolist() for r in results] == [[float(i - 1)] for i in range(8)]
+    assert server.reranker.calls < 8
+
+
+def test_server_errors_reach_the_client(tmp_path):
+    server = ModelServer(str(tmp_path / "models.sock"), lambda: fake_embed)
+    server.start()
+    try:
+        with pytest.raises(RuntimeError, match="Reranker is not loaded"):
+            ModelClient(server.socket_path).rerank([("q", "c")])
+    finally:
+        server.shutdown()
+
+
+def test_unreachable_server(tmp_path):
+    assert not ModelClient(str(tmp_path / "missing.sock"), timeout=1).ping()
+
+
+class FakeSentenceTransformer:
+    def encode(self, texts, **kwargs):
+        return np.asarray(fake_embed(texts), dtype=np.float32)
+
+
+def test_remote_function_reopens_collections_of_the_local_one(server, tmp_path, monkeypatch):
+    # A cached model stands in for the download the constructor would do
+    monkeypatch.setitem(
+        SentenceTransformerEmbeddingFunction.models, "fake-model", FakeSentenceTransformer()
+    )
+    local = SentenceTransformerEmbeddingFunction(model_name="fake-model")
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    client.get_or_create_collection("docs", embedding_function=local)
+
+    remote = RemoteEmbeddingFunction(
+        ModelClient(server.socket_path), embedding_config("fake-model", "torch")
+    )
+    assert remote.name() == local.name()
+    assert remote.get_config() == local.get_config()
+
+    reopened = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = reopened.get_or_create_collection("docs", embedding_function=remote)
+    collection.add(ids=["a"], documents=["ab"])
+    stored = collection.get(ids=["a"], include=["embeddings"])["embeddings"][0]
+    assert stored.tolist() == [2.0, 1.0, 0.5]
@@ -0,0 +1,66 @@
+import numpy as np
+from src.services import retrieval
+from src.services.query_embedding import QueryEmbeddingCache
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, input):
+        self.calls.append(list(input))
+        return [np.full(4, len(text), dtype=np.float32) for text in input]
+
+
+class EmbeddingCollection:
+    def __init__(self):
+        self.queries = []
+
+    def query(self, n_results, where=None, include=None, **kwargs):
+        self.queries.append(kwargs)
+        return {
+            "documents": [["chunk about the travel policy"]],
+            "metadatas": [[{"chunk_id": "c0", "source": "doc.pdf", "dept_id": "eng"}]],
+            "distances": [[0.1]],
+        }
+
+
+def test_query_is_embedded_once_per_normalized_text():
+    cache = QueryEmbeddingCache(max_entries=10)
+    assert cache.embed("anything") is None  # unbound
+
+    embedder = CountingEmbedder()
+    cache.bind(embedder, "m1")
+    first = cache.embed("What is the travel policy?")
+    again = cache.embed("  what is the TRAVEL policy ")
+    assert again is first
+    assert not first.flags.writeable
+    assert embedder.calls == [["What is the travel policy?"]]
+
+    # Another model gets its own vector
+    cache.bind(embedder, "m2")
+    cache.embed("What is the travel policy?")
+    assert len(embedder.calls) == 2
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["embedded"] == 2
+
+
+def test_retrieve_queries_chroma_with_the_cached_embedding(monkeypatch):
+    cache = QueryEmbeddingCache(max_entries=10)
+    embedder = CountingEmbedder()
+    cache.bind(embedder, "m1")
+    monkeypatch.setattr(retrieval, "query_embeddings", cache)
+    collection = EmbeddingCollection()
+
+    for _ in range(3):
+        ctx, error = retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=1)
+        assert error is None
+        assert ctx[0]["chunk_id"] == "c0"
+    assert len(embedder.calls) == 1
+    assert all(list(q) == ["query_embeddings"] for q in collection.queries)
+
+    # A vector computed earlier in the request is used as is
+    vector = np.ones(4, dtype=np.float32)
+    retrieval.retrieve(collection, "other", "eng", "alice", top_k=1, query_embedding=vector)
+    assert collection.queries[-1]["query_embeddings"][0] is vector
+    assert len(embedder.calls) == 1
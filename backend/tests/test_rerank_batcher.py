@@ -0,0 +1,60 @@
+import threading
+import numpy as np
+import pytest
+from src.services.rerank_batcher import RerankBatcher
+
+
+class RecordingModel:
+    """Scores a pair by the length of its chunk and records each batch."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32):
+        self.calls.append(list(pairs))
+        return np.array([float(len(chunk)) for _, chunk in pairs])
+
+
+def test_concurrent_requests_share_forward_passes():
+    model = RecordingModel()
+    batcher = RerankBatcher(lambda: model, max_batch=256, window_ms=50)
+    requests = [
+        [(f"q{r}", "x" * ((r * 7 + i * 3) % 40 + 1)) for i in range(12)]
+        for r in range(8)
+    ]
+    results = [None] * len(requests)
+    start = threading.Barrier(len(requests))
+
+    def worker(r):
+        start.wait()
+        results[r] = batcher.predict(requests[r])
+
+    threads = [threading.Thread(target=worker, args=(r,)) for r in range(len(requests))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Each caller gets its own scores back, in its own order
+    for pairs, scores in zip(requests, results):
+        assert list(scores) == [float(len(chunk)) for _, chunk in pairs]
+    assert len(model.calls) < len(requests)
+    assert batcher.stats()["requests"] == len(requests)
+    # Pairs within a forward pass are sorted by length
+    for call in model.calls:
+        lengths = [len(q) + len(c) for q, c in call]
+        assert lengths == sorted(lengths)
+
+
+def test_max_batch_closes_the_window_early():
+    model = RecordingModel()
+    batcher = RerankBatcher(lambda: model, max_batch=4, window_ms=10_000)
+    scores = batcher.predict([("q", "abcd")] * 5)
+    assert list(scores) == [4.0] * 5
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    batcher = RerankBatcher(lambda: None, window_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.predict([("q", "chunk")])
+    assert len(batcher.predict([])) == 0
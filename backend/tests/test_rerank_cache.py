@@ -0,0 +1,54 @@
+import time
+from src.services.rerank_cache import RerankScoreCache, normalize_query
+from src.utils.cache import TTLCache
+
+
+class CountingPredict:
+    def __init__(self):
+        self.pairs = []
+
+    def __call__(self, pairs):
+        self.pairs.extend(pairs)
+        return [float(len(chunk)) for _, chunk in pairs]
+
+
+def test_only_cache_misses_reach_the_reranker():
+    cache = RerankScoreCache(max_entries=100)
+    predict = CountingPredict()
+
+    first = cache.score(predict, "What is the travel policy?", ["aa", "bbb"], "m1")
+    assert list(first) == [2.0, 3.0]
+    assert len(predict.pairs) == 2
+
+    # Near-identical question: only the new chunk is scored
+    again = cache.score(predict, "  what is the TRAVEL policy ", ["bbb", "cccc"], "m1")
+    assert list(again) == [3.0, 4.0]
+    assert predict.pairs[2:] == [("  what is the TRAVEL policy ", "cccc")]
+
+    # Another model never reuses scores
+    cache.score(predict, "What is the travel policy?", ["aa"], "m2")
+    assert len(predict.pairs) == 4
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["scored_pairs"] == 4
+    assert stats["saved_s"] >= 0
+
+
+def test_normalize_query():
+    assert normalize_query(" Hello   World?! ") == "hello world"
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # "b" was least recently used
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.get_many(["c"]) == [None]
@@ -0,0 +1,89 @@
+from freezegun import freeze_time
+from src.services import retrieval
+from src.services.result_cache import RetrievalResultCache
+from src.utils.cache import TTLCache
+from tests.test_retrieval_filters import FilteredAnnCollection, StubRequest, _where
+
+
+def _private_meta(user_id):
+    return {"dept_id": "eng", "user_id": user_id, "file_for_user": True}
+
+
+def test_repeated_question_is_served_until_the_corpus_changes(monkeypatch):
+    cache = RetrievalResultCache(max_entries=100, max_bytes=10**7)
+    monkeypatch.setattr(retrieval, "retrieval_cache", cache)
+    monkeypatch.setattr(retrieval.Config, "USE_RESULT_CACHE", True)
+    collection = FilteredAnnCollection()
+
+    first, error = retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=3, where=_where([]))
+    assert error is None
+    again, _ = retrieval.retrieve(collection, " Travel policy? ", "eng", "alice", top_k=3, where=_where([]))
+    assert again == first
+    assert len(collection.n_results) == 1
+
+    # Cached results are copies: callers may scrub chunks in place
+    again[0]["chunk"] = "scrubbed"
+    assert retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=3, where=_where([]))[0] == first
+
+    # Other filters, flags or an ingest into the department miss
+    retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=3, where=_where([{"exts": ["md"]}]))
+    retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=5, where=_where([]))
+    cache.bump([{"dept_id": "eng", "file_for_user": False}])
+    retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=3, where=_where([]))
+    assert len(collection.n_results) == 4
+    assert cache.stats()["hits"] == 2
+
+
+def test_shared_results_are_reused_department_wide():
+    cache = RetrievalResultCache(max_entries=100, max_bytes=10**7)
+    collection = FilteredAnnCollection()
+    def where(user_id):
+        return retrieval.build_where(StubRequest({"filters": [{"exts": ["pdf"]}]}), "eng", user_id)
+
+    bob = cache.key(collection, "eng", "bob", "q", where("bob"), ())
+    carol = cache.key(collection, "eng", "carol", "q", where("carol"), ())
+    assert bob == carol
+
+    # A private upload gives the user a scope of their own
+    cache.bump([_private_meta("bob")])
+    assert cache.key(collection, "eng", "bob", "q", where("bob"), ()) != carol
+    assert cache.key(collection, "eng", "carol", "q", where("carol"), ()) == carol
+
+
+def test_ttl_cache_is_bounded_by_bytes():
+    cache = TTLCache(max_entries=100, max_bytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "yyyy")
+    cache.put("a", "xxxxx")  # replacing an entry recounts its size
+    assert cache.nbytes == 9
+    cache.put("c", "zzzz")  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == "xxxxx"
+    assert cache.stats()["bytes"] == 9
+
+
+def test_results_with_private_chunks_are_not_shared_department_wide():
+    cache = RetrievalResultCache(max_entries=100, max_bytes=10**7)
+    collection = FilteredAnnCollection()
+    where = retrieval.build_where(StubRequest({}), "eng", "bob")
+
+    # Scoped department-wide before another worker ingested bob's file
+    shared = cache.key(collection, "eng", "bob", "q", where, ())
+    cache.put(shared, ([{"chunk_id": "p1", **_private_meta("bob")}], None))
+    assert cache.get(shared) is None
+
+    # bob now gets a key of his own; the shared key still caches
+    assert cache.key(collection, "eng", "bob", "q", where, ()) != shared
+    cache.put(shared, ([{"chunk_id": "s1", "dept_id": "eng", "file_for_user": False}], None))
+    assert cache.get(shared) is not None
+    assert cache.scope(collection, "eng", "carol", [_private_meta("carol")])[-1] == ("user", "eng", "carol")
+
+
+def test_private_document_lookups_expire():
+    cache = RetrievalResultCache(max_entries=100, max_bytes=10**7, scope_ttl=60)
+    collection = FilteredAnnCollection()
+    with freeze_time("2025-01-01 00:00:00") as frozen:
+        assert cache.scope(collection, "eng", "bob") == (("dept", "eng"),)
+        cache._has_private.put(("eng", "dave"), True)
+        frozen.tick(61)
+        assert cache.scope(collection, "eng", "dave") == (("dept", "eng"),)
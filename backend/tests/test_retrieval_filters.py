@@ -0,0 +1,155 @@
+import pytest
+from src.services import retrieval
+from src.services.bm25_index import BM25IndexManager
+from src.services.filters import matches_where, tag_fields
+
+
+class StubRequest:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def get_json(self, force=False):
+        return self.payload
+
+
+class FilteredAnnCollection:
+    """
+    Stand-in for a Chroma collection whose filtered query, like an HNSW
+    search, only considers the n_results nearest chunks before filtering.
+    """
+
+    def __init__(self, n_chunks=100):
+        self.ids, self.docs, self.metas = [], [], []
+        for i in range(n_chunks):
+            tags = "policy" if i % 25 == 0 else "misc"
+            self.ids.append(f"c{i}")
+            self.docs.append(f"chunk {i} about the travel policy")
+            self.metas.append(
+                {
+                    "dept_id": "eng",
+                    "file_for_user": False,
+                    "chunk_id": f"c{i}",
+                    "source": f"doc{i}.pdf",
+                    "ext": "pdf" if i % 2 else "md",
+                    "tags": tags,
+                    **tag_fields(tags),
+                }
+            )
+        self.n_results = []
+
+    def query(self, query_texts, n_results, where=None, include=None):
+        self.n_results.append(n_results)
+        rows = [
+            (i, d, m)
+            for i, d, m in list(zip(self.ids, self.docs, self.metas))[:n_results]
+            if where is None or matches_where(m, where)
+        ]
+        return {
+            "documents": [[r[1] for r in rows]],
+            "metadatas": [[r[2] for r in rows]],
+            "distances": [[0.001 * int(r[0][1:]) for r in rows]],
+        }
+
+    def get(self, where=None, include=None, limit=None, offset=0):
+        rows = [
+            r
+            for r in zip(self.ids, self.docs, self.metas)
+            if where is None or matches_where(r[2], where)
+        ][offset : offset + limit if limit else None]
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[1] for r in rows],
+            "metadatas": [r[2] for r in rows],
+        }
+
+
+def _where(filters):
+    return retrieval.build_where(StubRequest({"filters": filters}), "eng", "alice")
+
+
+def test_build_where_pushes_tags_into_the_store_filter():
+    where = _where([{"tags": ["Policy", "hr"]}, {"exts": ["pdf"]}])
+    assert {"$or": [{"tag_policy": True}, {"tag_hr": True}]} in where["$and"]
+    assert {"ext": "pdf"} in where["$and"]
+    assert {"tag_policy": True} in _where([{"tags": ["policy"]}])["$and"]
+
+
+def test_selective_filter_deepens_the_semantic_query_once():
+    collection = FilteredAnnCollection()
+    ctx, error = retrieval.retrieve(
+        collection, "travel policy", "eng", "alice", top_k=3,
+        where=_where([{"tags": ["policy"]}]),
+    )
+    assert error is None
+    assert [c["chunk_id"] for c in ctx] == ["c0", "c25", "c50"]
+    assert collection.n_results == [retrieval.CANDIDATES, retrieval.MAX_CANDIDATES]
+
+    # Enough survivors: a single round trip
+    collection.n_results = []
+    retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=3, where=_where([]))
+    assert collection.n_results == [retrieval.CANDIDATES]
+
+    # Visibility alone is not a selective filter: a small tenant has no more
+    collection = FilteredAnnCollection(n_chunks=2)
+    retrieval.retrieve(collection, "travel policy", "eng", "alice", top_k=3, where=_where([]))
+    assert collection.n_results == [retrieval.CANDIDATES]
+
+
+def test_hybrid_bm25_candidates_respect_the_filters(monkeypatch):
+    monkeypatch.setattr(retrieval, "bm25_indexes", BM25IndexManager(8, 10**9))
+    collection = FilteredAnnCollection()
+    ctx, error = retrieval.retrieve(
+        collection, "travel policy", "eng", "alice", top_k=5,
+        where=_where([{"exts": ["md"]}, {"tags": ["misc"]}]), use_hybrid=True,
+    )
+    assert error is None
+    assert ctx
+    assert all(c["ext"] == "md" and c["tags"] == "misc" for c in ctx)
+
+
+def test_hybrid_results_keep_the_context_shape(monkeypatch):
+    monkeypatch.setattr(retrieval, "bm25_indexes", BM25IndexManager(8, 10**9))
+    collection = FilteredAnnCollection()
+    ctx, _ = retrieval.retrieve(
+        collection, "chunk 3 about travel", "eng", "alice", top_k=5,
+        where=_where([]), use_hybrid=True,
+    )
+    assert list(ctx[0]) == [
+        "dept_id", "user_id", "file_for_user", "chunk_id", "chunk", "file_id",
+        "source", "ext", "tags", "size_kb", "upload_at", "uploaded_at_ts", "page",
+        "sem_sim", "bm25", "hybrid", "rerank",
+    ]
+    assert [c["hybrid"] for c in ctx] == sorted((c["hybrid"] for c in ctx), reverse=True)
+
+
+def _merge_fixture(monkeypatch):
+    monkeypatch.setattr(retrieval.Config, "FUSION_MODE", "weighted")
+    monkeypatch.setattr(retrieval, "FUSE_ALPHA", 0.5)
+    metas = {cid: {"chunk_id": cid, "source": f"{cid}.md"} for cid in "abcd"}
+    docs = {cid: f"chunk {cid}" for cid in "abcd"}
+    # Semantic leg a, b, d normalizes to 1, 0.5, 0; BM25 leg b, c to 1, 0
+    sem = ([docs[c] for c in "abd"], [metas[c] for c in "abd"], [0.1, 0.3, 0.5])
+    bm25_hits = [(4.0, "b", docs["b"], metas["b"]), (2.0, "c", docs["c"], metas["c"])]
+    ctx, error = retrieval._rank_candidates(*sem, 2, True, bm25_hits)
+    assert error is None
+    return {item.chunk_id: (item.bm25, item.sem_sim, item.hybrid) for item in ctx}, [
+        item.chunk_id for item in ctx
+    ]
+
+
+def test_hybrid_merge_of_chunks_found_by_both_legs(monkeypatch):
+    scores, order = _merge_fixture(monkeypatch)
+    # b was found by both legs and keeps only its semantic score
+    assert scores["b"] == pytest.approx((0.0, 0.5, 0.25))
+    assert order == ["a", "b", "c", "d"]
+
+
+def test_hybrid_scores_use_the_configured_normalization(monkeypatch):
+    monkeypatch.setattr(retrieval.Config, "FUSION_NORM", "zscore")
+    # The default gates expect min-max scores in [0, 1]
+    monkeypatch.setattr(retrieval, "AVG_HYBRID", -1.0)
+    scores, order = _merge_fixture(monkeypatch)
+    # Semantic leg a, b, d standardizes to 1.22, 0, -1.22; BM25 leg b, c to 1, -1
+    assert scores["a"] == pytest.approx((0.0, 1.2247, 0.6124), abs=1e-4)
+    assert scores["c"] == pytest.approx((-1.0, 0.0, -0.5))
+    assert order == ["a", "b", "c", "d"]
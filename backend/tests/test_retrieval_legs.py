@@ -0,0 +1,48 @@
+import time
+from src.services import retrieval
+from src.utils.timings import LatencyStats
+from tests.test_retrieval_filters import FilteredAnnCollection, _where
+
+DELAY_S = 0.2
+
+
+class SlowCollection(FilteredAnnCollection):
+    def query(self, *args, **kwargs):
+        time.sleep(DELAY_S)
+        return super().query(*args, **kwargs)
+
+
+class SlowIndexes:
+    """BM25 index manager whose index fetch takes as long as a search."""
+
+    def get(self, collection, dept_id, user_id):
+        time.sleep(DELAY_S)
+        return None
+
+
+def test_hybrid_legs_run_concurrently_and_are_timed(monkeypatch):
+    timings = LatencyStats()
+    monkeypatch.setattr(retrieval.Config, "USE_RESULT_CACHE", False)
+    monkeypatch.setattr(retrieval, "bm25_indexes", SlowIndexes())
+    monkeypatch.setattr(retrieval, "leg_timings", timings)
+
+    t0 = time.perf_counter()
+    retrieval.retrieve(
+        SlowCollection(), "travel policy", "eng", "alice", top_k=3,
+        where=_where([]), use_hybrid=True,
+    )
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 1.75 * DELAY_S
+
+    stats = timings.stats()
+    assert set(stats) == {"semantic", "bm25", "legs"}
+    assert stats["bm25"]["p50_ms"] >= DELAY_S * 1000
+    assert stats["legs"]["max_ms"] < 1.75 * DELAY_S * 1000
+
+
+def test_semantic_only_has_no_bm25_leg(monkeypatch):
+    timings = LatencyStats()
+    monkeypatch.setattr(retrieval.Config, "USE_RESULT_CACHE", False)
+    monkeypatch.setattr(retrieval, "leg_timings", timings)
+    retrieval.retrieve(FilteredAnnCollection(), "travel policy", "eng", "alice", top_k=3)
+    assert set(timings.stats()) == {"semantic", "legs"}
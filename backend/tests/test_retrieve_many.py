@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from src.services import retrieval
+from src.services.bm25_index import BM25IndexManager
+from src.services.rerank_cache import RerankScoreCache
+from src.services.filters import matches_where
+from tests.test_retrieval_filters import _where
+
+TOPICS = ["travel policy", "vacation days", "expense report", "office badge", "salary review"]
+
+
+class WordOverlapCollection:
+    """Collection whose query distance is 1 - word overlap with the chunk."""
+
+    def __init__(self):
+        self.ids, self.docs, self.metas = [], [], []
+        for i in range(60):
+            topic = TOPICS[i % len(TOPICS)]
+            self.ids.append(f"c{i}")
+            self.docs.append(f"{topic} chunk {i} note {i % 7}")
+            self.metas.append(
+                {
+                    "dept_id": "eng",
+                    "file_for_user": False,
+                    "chunk_id": f"c{i}",
+                    "source": f"doc{i}.pdf",
+                    "ext": "pdf" if i % 3 else "md",
+                }
+            )
+        self.calls = []
+
+    def query(self, query_texts, n_results, where=None, include=None):
+        self.calls.append(len(query_texts))
+        out = {"documents": [], "metadatas": [], "distances": []}
+        for text in query_texts:
+            words = set(text.split())
+            dists = [
+                1 - len(words & set(doc.split())) / len(words | set(doc.split()))
+                for doc in self.docs
+            ]
+            nearest = np.argsort(dists, kind="stable")[:n_results]
+            rows = [i for i in nearest if where is None or matches_where(self.metas[i], where)]
+            out["documents"].append([self.docs[i] for i in rows])
+            out["metadatas"].append([self.metas[i] for i in rows])
+            out["distances"].append([dists[i] for i in rows])
+        return out
+
+    def get(self, where=None, include=None, limit=None, offset=0):
+        rows = [
+            r
+            for r in zip(self.ids, self.docs, self.metas)
+            if where is None or matches_where(r[2], where)
+        ][offset : offset + limit if limit else None]
+        return {
+            "ids": [r[0] for r in rows],
+            "documents": [r[1] for r in rows],
+            "metadatas": [r[2] for r in rows],
+        }
+
+
+class CountingBatcher:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, pairs):
+        self.calls.append(len(pairs))
+        return [len(set(q.split()) & set(c.split())) / 2.0 for q, c in pairs]
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    monkeypatch.setattr(retrieval.Config, "USE_RESULT_CACHE", False)
+    monkeypatch.setattr(retrieval, "bm25_indexes", BM25IndexManager(8, 10**9))
+    monkeypatch.setattr(retrieval, "rerank_cache", RerankScoreCache(max_entries=1000))
+    batcher = CountingBatcher()
+    monkeypatch.setattr(retrieval, "rerank_batcher", batcher)
+    monkeypatch.setattr(retrieval, "get_reranker", lambda: object())
+    return batcher
+
+
+@pytest.mark.parametrize("use_hybrid", [False, True])
+@pytest.mark.parametrize("use_reranker", [False, True])
+def test_batched_results_match_one_query_at_a_time(isolated, use_hybrid, use_reranker):
+    queries = TOPICS + ["unrelated words entirely", "travel note 3"]
+    flags = {"use_hybrid": use_hybrid, "use_reranker": use_reranker}
+    for filters in ([], [{"exts": ["md"]}]):
+        where = _where(filters)
+        expected = [
+            retrieval.retrieve(WordOverlapCollection(), q, "eng", "alice", top_k=3, where=where, **flags)
+            for q in queries
+        ]
+        collection = WordOverlapCollection()
+        isolated.calls.clear()
+        got = retrieval.retrieve_many(collection, queries, "eng", "alice", top_k=3, where=where, **flags)
+        assert got == expected
+        # One multi-query search, plus one deeper pass for starved queries
+        assert collection.calls[0] == len(queries)
+        assert len(collection.calls) <= 2
+        if use_reranker:
+            assert len(isolated.calls) <= 1
+
+
+def test_bm25_search_many_matches_search():
+    collection = WordOverlapCollection()
+    index = BM25IndexManager(8, 10**9).get(collection, "eng", "alice")
+    queries = [q.split() for q in TOPICS] + [["nothing"], []]
+    for where in (None, {"ext": "md"}):
+        assert index.search_many(queries, 5, where=where) == [
+            index.search(q, 5, where=where) for q in queries
+        ]
@@ -0,0 +1,79 @@
+import threading
+from src.services.warmup import Warmup, parse_tenants, warmup_steps
+
+
+class FakeReranker:
+    def __init__(self):
+        self.pairs = []
+
+    def predict(self, pairs):
+        self.pairs.extend(pairs)
+        return [0.0] * len(pairs)
+
+
+class FakeIndexes:
+    def __init__(self):
+        self.built = []
+
+    def get(self, collection, dept_id, user_id):
+        assert collection == f"docs-{dept_id}"
+        self.built.append((dept_id, user_id))
+
+
+class FakeRouter:
+    def for_dept(self, dept_id):
+        return f"docs-{dept_id}"
+
+
+def test_steps_run_in_order_and_are_timed():
+    embedded, reranker, indexes = [], FakeReranker(), FakeIndexes()
+    steps = warmup_steps(
+        embedded.extend, lambda: reranker, indexes, FakeRouter(), [("eng", ""), ("eng", "alice")]
+    )
+    assert [name for name, _ in steps] == ["embedder", "reranker", "bm25:eng", "bm25:eng:alice"]
+
+    warmup = Warmup()
+    assert not warmup.ready
+    warmup.run(steps)
+
+    status = warmup.status()
+    assert status["ready"] and status["state"] == "ready"
+    assert all(step["ok"] and step["ms"] >= 0 for step in status["steps"].values())
+    assert embedded and reranker.pairs
+    assert indexes.built == [("eng", ""), ("eng", "alice")]
+
+
+def test_failed_step_is_reported_and_the_rest_still_run():
+    ran = []
+    warmup = Warmup()
+    warmup.run(warmup_steps(ran.extend, lambda: None))
+
+    status = warmup.status()
+    assert not status["ready"] and status["state"] == "degraded"
+    assert status["steps"]["embedder"]["ok"]
+    assert "not available" in status["steps"]["reranker"]["error"]
+
+    # Opt-in: serve traffic even though a step failed
+    lenient = Warmup(ready_when_degraded=True)
+    lenient.run(warmup_steps(ran.extend, lambda: None))
+    assert lenient.status()["ready"] and lenient.state == "degraded"
+
+
+def test_background_warmup_is_not_ready_until_done():
+    release = threading.Event()
+    warmup = Warmup()
+    warmup.start([("slow", release.wait)], background=True)
+    assert not warmup.status()["ready"]
+    release.set()
+    assert warmup.wait(5)
+
+
+def test_parse_tenants():
+    assert parse_tenants(" eng, hr:bob ,,") == [("eng", ""), ("hr", "bob")]
+    assert parse_tenants("") == []
+
+
+def test_ready_endpoint_without_warmup(client):
+    res = client.get("/ready")
+    assert res.status_code == 200
+    assert res.json["ready"]
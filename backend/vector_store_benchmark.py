@@ -0,0 +1,117 @@
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from src.services.mmap_store import MmapVectorStore
+from src.services.vector_db import ChromaStoreClient
+
+
+def make_vectors(n: int, dim: int, n_topics: int, seed: int) -> np.ndarray:
+    """Unit vectors scattered around topic centres, like chunk embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(n_topics, dim))
+    vectors = centres[rng.integers(n_topics, size=n)] + 0.6 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def time_queries(search, queries: np.ndarray) -> tuple[dict, list]:
+    latencies, hits = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        hits.append(search(q))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+    }, hits
+
+
+def recall(hits: list, expected: list) -> float:
+    return round(float(np.mean([len(set(h) & set(e)) / len(e) for h, e in zip(hits, expected)])), 4)
+
+
+def fill(store, vectors: np.ndarray, batch: int) -> float:
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), batch):
+        end = min(start + batch, len(vectors))
+        store.upsert(
+            [f"c{i}" for i in range(start, end)],
+            [""] * (end - start),
+            [{"dept_id": "bench"} for _ in range(start, end)],
+            vectors[start:end].tolist(),
+        )
+    return round(time.perf_counter() - t0, 3)
+
+
+def bench(n: int, args, workdir: str) -> dict:
+    vectors = make_vectors(n, args.dim, args.topics, args.seed)
+    queries = make_vectors(args.queries, args.dim, args.topics, args.seed)
+    # Exact float32 ranking is the reference for recall
+    expected = [
+        [f"c{i}" for i in np.argsort(-(vectors @ q))[: args.top_k]] for q in queries
+    ]
+    result = {"n_chunks": n, "dim": args.dim, "float32_mb": round(vectors.nbytes / 2**20, 1)}
+
+    for backend in args.stores.split(","):
+        name = f"bench-{backend}-{n}"
+        if backend == "chroma":
+            store = ChromaStoreClient(workdir).get_or_create_collection(
+                name, metadata={"hnsw:space": "cosine"}
+            )
+        else:
+            # mmap-<index>[-<quantization>]
+            _, index, *quantization = backend.split("-")
+            store = MmapVectorStore(
+                workdir, name, index=index,
+                nprobe=args.nprobe, ivf_min_rows=args.ivf_min_rows,
+                quantization=quantization[0] if quantization else "none",
+                rescore=args.rescore,
+            )
+        entry = {"build_s": fill(store, vectors, args.batch)}
+
+        def search(q):
+            res = store.query(query_embeddings=[q.tolist()], n_results=args.top_k, where={"dept_id": "bench"})
+            return res["ids"][0]
+
+        search(queries[0])  # IVF lists are trained on first use
+        entry["query"], hits = time_queries(search, queries)
+        entry[f"recall@{args.top_k}"] = recall(hits, expected)
+        if hasattr(store, "stats"):
+            stats = store.stats()
+            entry["stored_mb"] = round(stats["stored_bytes"] / 2**20, 1)
+            entry["scanned_mb"] = round(stats["scanned_bytes"] / 2**20, 1)
+            entry["memory_saved"] = stats["memory_saved"]
+            entry["scan_saved"] = stats["scan_saved"]
+        result[backend] = entry
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Benchmark vector store backends on synthetic embeddings; recall@k is against exact float32 search"
+    )
+    p.add_argument("--sizes", type=str, default="10000,100000", help="Comma separated corpus sizes (chunks)")
+    p.add_argument(
+        "--stores", type=str, default="chroma,mmap-flat,mmap-ivf,mmap-flat-int8,mmap-flat-binary",
+        help="Backends to compare: chroma or mmap-<flat|ivf>[-<int8|binary>]",
+    )
+    p.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    p.add_argument("--topics", type=int, default=200, help="Topic clusters in the synthetic corpus")
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--top-k", type=int, default=20, help="Candidates per query (CANDIDATES)")
+    p.add_argument("--nprobe", type=int, default=8, help="IVF lists scanned per query")
+    p.add_argument("--ivf-min-rows", type=int, default=20000, help="Scan exactly below this many rows")
+    p.add_argument("--rescore", type=int, default=20, help="Quantized hits rescored per query (CANDIDATES)")
+    p.add_argument("--batch", type=int, default=5000, help="Chunks per upsert")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in [int(s) for s in args.sizes.split(",") if s.strip().isdigit()]:
+            print(json.dumps(bench(size, args, workdir), indent=2))
+
+
+if __name__ == "__main__":
+    main()